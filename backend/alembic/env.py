@@ -27,6 +27,16 @@ config.set_main_option("sqlalchemy.url", settings.DATABASE_URL)
 # Add your model's MetaData object here
 target_metadata = Base.metadata
 
+# Objects managed only by migrations (full-text search), not by the models
+MIGRATION_ONLY_SUFFIXES = ("search_vector", "_trgm", "_prefix")
+
+
+def include_object(object, name, type_, reflected, compare_to):
+    """Skip migration-only search objects during autogenerate"""
+    if reflected and compare_to is None and name and name.endswith(MIGRATION_ONLY_SUFFIXES):
+        return False
+    return True
+
 
 def run_migrations_offline() -> None:
     """Run migrations in 'offline' mode."""
@@ -36,6 +46,7 @@ def run_migrations_offline() -> None:
         target_metadata=target_metadata,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
+        include_object=include_object,
     )
 
     with context.begin_transaction():
@@ -52,7 +63,8 @@ def run_migrations_online() -> None:
 
     with connectable.connect() as connection:
         context.configure(
-            connection=connection, target_metadata=target_metadata
+            connection=connection, target_metadata=target_metadata,
+            include_object=include_object
         )
 
         with context.begin_transaction():
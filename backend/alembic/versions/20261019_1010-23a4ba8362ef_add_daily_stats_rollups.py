@@ -0,0 +1,76 @@
+"""add_daily_stats_rollups
+
+Revision ID: 23a4ba8362ef
+Revises: 1c1ab5843e01
+Create Date: 2026-10-19 10:10:42.518203
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '23a4ba8362ef'
+down_revision = '1c1ab5843e01'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('stats_daily',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('boards_created', sa.Integer(), nullable=False),
+    sa.Column('cards_created', sa.Integer(), nullable=False),
+    sa.Column('cards_created_completed', sa.Integer(), nullable=False),
+    sa.Column('contacts_created', sa.Integer(), nullable=False),
+    sa.Column('comments_created', sa.Integer(), nullable=False),
+    sa.Column('files_uploaded', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('day')
+    )
+    op.create_table('stats_daily_board',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('board_id', sa.Integer(), nullable=False),
+    sa.Column('cards_created', sa.Integer(), nullable=False),
+    sa.Column('cards_created_completed', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('day', 'board_id')
+    )
+    op.create_index(op.f('ix_stats_daily_board_board_id'), 'stats_daily_board', ['board_id'], unique=False)
+    op.create_table('stats_daily_user',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('cards_assigned', sa.Integer(), nullable=False),
+    sa.Column('cards_assigned_completed', sa.Integer(), nullable=False),
+    sa.Column('comments_created', sa.Integer(), nullable=False),
+    sa.Column('files_uploaded', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('day', 'user_id')
+    )
+    op.create_index(op.f('ix_stats_daily_user_user_id'), 'stats_daily_user', ['user_id'], unique=False)
+    op.create_table('stats_rollup_state',
+    sa.Column('name', sa.String(), nullable=False),
+    sa.Column('last_day', sa.Date(), nullable=True),
+    sa.Column('last_run_at', sa.DateTime(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('name')
+    )
+    
+    # Индексы для сканирования живых таблиц за неполный текущий день
+    op.create_index(op.f('ix_boards_created_at'), 'boards', ['created_at'], unique=False)
+    op.create_index(op.f('ix_cards_created_at'), 'cards', ['created_at'], unique=False)
+    op.create_index(op.f('ix_cards_updated_at'), 'cards', ['updated_at'], unique=False)
+    op.create_index(op.f('ix_card_comments_created_at'), 'card_comments', ['created_at'], unique=False)
+    op.create_index(op.f('ix_contacts_created_at'), 'contacts', ['created_at'], unique=False)
+    op.create_index(op.f('ix_files_created_at'), 'files', ['created_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_files_created_at'), table_name='files')
+    op.drop_index(op.f('ix_contacts_created_at'), table_name='contacts')
+    op.drop_index(op.f('ix_card_comments_created_at'), table_name='card_comments')
+    op.drop_index(op.f('ix_cards_updated_at'), table_name='cards')
+    op.drop_index(op.f('ix_cards_created_at'), table_name='cards')
+    op.drop_index(op.f('ix_boards_created_at'), table_name='boards')
+    op.drop_table('stats_rollup_state')
+    op.drop_index(op.f('ix_stats_daily_user_user_id'), table_name='stats_daily_user')
+    op.drop_table('stats_daily_user')
+    op.drop_index(op.f('ix_stats_daily_board_board_id'), table_name='stats_daily_board')
+    op.drop_table('stats_daily_board')
+    op.drop_table('stats_daily')
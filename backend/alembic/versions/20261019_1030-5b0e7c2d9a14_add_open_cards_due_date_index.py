@@ -0,0 +1,31 @@
+"""add_open_cards_due_date_index
+
+Revision ID: 5b0e7c2d9a14
+Revises: 23a4ba8362ef
+Create Date: 2026-10-19 10:30:17.204611
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5b0e7c2d9a14'
+down_revision = '23a4ba8362ef'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Частичный индекс: только открытые задачи с дедлайном
+    op.create_index(
+        'ix_cards_open_due_date',
+        'cards',
+        ['due_date'],
+        unique=False,
+        postgresql_where=sa.text('completed = false AND due_date IS NOT NULL')
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_cards_open_due_date', table_name='cards')
@@ -0,0 +1,56 @@
+"""add_full_text_search_vectors
+
+Revision ID: 9f3c61a8e2b7
+Revises: 5b0e7c2d9a14
+Create Date: 2026-10-19 10:50:03.881247
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9f3c61a8e2b7'
+down_revision = '5b0e7c2d9a14'
+branch_labels = None
+depends_on = None
+
+
+def _weighted(field: str, weight: str, config: str) -> str:
+    return f"setweight(to_tsvector('{config}'::regconfig, coalesce({field}, '')), '{weight}')"
+
+
+def _vector(*fields) -> str:
+    # Каждое поле индексируется с русской и английской конфигурациями
+    parts = []
+    for field, weight in fields:
+        parts.append(_weighted(field, weight, 'russian'))
+        parts.append(_weighted(field, weight, 'english'))
+    return " || ".join(parts)
+
+
+# Поля поиска и их веса (A - заголовки, B - описания, C - примечания)
+SEARCH_VECTORS = {
+    'boards': _vector(('title', 'A'), ('description', 'B')),
+    'cards': _vector(('title', 'A'), ('description', 'B')),
+    'contacts': " || ".join([
+        _vector(('company_name', 'A'), ('contact_person', 'A'), ('notes', 'C')),
+        _weighted('email', 'B', 'simple'),
+    ]),
+    'card_comments': _vector(('content', 'B')),
+}
+
+
+def upgrade() -> None:
+    for table, expression in SEARCH_VECTORS.items():
+        op.execute(
+            f"ALTER TABLE {table} ADD COLUMN search_vector tsvector "
+            f"GENERATED ALWAYS AS ({expression}) STORED"
+        )
+        op.create_index(f'ix_{table}_search_vector', table, ['search_vector'], unique=False, postgresql_using='gin')
+
+
+def downgrade() -> None:
+    for table in reversed(list(SEARCH_VECTORS)):
+        op.drop_index(f'ix_{table}_search_vector', table_name=table)
+        op.drop_column(table, 'search_vector')
@@ -0,0 +1,43 @@
+"""add_trigram_search_indexes
+
+Revision ID: c47d2e91b6f0
+Revises: 9f3c61a8e2b7
+Create Date: 2026-10-19 11:10:26.114358
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c47d2e91b6f0'
+down_revision = '9f3c61a8e2b7'
+branch_labels = None
+depends_on = None
+
+
+# Поля с подстрочным поиском (ILIKE '%q%' и поиск с опечатками)
+TRIGRAM_INDEXES = [
+    ('contacts', 'company_name'),
+    ('contacts', 'contact_person'),
+    ('contacts', 'email'),
+    ('cards', 'title'),
+]
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for table, column in TRIGRAM_INDEXES:
+        op.create_index(
+            f'ix_{table}_{column}_trgm',
+            table,
+            [column],
+            unique=False,
+            postgresql_using='gin',
+            postgresql_ops={column: 'gin_trgm_ops'}
+        )
+
+
+def downgrade() -> None:
+    for table, column in reversed(TRIGRAM_INDEXES):
+        op.drop_index(f'ix_{table}_{column}_trgm', table_name=table)
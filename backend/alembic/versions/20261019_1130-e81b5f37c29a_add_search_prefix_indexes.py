@@ -0,0 +1,38 @@
+"""add_search_prefix_indexes
+
+Revision ID: e81b5f37c29a
+Revises: c47d2e91b6f0
+Create Date: 2026-10-19 11:30:48.662930
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e81b5f37c29a'
+down_revision = 'c47d2e91b6f0'
+branch_labels = None
+depends_on = None
+
+
+# Поля подсказок (/search/suggest): префиксы слов без морфологии
+PREFIX_INDEXES = [
+    ('boards', 'title'),
+    ('cards', 'title'),
+    ('contacts', 'company_name'),
+    ('contacts', 'contact_person'),
+]
+
+
+def upgrade() -> None:
+    for table, column in PREFIX_INDEXES:
+        op.execute(
+            f"CREATE INDEX ix_{table}_{column}_prefix ON {table} "
+            f"USING gin (to_tsvector('simple'::regconfig, coalesce({column}, '')))"
+        )
+
+
+def downgrade() -> None:
+    for table, column in reversed(PREFIX_INDEXES):
+        op.drop_index(f'ix_{table}_{column}_prefix', table_name=table)
@@ -0,0 +1,49 @@
+"""add_chat_and_file_search_indexes
+
+Revision ID: 2a6d9e4c71f8
+Revises: e81b5f37c29a
+Create Date: 2026-10-19 11:50:39.502176
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2a6d9e4c71f8'
+down_revision = 'e81b5f37c29a'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Полнотекстовый поиск по сообщениям чата
+    op.execute(
+        "ALTER TABLE chat_messages ADD COLUMN search_vector tsvector GENERATED ALWAYS AS ("
+        "setweight(to_tsvector('russian'::regconfig, coalesce(content, '')), 'B') || "
+        "setweight(to_tsvector('english'::regconfig, coalesce(content, '')), 'B')"
+        ") STORED"
+    )
+    op.create_index('ix_chat_messages_search_vector', 'chat_messages', ['search_vector'], unique=False, postgresql_using='gin')
+    
+    # Беседы участника и сообщения беседы по порядку
+    op.create_index(op.f('ix_chat_participants_user_id'), 'chat_participants', ['user_id'], unique=False)
+    op.create_index('ix_chat_messages_conversation_id_id', 'chat_messages', ['conversation_id', 'id'], unique=False)
+    
+    # Подстрочный поиск по именам файлов
+    op.create_index(
+        'ix_files_original_filename_trgm',
+        'files',
+        ['original_filename'],
+        unique=False,
+        postgresql_using='gin',
+        postgresql_ops={'original_filename': 'gin_trgm_ops'}
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_files_original_filename_trgm', table_name='files')
+    op.drop_index('ix_chat_messages_conversation_id_id', table_name='chat_messages')
+    op.drop_index(op.f('ix_chat_participants_user_id'), table_name='chat_participants')
+    op.drop_index('ix_chat_messages_search_vector', table_name='chat_messages')
+    op.drop_column('chat_messages', 'search_vector')
@@ -0,0 +1,57 @@
+"""add_chat_conversation_summaries
+
+Revision ID: 6c0e4b9a27d3
+Revises: 2a6d9e4c71f8
+Create Date: 2026-10-19 12:10:12.418203
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6c0e4b9a27d3'
+down_revision = '2a6d9e4c71f8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Последнее сообщение беседы
+    op.add_column('chat_conversations', sa.Column('last_message_id', sa.Integer(), nullable=True))
+    op.add_column('chat_conversations', sa.Column('last_message_at', sa.DateTime(timezone=True), nullable=True))
+    op.create_foreign_key(
+        'fk_chat_conversations_last_message_id', 'chat_conversations', 'chat_messages',
+        ['last_message_id'], ['id'], ondelete='SET NULL'
+    )
+    op.create_index(op.f('ix_chat_conversations_last_message_at'), 'chat_conversations', ['last_message_at'], unique=False)
+    
+    # Счетчик непрочитанных у участника
+    op.add_column('chat_participants', sa.Column('unread_count', sa.Integer(), server_default='0', nullable=False))
+    
+    # Заполнение по существующим сообщениям
+    op.execute(
+        "UPDATE chat_conversations c SET last_message_id = m.id, last_message_at = m.created_at "
+        "FROM ("
+        "  SELECT DISTINCT ON (conversation_id) conversation_id, id, created_at "
+        "  FROM chat_messages ORDER BY conversation_id, created_at DESC, id DESC"
+        ") m WHERE m.conversation_id = c.id"
+    )
+    op.execute(
+        "UPDATE chat_participants p SET unread_count = u.unread "
+        "FROM ("
+        "  SELECT p2.conversation_id, p2.user_id, count(*) AS unread "
+        "  FROM chat_participants p2 "
+        "  JOIN chat_messages m ON m.conversation_id = p2.conversation_id "
+        "  WHERE m.sender_id <> p2.user_id AND m.is_read = false "
+        "  GROUP BY p2.conversation_id, p2.user_id"
+        ") u WHERE u.conversation_id = p.conversation_id AND u.user_id = p.user_id"
+    )
+
+
+def downgrade() -> None:
+    op.drop_column('chat_participants', 'unread_count')
+    op.drop_index(op.f('ix_chat_conversations_last_message_at'), table_name='chat_conversations')
+    op.drop_constraint('fk_chat_conversations_last_message_id', 'chat_conversations', type_='foreignkey')
+    op.drop_column('chat_conversations', 'last_message_at')
+    op.drop_column('chat_conversations', 'last_message_id')
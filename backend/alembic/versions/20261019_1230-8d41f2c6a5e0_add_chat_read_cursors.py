@@ -0,0 +1,54 @@
+"""add_chat_read_cursors
+
+Revision ID: 8d41f2c6a5e0
+Revises: 6c0e4b9a27d3
+Create Date: 2026-10-19 12:30:47.106392
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8d41f2c6a5e0'
+down_revision = '6c0e4b9a27d3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('chat_participants', sa.Column('last_read_message_id', sa.Integer(), server_default='0', nullable=False))
+    
+    # Курсор по флагам is_read: перед первым непрочитанным сообщением собеседников,
+    # если таких нет - на последнем сообщении беседы
+    op.execute(
+        "UPDATE chat_participants p SET last_read_message_id = coalesce(("
+        "  SELECT min(m.id) - 1 FROM chat_messages m "
+        "  WHERE m.conversation_id = p.conversation_id AND m.sender_id <> p.user_id "
+        "  AND coalesce(m.is_read, false) = false"
+        "), ("
+        "  SELECT max(m.id) FROM chat_messages m WHERE m.conversation_id = p.conversation_id"
+        "), 0)"
+    )
+    
+    # Счетчики непрочитанных по курсорам
+    op.execute(
+        "UPDATE chat_participants p SET unread_count = ("
+        "  SELECT count(*) FROM chat_messages m "
+        "  WHERE m.conversation_id = p.conversation_id AND m.id > p.last_read_message_id "
+        "  AND m.sender_id <> p.user_id"
+        ")"
+    )
+
+
+def downgrade() -> None:
+    # Флаги is_read по курсорам (в групповых чатах - по самому дальнему курсору)
+    op.execute(
+        "UPDATE chat_messages m SET is_read = true "
+        "WHERE EXISTS ("
+        "  SELECT 1 FROM chat_participants p "
+        "  WHERE p.conversation_id = m.conversation_id AND p.user_id <> m.sender_id "
+        "  AND p.last_read_message_id >= m.id"
+        ")"
+    )
+    op.drop_column('chat_participants', 'last_read_message_id')
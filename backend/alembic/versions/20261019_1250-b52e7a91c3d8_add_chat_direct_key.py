@@ -0,0 +1,44 @@
+"""add_chat_direct_key
+
+Revision ID: b52e7a91c3d8
+Revises: 8d41f2c6a5e0
+Create Date: 2026-10-19 12:50:21.733914
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b52e7a91c3d8'
+down_revision = '8d41f2c6a5e0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('chat_conversations', sa.Column('direct_key', sa.String(), nullable=True))
+    
+    # Ключи существующих личных чатов. Если у пары уже несколько чатов,
+    # ключ получает самый ранний, остальные остаются без ключа.
+    op.execute(
+        "UPDATE chat_conversations c SET direct_key = k.direct_key "
+        "FROM ("
+        "  SELECT conversation_id, direct_key, "
+        "         row_number() OVER (PARTITION BY direct_key ORDER BY conversation_id) AS position "
+        "  FROM ("
+        "    SELECT p.conversation_id, min(p.user_id) || ':' || max(p.user_id) AS direct_key "
+        "    FROM chat_participants p "
+        "    JOIN chat_conversations c2 ON c2.id = p.conversation_id AND c2.type = 'direct' "
+        "    GROUP BY p.conversation_id "
+        "    HAVING count(*) BETWEEN 1 AND 2"
+        "  ) keys"
+        ") k WHERE k.conversation_id = c.id AND k.position = 1"
+    )
+    
+    op.create_index(op.f('ix_chat_conversations_direct_key'), 'chat_conversations', ['direct_key'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_chat_conversations_direct_key'), table_name='chat_conversations')
+    op.drop_column('chat_conversations', 'direct_key')
@@ -0,0 +1,42 @@
+"""add_user_unread_counters
+
+Revision ID: e3f7a1c59b26
+Revises: b52e7a91c3d8
+Create Date: 2026-10-19 13:10:42.118305
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e3f7a1c59b26'
+down_revision = 'b52e7a91c3d8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'user_unread_counters',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('notifications', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('chat', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('user_id')
+    )
+    
+    # Начальные значения по текущим данным
+    op.execute(
+        "INSERT INTO user_unread_counters (user_id, notifications, chat) "
+        "SELECT u.id, "
+        "       (SELECT count(*) FROM notifications n "
+        "        WHERE n.user_id = u.id AND (n.is_read = false OR n.is_read IS NULL)), "
+        "       (SELECT coalesce(sum(p.unread_count), 0) FROM chat_participants p WHERE p.user_id = u.id) "
+        "FROM users u"
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('user_unread_counters')
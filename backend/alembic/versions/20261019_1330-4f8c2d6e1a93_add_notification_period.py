@@ -0,0 +1,34 @@
+"""add_notification_period
+
+Revision ID: 4f8c2d6e1a93
+Revises: e3f7a1c59b26
+Create Date: 2026-10-19 13:30:17.604821
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4f8c2d6e1a93'
+down_revision = 'e3f7a1c59b26'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('notifications', sa.Column('period', sa.String(), nullable=True))
+    
+    # Уже созданные уведомления остаются без периода и индексом не ограничиваются
+    op.create_index(
+        'uq_notifications_period',
+        'notifications',
+        ['user_id', 'card_id', 'type', 'period'],
+        unique=True,
+        postgresql_where=sa.text('period IS NOT NULL')
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('uq_notifications_period', table_name='notifications')
+    op.drop_column('notifications', 'period')
@@ -0,0 +1,34 @@
+"""add_notification_digests
+
+Revision ID: c91b4f7e3d52
+Revises: a7d3e5b2c814
+Create Date: 2026-10-19 14:10:36.559210
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c91b4f7e3d52'
+down_revision = 'a7d3e5b2c814'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('notifications', sa.Column('payload', sa.JSON(), nullable=True))
+    op.add_column('notifications_archive', sa.Column('payload', sa.JSON(), nullable=True))
+    op.create_index(
+        'uq_notifications_digest',
+        'notifications',
+        ['user_id', 'type', 'period'],
+        unique=True,
+        postgresql_where=sa.text('card_id IS NULL AND period IS NOT NULL')
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('uq_notifications_digest', table_name='notifications')
+    op.drop_column('notifications_archive', 'payload')
+    op.drop_column('notifications', 'payload')
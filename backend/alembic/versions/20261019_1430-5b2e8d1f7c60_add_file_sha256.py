@@ -0,0 +1,26 @@
+"""add_file_sha256
+
+Revision ID: 5b2e8d1f7c60
+Revises: c91b4f7e3d52
+Create Date: 2026-10-19 14:30:51.402877
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5b2e8d1f7c60'
+down_revision = 'c91b4f7e3d52'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('files', sa.Column('sha256', sa.String(length=64), nullable=True))
+    op.create_index(op.f('ix_files_sha256'), 'files', ['sha256'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_files_sha256'), table_name='files')
+    op.drop_column('files', 'sha256')
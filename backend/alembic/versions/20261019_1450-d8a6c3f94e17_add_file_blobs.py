@@ -0,0 +1,38 @@
+"""add_file_blobs
+
+Revision ID: d8a6c3f94e17
+Revises: 5b2e8d1f7c60
+Create Date: 2026-10-19 14:50:12.918340
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd8a6c3f94e17'
+down_revision = '5b2e8d1f7c60'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'file_blobs',
+        sa.Column('sha256', sa.String(length=64), nullable=False),
+        sa.Column('file_size', sa.BigInteger(), nullable=False),
+        sa.Column('ref_count', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.PrimaryKeyConstraint('sha256')
+    )
+    
+    # Файлы на диске пока лежат по старым путям: хеш сбрасывается, и фоновая
+    # задача (app.tasks.file_storage) пересчитывает его и переносит файлы
+    # в хранилище по хешу порциями
+    op.execute("UPDATE files SET sha256 = NULL")
+    op.create_foreign_key('fk_files_sha256_file_blobs', 'files', 'file_blobs', ['sha256'], ['sha256'])
+
+
+def downgrade() -> None:
+    op.drop_constraint('fk_files_sha256_file_blobs', 'files', type_='foreignkey')
+    op.drop_table('file_blobs')
@@ -0,0 +1,29 @@
+"""add_stats_rollup_dirty_days
+
+Revision ID: 6e1b9d4a2f37
+Revises: d8a6c3f94e17
+Create Date: 2026-10-19 15:10:37.204518
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6e1b9d4a2f37'
+down_revision = 'd8a6c3f94e17'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('stats_rollup_dirty_days',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('stats_rollup_dirty_days')
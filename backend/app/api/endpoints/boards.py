@@ -21,6 +21,7 @@ from app.models.board import Board, Column, Card, CardComment, CardChecklist, Ca
 from app.models.file import File
 from app.models.contact import Contact
 from app.models.calendar_event import CalendarEvent
+from app.services.deadlines import count_overdue, is_overdue
 from app.schemas.board import (
     Board as BoardSchema,
     BoardCreate,
@@ -368,7 +369,8 @@ async def export_board_pdf(
     # Подсчитываем метрики проекта
     total_tasks = sum(len(column.cards) for column in board.columns)
     completed_tasks = sum(1 for column in board.columns for card in column.cards if card.completed)
-    overdue_tasks = sum(1 for column in board.columns for card in column.cards if card.due_date and card.due_date < datetime.utcnow() and not card.completed)
+    now = datetime.utcnow()
+    overdue_tasks = count_overdue(db, now, board_id=board.id)
     completion_percentage = (completed_tasks / total_tasks * 100) if total_tasks > 0 else 0
     
     # Подсчитываем задачи по статусам
@@ -501,7 +503,7 @@ async def export_board_pdf(
                 'planned_end': card.due_date if card.due_date else None,
                 'actual_completion': card.completed_at if card.completed else None,
                 'status': 'Выполнена' if card.completed else 'В работе',
-                'is_overdue': card.due_date and card.due_date < datetime.utcnow() and not card.completed,
+                'is_overdue': is_overdue(card.due_date, card.completed, now),
                 'priority': str(card.priority) if card.priority else 'medium',
                 'comments': [],
                 'checklists': [],
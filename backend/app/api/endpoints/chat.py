@@ -1,25 +1,75 @@
 """
 Chat endpoints
 """
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+import asyncio
+import json
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from fastapi import APIRouter, Depends, HTTPException, Query, WebSocket, WebSocketDisconnect, status
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, joinedload, selectinload
+from starlette.concurrency import run_in_threadpool
 
-from app.core.database import get_db
-from app.core.security import get_current_user
+from app.core.config import settings
+from app.core.database import SessionLocal, get_db
+from app.core.security import decode_token, get_current_user
 from app.models.user import User
-from app.models.chat import ChatConversation, ChatMessage
+from app.models.chat import ChatConversation, ChatMessage, chat_participants
+from app.services import chat_state, unread_counters
+from app.services.event_bus import event_bus
+from app.services.realtime import Connection, registry
 from app.schemas.chat import (
     ChatConversation as ChatConversationSchema,
     ChatConversationCreate,
     ChatConversationList,
     ChatMessage as ChatMessageSchema,
     ChatMessageCreate,
-    ChatMessageWithSender
+    ChatMessageWithSender,
+    ChatMessagePage
 )
 
 router = APIRouter()
 
+MESSAGE_PAGE_SIZE = 50
+
+
+def _message_page(db: Session, conversation_id: int, before: Optional[int],
+                  limit: int) -> Tuple[List[ChatMessage], Optional[int]]:
+    """
+    Страница сообщений перед before по индексу (conversation_id, id),
+    в хронологическом порядке, с отправителями одним запросом.
+    Курсор следующей (более старой) страницы - id самого раннего сообщения.
+    """
+    query = db.query(ChatMessage).options(
+        selectinload(ChatMessage.sender)
+    ).filter(ChatMessage.conversation_id == conversation_id)
+    if before is not None:
+        query = query.filter(ChatMessage.id < before)
+    messages = query.order_by(ChatMessage.id.desc()).limit(limit + 1).all()
+    
+    next_cursor = None
+    if len(messages) > limit:
+        messages = messages[:limit]
+        next_cursor = messages[-1].id
+    messages.reverse()
+    return messages, next_cursor
+
+
+def _publish(db: Optional[Session], user_ids: Iterable[int], event: Dict[str, Any]) -> None:
+    """Событие подключенным к /chat/ws участникам (доставляется после фиксации транзакции db)"""
+    event_bus.publish(db, "chat", user_ids, event)
+
+
+def _publish_read_state(db: Session, conversation: ChatConversation, user_id: int) -> None:
+    last_read_message_id, unread_count = chat_state.read_state(db, conversation.id, user_id)
+    _publish(db, [p.id for p in conversation.participants], {
+        "type": "read",
+        "conversation_id": conversation.id,
+        "user_id": user_id,
+        "last_read_message_id": last_read_message_id,
+        "unread_count": unread_count,
+    })
+
 
 @router.get("/conversations", response_model=List[ChatConversationList])
 async def get_conversations(
@@ -28,41 +78,60 @@ async def get_conversations(
 ):
     """
     Получить список всех чатов пользователя
+    
+    Последнее сообщение и счетчик непрочитанных хранятся денормализованно
+    (см. app.services.chat_state): беседы, счетчики и последние сообщения
+    читаются одним запросом, участники всех бесед - еще одним.
     """
-    # Get all conversations where user is a participant
-    conversations = db.query(ChatConversation).filter(
-        ChatConversation.participants.contains(current_user)
+    rows = db.query(
+        ChatConversation,
+        chat_participants.c.unread_count,
+        chat_participants.c.last_read_message_id,
+        ChatMessage
+    ).join(
+        chat_participants,
+        (chat_participants.c.conversation_id == ChatConversation.id)
+        & (chat_participants.c.user_id == current_user.id)
+    ).outerjoin(
+        ChatMessage, ChatMessage.id == ChatConversation.last_message_id
+    ).options(
+        selectinload(ChatConversation.participants),
+        joinedload(ChatMessage.sender)
+    ).order_by(
+        ChatConversation.last_message_at.desc().nullslast(),
+        ChatConversation.id.desc()
     ).all()
     
     result = []
-    for conv in conversations:
-        # Get unread count
-        unread_count = db.query(ChatMessage).filter(
-            ChatMessage.conversation_id == conv.id,
-            ChatMessage.sender_id != current_user.id,
-            ChatMessage.is_read == False
-        ).count()
-        
-        # Get last message
-        last_message = db.query(ChatMessage).filter(
-            ChatMessage.conversation_id == conv.id
-        ).order_by(ChatMessage.created_at.desc()).first()
-        
+    for conv, unread_count, last_read_message_id, last_message in rows:
         result.append(ChatConversationList(
             id=conv.id,
             type=conv.type,
             title=conv.title,
             created_at=conv.created_at,
             updated_at=conv.updated_at,
+            last_message_at=conv.last_message_at,
             participants=conv.participants,
             messages=[last_message] if last_message else [],
             unread_count=unread_count,
+            last_read_message_id=last_read_message_id,
             last_message=last_message
         ))
     
     return result
 
 
+@router.get("/unread-count", response_model=dict)
+async def get_unread_count(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Получить количество непрочитанных сообщений во всех чатах
+    """
+    return {"count": unread_counters.get(db, current_user.id)["chat"]}
+
+
 @router.post("/conversations", response_model=ChatConversationSchema, status_code=status.HTTP_201_CREATED)
 async def create_conversation(
     conversation_data: ChatConversationCreate,
@@ -80,29 +149,38 @@ async def create_conversation(
                 detail="Direct chat должен иметь ровно одного собеседника"
             )
     
-    # Get all participants including current user
-    participant_ids = [current_user.id] + conversation_data.participant_ids
-    participants = db.query(User).filter(User.id.in_(participant_ids)).all()
-    
-    # Check if direct chat already exists
+    # Check if direct chat already exists (одна проверка по уникальному индексу)
+    direct_key = None
     if conversation_data.type == "direct":
-        existing = db.query(ChatConversation).filter(
-            ChatConversation.type == "direct",
-            ChatConversation.participants.contains(current_user),
-            ChatConversation.participants.contains(participants[0])
-        ).first()
+        direct_key = chat_state.direct_key(current_user.id, conversation_data.participant_ids[0])
+        existing = db.query(ChatConversation).filter(ChatConversation.direct_key == direct_key).first()
         if existing:
             return existing
     
+    # Get all participants including current user
+    participant_ids = [current_user.id] + conversation_data.participant_ids
+    participants = db.query(User).filter(User.id.in_(participant_ids)).all()
+    
     # Create new conversation
     conversation = ChatConversation(
         type=conversation_data.type,
-        title=conversation_data.title
+        title=conversation_data.title,
+        direct_key=direct_key
     )
     conversation.participants = participants
     
     db.add(conversation)
-    db.commit()
+    try:
+        db.commit()
+    except IntegrityError:
+        # Тот же личный чат одновременно создан другим запросом
+        db.rollback()
+        existing = None
+        if direct_key is not None:
+            existing = db.query(ChatConversation).filter(ChatConversation.direct_key == direct_key).first()
+        if existing is None:
+            raise
+        return existing
     db.refresh(conversation)
     
     return conversation
@@ -115,7 +193,8 @@ async def get_conversation(
     current_user: User = Depends(get_current_user)
 ):
     """
-    Получить чат по ID
+    Получить чат по ID: участники и последняя страница сообщений
+    (более ранние - GET /conversations/{id}/messages?before=...)
     """
     conversation = db.query(ChatConversation).filter(ChatConversation.id == conversation_id).first()
     
@@ -132,14 +211,52 @@ async def get_conversation(
             detail="Нет доступа к этому чату"
         )
     
-    # Load messages with senders
-    messages = db.query(ChatMessage).filter(
-        ChatMessage.conversation_id == conversation_id
-    ).order_by(ChatMessage.created_at.asc()).all()
+    messages, next_cursor = _message_page(db, conversation_id, None, MESSAGE_PAGE_SIZE)
+    
+    return ChatConversationSchema(
+        id=conversation.id,
+        type=conversation.type,
+        title=conversation.title,
+        created_at=conversation.created_at,
+        updated_at=conversation.updated_at,
+        last_message_at=conversation.last_message_at,
+        participants=conversation.participants,
+        messages=messages,
+        messages_next_cursor=next_cursor
+    )
+
+
+@router.get("/conversations/{conversation_id}/messages", response_model=ChatMessagePage)
+async def get_messages(
+    conversation_id: int,
+    before: Optional[int] = Query(None, description="id самого раннего сообщения предыдущей страницы"),
+    limit: int = Query(MESSAGE_PAGE_SIZE, ge=1, le=200),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    История сообщений чата постранично, от новых страниц к старым
+    """
+    is_participant = db.query(chat_participants).filter(
+        chat_participants.c.conversation_id == conversation_id,
+        chat_participants.c.user_id == current_user.id
+    ).first()
+    
+    if not is_participant:
+        conversation_exists = db.query(ChatConversation.id).filter(ChatConversation.id == conversation_id).first()
+        if not conversation_exists:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Чат не найден"
+            )
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Нет доступа к этому чату"
+        )
     
-    conversation.messages = messages
+    messages, next_cursor = _message_page(db, conversation_id, before, limit)
     
-    return conversation
+    return ChatMessagePage(items=messages, next_cursor=next_cursor)
 
 
 @router.post("/conversations/{conversation_id}/messages", response_model=ChatMessageSchema, status_code=status.HTTP_201_CREATED)
@@ -180,6 +297,14 @@ async def send_message(
     # Update conversation timestamp
     from datetime import datetime
     conversation.updated_at = datetime.utcnow()
+    chat_state.record_message(db, conversation, message)
+    
+    db.refresh(message)
+    _publish(db, [p.id for p in conversation.participants], {
+        "type": "message",
+        "conversation_id": conversation_id,
+        "message": ChatMessageWithSender.model_validate(message).model_dump(mode="json"),
+    })
     
     db.commit()
     db.refresh(message)
@@ -212,7 +337,8 @@ async def mark_message_read(
             detail="Нет доступа к этому сообщению"
         )
     
-    message.is_read = True
+    chat_state.mark_read(db, message.conversation_id, current_user.id, message.id)
+    _publish_read_state(db, conversation, current_user.id)
     db.commit()
     
     return {"message": "Сообщение помечено как прочитанное"}
@@ -242,11 +368,9 @@ async def mark_all_read(
             detail="Нет доступа к этому чату"
         )
     
-    # Mark all messages as read
-    db.query(ChatMessage).filter(
-        ChatMessage.conversation_id == conversation_id,
-        ChatMessage.sender_id != current_user.id
-    ).update({"is_read": True})
+    # Курсор прочтения - до последнего сообщения беседы
+    chat_state.mark_read(db, conversation_id, current_user.id, conversation.last_message_id)
+    _publish_read_state(db, conversation, current_user.id)
     
     db.commit()
     
@@ -277,8 +401,127 @@ async def delete_conversation(
             detail="Нет доступа к этому чату"
         )
     
+    participant_ids = [p.id for p in conversation.participants]
     db.delete(conversation)
+    db.flush()
+    # Непрочитанное удаленной беседы уходит из счетчиков участников
+    unread_counters.recount_chat(db, participant_ids)
     db.commit()
     
     return {"message": "Чат удален"}
 
+
+
+def _websocket_user_id(token: str) -> Optional[int]:
+    """Пользователь по JWT (как get_current_user); None - доступ запрещен"""
+    try:
+        user_id = int(decode_token(token).get("sub"))
+    except (HTTPException, TypeError, ValueError):
+        return None
+    
+    db = SessionLocal()
+    try:
+        user = db.query(User).filter(User.id == user_id).first()
+        return user.id if user is not None and user.is_active else None
+    finally:
+        db.close()
+
+
+def _typing_recipients(conversation_id: int, user_id: int) -> Optional[List[int]]:
+    """Остальные участники беседы; None, если пользователь в ней не участвует"""
+    db = SessionLocal()
+    try:
+        participant_ids = [row[0] for row in db.query(chat_participants.c.user_id).filter(
+            chat_participants.c.conversation_id == conversation_id
+        ).all()]
+    finally:
+        db.close()
+    if user_id not in participant_ids:
+        return None
+    return [participant_id for participant_id in participant_ids if participant_id != user_id]
+
+
+async def _send_events(websocket: WebSocket, connection: Connection) -> None:
+    while True:
+        event = await connection.queue.get()
+        await websocket.send_json(event)
+
+
+async def _close_websocket(websocket: WebSocket, code: int) -> None:
+    try:
+        await websocket.close(code=code)
+    except RuntimeError:
+        pass  # подключение уже закрыто
+
+
+@router.websocket("/ws")
+async def chat_websocket(websocket: WebSocket, token: str = Query(...)):
+    """
+    Доставка событий чата в реальном времени
+    
+    Подключение: /chat/ws?token=<JWT>. Сервер присылает события
+    {"type": "message" | "read" | "typing", "conversation_id": ..., ...}
+    по беседам пользователя. Клиент может отправлять
+    {"type": "typing", "conversation_id": ...} и {"type": "ping"}.
+    Запросы к базе выполняются в пуле потоков, чтобы не блокировать
+    event loop.
+    """
+    user_id = await run_in_threadpool(_websocket_user_id, token)
+    if user_id is None:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    
+    await websocket.accept()
+    
+    def close_slow_client(_: Connection) -> None:
+        # Клиент не успевает забирать события - пусть переподключится
+        asyncio.ensure_future(_close_websocket(websocket, status.WS_1013_TRY_AGAIN_LATER))
+    
+    def sender_done(task: asyncio.Task) -> None:
+        if task.cancelled():
+            return
+        error = task.exception()
+        if error is not None and not connection.closed and not isinstance(error, WebSocketDisconnect):
+            print(f"Ошибка отправки событий чата: {error}")
+        # Без отправки событий подключение бесполезно - пусть переподключится
+        connection.closed = True
+        asyncio.ensure_future(_close_websocket(websocket, status.WS_1011_INTERNAL_ERROR))
+    
+    connection = Connection(user_id, "chat", on_overflow=close_slow_client)
+    registry.register(connection)
+    sender = asyncio.ensure_future(_send_events(websocket, connection))
+    sender.add_done_callback(sender_done)
+    typing_sent: Dict[int, float] = {}
+    
+    try:
+        while True:
+            try:
+                data = json.loads(await websocket.receive_text())
+            except ValueError:
+                connection.offer({"type": "error", "detail": "Некорректный JSON"})
+                continue
+            if not isinstance(data, dict):
+                continue
+            
+            if data.get("type") == "ping":
+                connection.offer({"type": "pong"})
+            elif data.get("type") == "typing" and isinstance(data.get("conversation_id"), int):
+                conversation_id = data["conversation_id"]
+                now = time.monotonic()
+                if now - typing_sent.get(conversation_id, 0.0) < settings.CHAT_TYPING_INTERVAL_SECONDS:
+                    continue
+                typing_sent[conversation_id] = now
+                recipients = await run_in_threadpool(_typing_recipients, conversation_id, user_id)
+                if recipients is None:
+                    connection.offer({"type": "error", "detail": "Нет доступа к этому чату"})
+                    continue
+                _publish(None, recipients, {
+                    "type": "typing",
+                    "conversation_id": conversation_id,
+                    "user_id": user_id,
+                })
+    except WebSocketDisconnect:
+        pass
+    finally:
+        registry.unregister(connection)
+        sender.cancel()
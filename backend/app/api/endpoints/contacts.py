@@ -10,6 +10,7 @@ from app.core.security import get_current_user, check_manager_or_admin
 from app.models.user import User
 from app.models.contact import Contact, contact_shared_users
 from app.schemas.contact import Contact as ContactSchema, ContactCreate, ContactUpdate
+from app.services.search import trigram
 
 router = APIRouter()
 
@@ -35,12 +36,7 @@ async def get_contacts(
     )
     
     if search:
-        search_pattern = f"%{search}%"
-        query = query.filter(
-            (Contact.company_name.ilike(search_pattern)) |
-            (Contact.contact_person.ilike(search_pattern)) |
-            (Contact.email.ilike(search_pattern))
-        )
+        query = trigram.filter_contacts(db, query, search)
     
     contacts = query.offset(skip).limit(limit).all()
     return contacts
@@ -2,7 +2,6 @@
 File management endpoints
 """
 import os
-import uuid
 from typing import List, Optional
 from datetime import datetime, timedelta
 from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File as FastAPIFile, Form
@@ -15,6 +14,7 @@ from app.core.config import settings
 from app.models.user import User
 from app.models.file import File
 from app.schemas.file import File as FileSchema
+from app.services.file_storage import UploadTooLarge, delete_file_record, store_upload
 
 router = APIRouter()
 
@@ -51,28 +51,16 @@ async def upload_file(
     Загрузить файл
     retention_days: Количество дней хранения файла (None = бессрочно)
     """
-    # Check file size
-    file_content = await file.read()
-    file_size = len(file_content)
-    
-    if file_size > settings.MAX_UPLOAD_SIZE:
+    # Save file: порциями во временный файл с проверкой размера по ходу,
+    # затем в хранилище по хешу содержимого (одинаковые файлы хранятся один раз)
+    try:
+        file_path, file_size, sha256 = await store_upload(db, file)
+    except UploadTooLarge:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"Файл слишком большой. Максимальный размер: {settings.MAX_UPLOAD_SIZE / (1024*1024)}MB"
         )
     
-    # Generate unique filename
-    file_ext = os.path.splitext(file.filename)[1]
-    unique_filename = f"{uuid.uuid4()}{file_ext}"
-    file_path = os.path.join(settings.UPLOAD_DIR, unique_filename)
-    
-    # Ensure upload directory exists
-    os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
-    
-    # Save file
-    with open(file_path, "wb") as f:
-        f.write(file_content)
-    
     # Calculate expiration date - всегда устанавливаем срок, по умолчанию полгода
     expires_at = None
     if retention_days is not None:
@@ -83,11 +71,12 @@ async def upload_file(
     
     # Create file record
     file_record = File(
-        filename=unique_filename,
+        filename=sha256,
         original_filename=file.filename,
         file_path=file_path,
         mime_type=file.content_type,
         file_size=file_size,
+        sha256=sha256,
         card_id=card_id,
         uploaded_by_id=current_user.id,
         retention_days=retention_days,
@@ -146,12 +135,8 @@ async def delete_file(
             detail="Файл не найден"
         )
     
-    # Delete physical file
-    if os.path.exists(file_record.file_path):
-        os.remove(file_record.file_path)
-    
-    # Delete database record
-    db.delete(file_record)
+    # Delete database record; содержимое удаляется вместе с последней ссылкой на него
+    delete_file_record(db, file_record)
     db.commit()
     
     return None
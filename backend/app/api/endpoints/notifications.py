@@ -1,19 +1,49 @@
 """
 Notification endpoints
 """
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, status
+import asyncio
+import json
+from typing import List, Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, status
+from fastapi.responses import StreamingResponse
+from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
 from datetime import datetime
 
+from app.core.config import settings
 from app.core.database import get_db
 from app.core.security import get_current_user
 from app.models.user import User
 from app.models.notification import Notification
 from app.schemas.notification import Notification as NotificationSchema, NotificationUpdate
+from app.services.notification_events import CHANNEL, notification_event
+from app.services.realtime import Connection, registry
+from app.services import notification_digest, unread_counters
 
 router = APIRouter()
 
+# EventSource не умеет передавать заголовки - токен можно передать в ?token=
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"{settings.API_V1_STR}/auth/login", auto_error=False)
+
+
+async def get_stream_user(
+    header_token: Optional[str] = Depends(optional_oauth2_scheme),
+    token: Optional[str] = Query(None),
+    db: Session = Depends(get_db)
+) -> User:
+    """Пользователь потока по заголовку Authorization или параметру token"""
+    return await get_current_user(token=header_token or token or "", db=db)
+
+
+def _sse(data: dict, event: Optional[str] = None, event_id: Optional[int] = None) -> str:
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    if event is not None:
+        lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, ensure_ascii=False)}")
+    return "\n".join(lines) + "\n\n"
+
 
 @router.get("/", response_model=List[NotificationSchema])
 async def get_notifications(
@@ -32,7 +62,7 @@ async def get_notifications(
         query = query.filter(Notification.is_read == False)
     
     notifications = query.order_by(Notification.created_at.desc()).offset(skip).limit(limit).all()
-    return notifications
+    return notification_digest.render(db, notifications)
 
 
 @router.get("/unread-count", response_model=dict)
@@ -43,14 +73,97 @@ async def get_unread_count(
     """
     Получить количество непрочитанных уведомлений
     """
-    count = db.query(Notification).filter(
-        Notification.user_id == current_user.id,
-        Notification.is_read == False
-    ).count()
+    count = unread_counters.get(db, current_user.id)["notifications"]
     
     return {"count": count}
 
 
+@router.get("/stream")
+async def notification_stream(
+    request: Request,
+    last_event_id: Optional[int] = Header(None, alias="Last-Event-ID"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_stream_user)
+):
+    """
+    Поток уведомлений (Server-Sent Events)
+    
+    При подключении отправляется событие unread_count с числом
+    непрочитанных, затем - событие notification на каждое новое
+    уведомление (id события - id уведомления). При переподключении
+    браузер передает Last-Event-ID, и пропущенные уведомления досылаются.
+    Пока событий нет, каждые NOTIFICATION_STREAM_HEARTBEAT_SECONDS
+    отправляется комментарий-пинг.
+    
+    Число потоков пользователя ограничено NOTIFICATION_STREAMS_PER_USER
+    в каждом воркере: подключения учитываются в реестре процесса, общего
+    счетчика между воркерами нет.
+    """
+    if registry.connection_count(current_user.id, CHANNEL) >= settings.NOTIFICATION_STREAMS_PER_USER:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Слишком много открытых потоков уведомлений"
+        )
+    
+    # Подключение регистрируется до чтения из базы, чтобы не пропустить
+    # уведомления, созданные между чтением и подпиской
+    connection = Connection(current_user.id, CHANNEL)
+    registry.register(connection)
+    
+    try:
+        unread_count = unread_counters.get(db, current_user.id)["notifications"]
+        missed = []
+        if last_event_id is not None:
+            missed = db.query(Notification).filter(
+                Notification.user_id == current_user.id,
+                Notification.id > last_event_id
+            ).order_by(Notification.id.asc()).limit(settings.NOTIFICATION_STREAM_RESUME_LIMIT).all()
+        initial = [_sse({"count": unread_count}, event="unread_count")]
+        initial += [
+            _sse(notification_event(notification), event="notification", event_id=notification.id)
+            for notification in missed
+        ]
+        last_sent_id = max([last_event_id or 0] + [notification.id for notification in missed])
+    except Exception:
+        registry.unregister(connection)
+        raise
+    finally:
+        # Поток может жить часами - соединение с базой ему не нужно
+        db.close()
+    
+    async def events():
+        nonlocal last_sent_id
+        try:
+            for chunk in initial:
+                yield chunk
+            while not connection.closed or not connection.queue.empty():
+                try:
+                    event = await asyncio.wait_for(
+                        connection.queue.get(), timeout=settings.NOTIFICATION_STREAM_HEARTBEAT_SECONDS
+                    )
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield ": ping\n\n"
+                    continue
+                if "notification" not in event:
+                    continue
+                notification_id = event["notification"]["id"]
+                if notification_id <= last_sent_id:
+                    continue
+                last_sent_id = notification_id
+                yield _sse(event, event="notification", event_id=notification_id)
+            # Очередь переполнилась - поток закрывается, клиент переподключится с Last-Event-ID
+        finally:
+            registry.unregister(connection)
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @router.put("/{notification_id}", response_model=NotificationSchema)
 async def mark_notification_as_read(
     notification_id: int,
@@ -95,6 +208,7 @@ async def mark_all_as_read(
         "is_read": True,
         "read_at": datetime.utcnow()
     })
+    unread_counters.assign(db, {current_user.id: {"notifications": 0}})
     
     db.commit()
     
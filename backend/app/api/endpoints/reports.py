@@ -3,34 +3,35 @@ Reports and statistics endpoints
 """
 from typing import Dict, List
 from datetime import datetime, timedelta
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import func, and_
+from sqlalchemy import func
 
-from app.core.database import get_db
 from app.core.security import get_current_user
 from app.models.user import User, UserRole
-from app.models.board import Board, Card, CardComment, card_assignees, Column
+from app.models.board import Board, Card, card_assignees, Column
 from app.models.contact import Contact
-from app.models.file import File
+from app.services.stats_rollup import get_period_totals, get_daily_series, get_user_period_totals
+from app.services.report_cache import report_cache
+from app.services.deadlines import is_overdue
+from app.services.card_facts import get_card_facts, card_facts_store, PRIORITY_CODES, PRIORITY_BY_CODE
+from app.services.report_export import (
+    EXPORT_DATASETS,
+    EXPORT_FORMATS,
+    column_progress,
+    format_available,
+    flexible_summary_dataset,
+    gantt_dataset,
+    iter_dataset_rows,
+    iter_export,
+)
 
 router = APIRouter()
 
 
-@router.get("/dashboard")
-async def get_dashboard_stats(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
-):
-    """
-    Получить общую статистику для дашборда
-    """
-    # Получаем статистику только если пользователь - администратор или менеджер
-    if current_user.role not in [UserRole.ADMIN, UserRole.MANAGER]:
-        return {
-            "error": "Недостаточно прав доступа"
-        }
-    
+def _build_dashboard_stats(db: Session):
+    """Общая статистика для дашборда"""
     # Общая статистика досок
     total_boards = db.query(Board).filter(Board.is_archived == False).count()
     
@@ -51,9 +52,7 @@ async def get_dashboard_stats(
     
     # Статистика по активным задачам за последние 30 дней
     thirty_days_ago = datetime.utcnow() - timedelta(days=30)
-    recent_cards = db.query(Card).filter(
-        Card.created_at >= thirty_days_ago
-    ).count()
+    recent_cards = get_period_totals(db, thirty_days_ago.date())["cards_created"]
     
     # Статистика по ролям пользователей
     users_by_role = db.query(
@@ -74,17 +73,27 @@ async def get_dashboard_stats(
     }
 
 
-@router.get("/tasks")
-async def get_tasks_stats(
-    db: Session = Depends(get_db),
+@router.get("/dashboard")
+async def get_dashboard_stats(
     current_user: User = Depends(get_current_user)
 ):
     """
-    Получить статистику по задачам
+    Получить общую статистику для дашборда
     """
+    # Получаем статистику только если пользователь - администратор или менеджер
     if current_user.role not in [UserRole.ADMIN, UserRole.MANAGER]:
-        return {"error": "Недостаточно прав доступа"}
+        return {
+            "error": "Недостаточно прав доступа"
+        }
     
+    return await report_cache.get_or_compute(
+        "dashboard", {}, current_user.role,
+        lambda session: _build_dashboard_stats(session)
+    )
+
+
+def _build_tasks_stats(db: Session):
+    """Статистика по задачам"""
     # Задачи по статусам
     tasks_by_status = db.query(
         Card.completed,
@@ -106,12 +115,7 @@ async def get_tasks_stats(
     
     # Задачи созданные за последние 7 дней (по дням)
     seven_days_ago = datetime.utcnow() - timedelta(days=7)
-    tasks_by_date = db.query(
-        func.date(Card.created_at).label('date'),
-        func.count(Card.id).label('count')
-    ).filter(
-        Card.created_at >= seven_days_ago
-    ).group_by(func.date(Card.created_at)).order_by('date').all()
+    tasks_by_date = get_daily_series(db, "cards_created", seven_days_ago.date())
     
     return {
         "by_status": tasks_by_status,
@@ -120,17 +124,24 @@ async def get_tasks_stats(
     }
 
 
-@router.get("/users")
-async def get_users_stats(
-    db: Session = Depends(get_db),
+@router.get("/tasks")
+async def get_tasks_stats(
     current_user: User = Depends(get_current_user)
 ):
     """
-    Получить статистику по пользователям
+    Получить статистику по задачам
     """
     if current_user.role not in [UserRole.ADMIN, UserRole.MANAGER]:
         return {"error": "Недостаточно прав доступа"}
     
+    return await report_cache.get_or_compute(
+        "tasks", {}, current_user.role,
+        lambda session: _build_tasks_stats(session)
+    )
+
+
+def _build_users_stats(db: Session):
+    """Статистика по пользователям"""
     # Пользователи по ролям
     users_by_role = db.query(
         User.role,
@@ -162,42 +173,33 @@ async def get_users_stats(
     }
 
 
-@router.get("/performance")
-async def get_performance_stats(
-    days: int = 30,
-    db: Session = Depends(get_db),
+@router.get("/users")
+async def get_users_stats(
     current_user: User = Depends(get_current_user)
 ):
     """
-    Получить статистику производительности за период
+    Получить статистику по пользователям
     """
     if current_user.role not in [UserRole.ADMIN, UserRole.MANAGER]:
         return {"error": "Недостаточно прав доступа"}
     
+    return await report_cache.get_or_compute(
+        "users", {}, current_user.role,
+        lambda session: _build_users_stats(session)
+    )
+
+
+def _build_performance_stats(db: Session, days: int):
+    """Статистика производительности за период"""
     start_date = datetime.utcnow() - timedelta(days=days)
     
-    # Новые доски
-    new_boards = db.query(Board).filter(
-        Board.created_at >= start_date
-    ).count()
+    # Исторические дни берутся из дневной статистики, живые таблицы - только за сегодня
+    totals = get_period_totals(db, start_date.date())
     
-    # Завершенные карточки
-    completed_cards = db.query(Card).filter(
-        and_(
-            Card.completed == True,
-            Card.created_at >= start_date
-        )
-    ).count()
-    
-    # Созданные карточки
-    created_cards = db.query(Card).filter(
-        Card.created_at >= start_date
-    ).count()
-    
-    # Новые контакты
-    new_contacts = db.query(Contact).filter(
-        Contact.created_at >= start_date
-    ).count()
+    new_boards = totals["boards_created"]
+    completed_cards = totals["cards_created_completed"]
+    created_cards = totals["cards_created"]
+    new_contacts = totals["contacts_created"]
     
     # Коэффициент завершения
     completion_rate = (completed_cards / created_cards * 100) if created_cards > 0 else 0
@@ -212,27 +214,73 @@ async def get_performance_stats(
     }
 
 
-@router.get("/manager-efficiency")
-async def get_manager_efficiency(
-    db: Session = Depends(get_db),
+@router.get("/performance")
+async def get_performance_stats(
+    days: int = 30,
     current_user: User = Depends(get_current_user)
 ):
     """
-    Рейтинг эффективности менеджеров по закрытым задачам и срокам исполнения
+    Получить статистику производительности за период
     """
     if current_user.role not in [UserRole.ADMIN, UserRole.MANAGER]:
         return {"error": "Недостаточно прав доступа"}
     
+    return await report_cache.get_or_compute(
+        "performance", {"days": days}, current_user.role,
+        lambda session: _build_performance_stats(session, days)
+    )
+
+
+def _manager_efficiency_row(manager: User, owned_boards: int, total_cards: int, completed_cards: int,
+                            overdue_cards: int, avg_delay: float):
+    completion_rate = (completed_cards / total_cards * 100) if total_cards > 0 else 0
+    return {
+        "manager_name": manager.full_name,
+        "manager_id": manager.id,
+        "owned_boards": owned_boards,
+        "total_tasks": total_cards,
+        "completed_tasks": completed_cards,
+        "completion_rate": round(completion_rate, 2),
+        "overdue_tasks": overdue_cards,
+        "avg_delay_days": round(avg_delay, 1),
+        "efficiency_score": round(completion_rate - (avg_delay * 2), 1)  # Простой рейтинг
+    }
+
+
+def _build_manager_efficiency(db: Session):
+    """Рейтинг эффективности менеджеров"""
     # Получаем всех менеджеров
     managers = db.query(User).filter(User.role == UserRole.MANAGER).all()
     
+    facts = get_card_facts(db)
+    if facts is not None:
+        owner_stats = facts.owner_stats()
+        owned_boards = {}
+        for owner_id in facts.board_owners.values():
+            owned_boards[owner_id] = owned_boards.get(owner_id, 0) + 1
+        
+        efficiency_data = []
+        for manager in managers:
+            stats = owner_stats.get(manager.id, {})
+            delay_count = stats.get("delay_count", 0)
+            efficiency_data.append(_manager_efficiency_row(
+                manager,
+                owned_boards.get(manager.id, 0),
+                stats.get("total", 0),
+                stats.get("completed", 0),
+                stats.get("overdue", 0),
+                stats["delay_sum"] / delay_count if delay_count else 0,
+            ))
+        efficiency_data.sort(key=lambda x: x["efficiency_score"], reverse=True)
+        return efficiency_data
+    
     efficiency_data = []
     for manager in managers:
         # Количество досок у менеджера
         owned_boards = db.query(Board).filter(Board.owner_id == manager.id).count()
         
         # Получаем все карточки с досок менеджера
-        manager_cards = db.query(Card).join(Board.columns).filter(
+        manager_cards = db.query(Card).join(Card.column).join(Column.board).filter(
             Board.owner_id == manager.id
         ).all()
         
@@ -251,19 +299,10 @@ async def get_manager_efficiency(
                     delays.append(delay)
         
         avg_delay = sum(delays) / len(delays) if delays else 0
-        completion_rate = (completed_cards / total_cards * 100) if total_cards > 0 else 0
         
-        efficiency_data.append({
-            "manager_name": manager.full_name,
-            "manager_id": manager.id,
-            "owned_boards": owned_boards,
-            "total_tasks": total_cards,
-            "completed_tasks": completed_cards,
-            "completion_rate": round(completion_rate, 2),
-            "overdue_tasks": overdue_cards,
-            "avg_delay_days": round(avg_delay, 1),
-            "efficiency_score": round(completion_rate - (avg_delay * 2), 1)  # Простой рейтинг
-        })
+        efficiency_data.append(_manager_efficiency_row(
+            manager, owned_boards, total_cards, completed_cards, overdue_cards, avg_delay
+        ))
     
     # Сортируем по рейтингу эффективности
     efficiency_data.sort(key=lambda x: x["efficiency_score"], reverse=True)
@@ -271,46 +310,44 @@ async def get_manager_efficiency(
     return efficiency_data
 
 
-@router.get("/employee-contribution")
-async def get_employee_contribution(
-    days: int = 30,
-    db: Session = Depends(get_db),
+@router.get("/manager-efficiency")
+async def get_manager_efficiency(
     current_user: User = Depends(get_current_user)
 ):
     """
-    Анализ вклада сотрудников в общий результат
+    Рейтинг эффективности менеджеров по закрытым задачам и срокам исполнения
     """
     if current_user.role not in [UserRole.ADMIN, UserRole.MANAGER]:
         return {"error": "Недостаточно прав доступа"}
     
+    return await report_cache.get_or_compute(
+        "manager-efficiency", {}, current_user.role,
+        lambda session: _build_manager_efficiency(session)
+    )
+
+
+def _build_employee_contribution(db: Session, days: int):
+    """Вклад сотрудников за период"""
     start_date = datetime.utcnow() - timedelta(days=days)
     
     # Получаем всех исполнителей
     executors = db.query(User).filter(User.role == UserRole.EXECUTOR).all()
     
+    # Счетчики активности всех пользователей за период одним проходом по дневной статистике
+    user_totals = get_user_period_totals(db, start_date.date())
+    
     contribution_data = []
     for executor in executors:
-        # Получаем назначенные задачи исполнителя
-        assigned_cards = db.query(Card).join(card_assignees).filter(
-            card_assignees.c.user_id == executor.id,
-            Card.created_at >= start_date
-        ).all()
+        stats = user_totals.get(executor.id, {})
         
-        total_assigned = len(assigned_cards)
-        completed = sum(1 for card in assigned_cards if card.completed)
+        # Назначенные задачи исполнителя
+        total_assigned = stats.get("cards_assigned", 0)
+        completed = stats.get("cards_assigned_completed", 0)
         in_progress = total_assigned - completed
         
-        # Подсчитываем комментарии (активность)
-        comments = db.query(func.count(CardComment.id)).filter(
-            CardComment.author_id == executor.id,
-            CardComment.created_at >= start_date
-        ).scalar() or 0
-        
-        # Подсчитываем файлы (прикрепленные материалы)
-        uploaded_files = db.query(func.count(File.id)).filter(
-            File.uploaded_by_id == executor.id,
-            File.created_at >= start_date
-        ).scalar() or 0
+        # Комментарии (активность) и файлы (прикрепленные материалы)
+        comments = stats.get("comments_created", 0)
+        uploaded_files = stats.get("files_uploaded", 0)
         
         contribution_score = completed * 10 + in_progress * 5 + comments * 2 + uploaded_files * 3
         
@@ -330,42 +367,41 @@ async def get_employee_contribution(
     return contribution_data
 
 
-@router.get("/gantt-chart")
-async def get_gantt_data(
-    board_id: int = None,
-    db: Session = Depends(get_db),
+@router.get("/employee-contribution")
+async def get_employee_contribution(
+    days: int = 30,
     current_user: User = Depends(get_current_user)
 ):
     """
-    Данные для диаграммы Ганта - визуализация сроков, зависимостей и прогресса
+    Анализ вклада сотрудников в общий результат
     """
     if current_user.role not in [UserRole.ADMIN, UserRole.MANAGER]:
         return {"error": "Недостаточно прав доступа"}
     
+    return await report_cache.get_or_compute(
+        "employee-contribution", {"days": days}, current_user.role,
+        lambda session: _build_employee_contribution(session, days)
+    )
+
+
+def _build_gantt_data(db: Session, board_id: int):
+    """Данные диаграммы Ганта"""
     # Получаем все доски или конкретную доску
     query = db.query(Board)
     if board_id:
         query = query.filter(Board.id == board_id)
     boards = query.all()
     
+    now = datetime.utcnow()
     gantt_data = []
     for board in boards:
-        board_cards = db.query(Card).join(Board.columns).filter(
-            Board.id == board.id
+        board_cards = db.query(Card).join(Card.column).filter(
+            Column.board_id == board.id
         ).all()
         
         for card in board_cards:
             # Определяем прогресс на основе колонки (статуса)
-            # Запланировано = 0%, В работе = 33%, На проверке = 66%, Готово = 100%
-            progress = 0
-            if card.column:
-                status = card.column.title.lower()
-                if "готово" in status or "done" in status:
-                    progress = 100
-                elif "проверке" in status or "review" in status:
-                    progress = 66
-                elif "работе" in status or "progress" in status:
-                    progress = 33
+            progress = column_progress(card.column.title) if card.column else 0
             
             # Формируем данные для Gantt
             gantt_item = {
@@ -379,7 +415,7 @@ async def get_gantt_data(
                 "priority": card.priority.value if hasattr(card.priority, 'value') else str(card.priority),
                 "assignees": [user.full_name for user in card.assignees] if card.assignees else [],
                 "completed": card.completed,
-                "overdue": card.due_date and card.due_date < datetime.utcnow() and not card.completed
+                "overdue": is_overdue(card.due_date, card.completed, now)
             }
             
             gantt_data.append(gantt_item)
@@ -387,30 +423,100 @@ async def get_gantt_data(
     return gantt_data
 
 
-@router.get("/flexible-summary")
-async def get_flexible_summary(
-    board_ids: str = None,  # comma-separated board IDs
-    priority: str = None,
-    assignee_id: int = None,
-    days: int = 30,
-    db: Session = Depends(get_db),
+@router.get("/gantt-chart")
+async def get_gantt_data(
+    board_id: int = None,
     current_user: User = Depends(get_current_user)
 ):
     """
-    Гибкая сводка - настраиваемые колонки с задачами по заданным фильтрам
+    Данные для диаграммы Ганта - визуализация сроков, зависимостей и прогресса
     """
     if current_user.role not in [UserRole.ADMIN, UserRole.MANAGER]:
         return {"error": "Недостаточно прав доступа"}
     
+    return await report_cache.get_or_compute(
+        "gantt-chart", {"board_id": board_id}, current_user.role,
+        lambda session: _build_gantt_data(session, board_id),
+        board_ids=[board_id] if board_id else None
+    )
+
+
+def _build_flexible_summary_from_facts(facts, db: Session, board_id_list: List[int], priority: str,
+                                      assignee_id: int, start_date: datetime):
+    """Гибкая сводка по колоночному снимку карточек"""
+    priority_code = None
+    if priority:
+        priority_code = next((code for value, code in PRIORITY_CODES.items() if value.value == priority), -2)
+    
+    mask = facts.filter_cards(board_id_list, priority_code, assignee_id, start_date)
+    groups = facts.group_counts(mask)
+    
+    def add(bucket: Dict, key: str, count: int):
+        bucket[key] = bucket.get(key, 0) + count
+    
+    summary = {
+        "total_tasks": int(mask.sum()),
+        "by_status": {},
+        "by_priority": {},
+        "by_board": {},
+        "by_assignee": {},
+        "tasks": []
+    }
+    for column_id, count in groups["by_column"].items():
+        add(summary["by_status"], facts.column_titles.get(column_id, "Unknown"), count)
+    for code, count in groups["by_priority"].items():
+        add(summary["by_priority"], PRIORITY_BY_CODE.get(code, "None"), count)
+    for board_id, count in groups["by_board"].items():
+        add(summary["by_board"], facts.board_titles.get(board_id, "Unknown"), count)
+    for user_id, count in groups["by_assignee"].items():
+        add(summary["by_assignee"], facts.user_names.get(user_id), count)
+    if groups["unassigned"]:
+        add(summary["by_assignee"], "Не назначено", groups["unassigned"])
+    
+    # Названия и дедлайны отобранных задач дочитываем порциями
+    positions = mask.nonzero()[0]
+    card_ids = facts.ids[positions].tolist()
+    details = {}
+    for start in range(0, len(card_ids), 1000):
+        details.update(
+            (card_id, (title, due_date))
+            for card_id, title, due_date in db.query(Card.id, Card.title, Card.due_date).filter(
+                Card.id.in_(card_ids[start:start + 1000])
+            )
+        )
+    
+    for position, card_id in zip(positions.tolist(), card_ids):
+        if card_id not in details:
+            continue
+        title, due_date = details[card_id]
+        summary["tasks"].append({
+            "id": card_id,
+            "title": title,
+            "board": facts.board_titles.get(int(facts.board_ids[position]), "Unknown"),
+            "status": facts.column_titles.get(int(facts.column_ids[position]), "Unknown"),
+            "priority": PRIORITY_BY_CODE.get(int(facts.priority_codes[position]), "None"),
+            "assignees": [facts.user_names.get(user_id) for user_id in facts.card_assignees(position).tolist()],
+            "due_date": due_date.isoformat() if due_date else None,
+            "completed": bool(facts.completed[position])
+        })
+    
+    return summary
+
+
+def _build_flexible_summary(db: Session, board_id_list: List[int], priority: str, assignee_id: int, days: int):
+    """Гибкая сводка по задачам с фильтрами"""
     start_date = datetime.utcnow() - timedelta(days=days)
     
+    facts = get_card_facts(db)
+    if facts is not None:
+        return _build_flexible_summary_from_facts(facts, db, board_id_list, priority, assignee_id, start_date)
+    
     # Базовый запрос
-    query = db.query(Card).join(Board.columns)
+    query = db.query(Card).join(Card.column)
     
     # Применяем фильтры
-    if board_ids:
-        board_id_list = [int(id.strip()) for id in board_ids.split(',')]
-        query = query.join(Board).filter(Board.id.in_(board_id_list))
+    if board_id_list:
+        query = query.filter(Column.board_id.in_(board_id_list))
     
     if priority:
         query = query.filter(Card.priority == priority)
@@ -466,3 +572,95 @@ async def get_flexible_summary(
     
     return summary
 
+
+@router.get("/flexible-summary")
+async def get_flexible_summary(
+    board_ids: str = None,  # comma-separated board IDs
+    priority: str = None,
+    assignee_id: int = None,
+    days: int = 30,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Гибкая сводка - настраиваемые колонки с задачами по заданным фильтрам
+    """
+    if current_user.role not in [UserRole.ADMIN, UserRole.MANAGER]:
+        return {"error": "Недостаточно прав доступа"}
+    
+    board_id_list = sorted({int(id.strip()) for id in board_ids.split(',')}) if board_ids else []
+    
+    return await report_cache.get_or_compute(
+        "flexible-summary",
+        {"board_ids": board_id_list or None, "priority": priority, "assignee_id": assignee_id, "days": days},
+        current_user.role,
+        lambda session: _build_flexible_summary(session, board_id_list, priority, assignee_id, days),
+        board_ids=board_id_list or None
+    )
+
+
+@router.get("/cache-stats")
+async def get_report_cache_stats(
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Статистика кэша отчетов (попадания, промахи, вытеснения) и снимка карточек
+    """
+    if current_user.role not in [UserRole.ADMIN, UserRole.MANAGER]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Недостаточно прав доступа"
+        )
+    
+    return {**report_cache.stats(), "card_facts": card_facts_store.stats()}
+
+
+@router.get("/{name}/export")
+async def export_report(
+    name: str,
+    format: str = Query("csv", description="csv, xlsx или parquet"),
+    board_id: int = None,
+    board_ids: str = None,  # comma-separated board IDs
+    priority: str = None,
+    assignee_id: int = None,
+    days: int = 30,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Потоковая выгрузка строк отчета (gantt-chart, flexible-summary) в CSV/XLSX/Parquet
+    """
+    if current_user.role not in [UserRole.ADMIN, UserRole.MANAGER]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Недостаточно прав доступа"
+        )
+    
+    if name not in EXPORT_DATASETS:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Выгрузка отчета '{name}' не поддерживается"
+        )
+    
+    if format not in EXPORT_FORMATS or not format_available(format):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Формат '{format}' недоступен"
+        )
+    
+    if name == "gantt-chart":
+        dataset_factory = lambda dialect_name: gantt_dataset(dialect_name, board_id)
+    else:
+        board_id_list = sorted({int(id.strip()) for id in board_ids.split(',')}) if board_ids else []
+        dataset_factory = lambda dialect_name: flexible_summary_dataset(
+            dialect_name, board_id_list, priority, assignee_id, days
+        )
+    
+    # Строки читаются серверным курсором в отдельной сессии по мере отправки ответа
+    dataset, rows = iter_dataset_rows(dataset_factory)
+    media_type, extension = EXPORT_FORMATS[format]
+    filename = f"{name}_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.{extension}"
+    
+    return StreamingResponse(
+        iter_export(format, dataset, rows),
+        media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
@@ -1,90 +1,131 @@
 """
 Global search endpoint
 """
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from fastapi import APIRouter, Depends, Query
 from sqlalchemy.orm import Session
 
 from app.core.database import get_db
 from app.core.security import get_current_user
 from app.models.user import User
-from app.models.board import Board, Card, CardComment
-from app.models.contact import Contact
+from app.services.search import fts, suggest
+from app.services.search.backend import SearchBackend, get_backend
+from app.services.search.fanout import search_concurrently
+from app.services.search.visibility import SearchVisibility
 
 router = APIRouter()
 
 
+def get_search_visibility(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+) -> SearchVisibility:
+    """Видимые пользователю объекты (вычисляются один раз на запрос)"""
+    return SearchVisibility.for_user(db, current_user)
+
+
+def get_search_backend(db: Session = Depends(get_db)) -> SearchBackend:
+    """Поисковый бэкенд (настройка SEARCH_BACKEND)"""
+    return get_backend(db)
+
+
+def _format_result(category: str, row: Dict[str, Any]) -> Dict[str, Any]:
+    """Элемент ответа в формате категории"""
+    common = {"id": row["id"], "rank": row.get("rank"), "snippet": row.get("snippet")}
+    if category == "boards":
+        return {**common, "title": row["title"], "description": row["subtitle"], "type": "board"}
+    if category == "cards":
+        return {**common, "title": row["title"], "description": row["subtitle"], "type": "card"}
+    if category == "contacts":
+        return {**common, "company_name": row["title"], "contact_person": row["subtitle"], "type": "contact"}
+    if category == "messages":
+        return {**common, "content": row["title"], "conversation_id": row["ref_id"], "type": "message"}
+    if category == "files":
+        return {**common, "original_filename": row["title"], "mime_type": row["subtitle"], "card_id": row["ref_id"], "type": "file"}
+    return {**common, "content": row["title"], "card_id": row["ref_id"], "type": "comment"}
+
+
+def _search_page(backend: SearchBackend, db: Session, category: str, q: str, cursor: Optional[int], limit: int,
+                 visibility: SearchVisibility) -> Dict[str, Any]:
+    rows, next_cursor = backend.search_page(db, category, q, cursor, limit, visibility)
+    return {
+        "items": [_format_result(category, row) for row in rows],
+        "next_cursor": next_cursor
+    }
+
+
 @router.get("/", response_model=Dict[str, List[Any]])
 async def global_search(
     q: str = Query(..., min_length=2, description="Поисковый запрос"),
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    visibility: SearchVisibility = Depends(get_search_visibility),
+    backend: SearchBackend = Depends(get_search_backend)
 ):
     """
     Глобальный поиск по всей системе
-    """
-    search_pattern = f"%{q}%"
     
-    # Search boards
-    boards = db.query(Board).filter(
-        (Board.title.ilike(search_pattern)) |
-        (Board.description.ilike(search_pattern))
-    ).limit(10).all()
+    В PostgreSQL используется полнотекстовый поиск: результаты каждой
+    категории упорядочены по релевантности и содержат сниппет с подсветкой.
+    Контакты ограничены видимыми пользователю (как в списке контактов),
+    сообщения - беседами, в которых он участвует. Без PostgreSQL
+    используется встроенный инвертированный индекс (SEARCH_BACKEND).
     
-    # Search cards
-    cards = db.query(Card).filter(
-        (Card.title.ilike(search_pattern)) |
-        (Card.description.ilike(search_pattern))
-    ).limit(10).all()
-    
-    # Search contacts
-    contacts = db.query(Contact).filter(
-        (Contact.company_name.ilike(search_pattern)) |
-        (Contact.contact_person.ilike(search_pattern)) |
-        (Contact.email.ilike(search_pattern))
-    ).limit(10).all()
-    
-    # Search comments
-    comments = db.query(CardComment).filter(
-        CardComment.content.ilike(search_pattern)
-    ).limit(10).all()
+    Категории выполняются параллельно; категории, не уложившиеся во время
+    или завершившиеся ошибкой, пусты и перечислены в "partial".
+    """
+    results, partial = await search_concurrently(backend, db, q, fts.CATEGORY_LIMIT, visibility)
     
-    return {
-        "boards": [
-            {
-                "id": board.id,
-                "title": board.title,
-                "description": board.description,
-                "type": "board"
-            }
-            for board in boards
-        ],
-        "cards": [
-            {
-                "id": card.id,
-                "title": card.title,
-                "description": card.description,
-                "type": "card"
-            }
-            for card in cards
-        ],
-        "contacts": [
-            {
-                "id": contact.id,
-                "company_name": contact.company_name,
-                "contact_person": contact.contact_person,
-                "type": "contact"
-            }
-            for contact in contacts
-        ],
-        "comments": [
-            {
-                "id": comment.id,
-                "content": comment.content,
-                "card_id": comment.card_id,
-                "type": "comment"
-            }
-            for comment in comments
-        ]
+    response = {
+        category: [_format_result(category, row) for row in rows]
+        for category, rows in results.items()
     }
+    response["partial"] = partial
+    return response
 
+
+@router.get("/messages")
+async def search_messages(
+    q: str = Query(..., min_length=2, description="Поисковый запрос"),
+    cursor: Optional[int] = Query(None, description="id последнего сообщения предыдущей страницы"),
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+    visibility: SearchVisibility = Depends(get_search_visibility),
+    backend: SearchBackend = Depends(get_search_backend)
+):
+    """
+    Поиск по сообщениям чатов пользователя, от новых к старым
+    """
+    return _search_page(backend, db, "messages", q, cursor, limit, visibility)
+
+
+@router.get("/files")
+async def search_files(
+    q: str = Query(..., min_length=2, description="Часть имени файла"),
+    cursor: Optional[int] = Query(None, description="id последнего файла предыдущей страницы"),
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+    visibility: SearchVisibility = Depends(get_search_visibility),
+    backend: SearchBackend = Depends(get_search_backend)
+):
+    """
+    Поиск файлов по имени, от новых к старым
+    """
+    return _search_page(backend, db, "files", q, cursor, limit, visibility)
+
+
+@router.get("/suggest", response_model=List[Dict[str, Any]])
+async def search_suggest(
+    q: str = Query(..., min_length=1, description="Набираемый запрос"),
+    limit: int = Query(10, ge=1, le=suggest.FETCH_LIMIT),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+    visibility: SearchVisibility = Depends(get_search_visibility)
+):
+    """
+    Подсказки при наборе: доски, задачи и видимые контакты, в названии
+    которых есть слова, начинающиеся с введенных
+    """
+    return suggest.suggest(db, q, limit, visibility)
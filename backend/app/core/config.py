@@ -36,11 +36,54 @@ class Settings(BaseSettings):
     # File uploads
     UPLOAD_DIR: str = "uploads"
     MAX_UPLOAD_SIZE: int = 10 * 1024 * 1024  # 10MB
+    UPLOAD_CHUNK_SIZE: int = 1024 * 1024  # загрузка сохраняется порциями этого размера
+    FILE_RELINK_BATCH_SIZE: int = 200  # старых файлов, переносимых в хранилище по хешу за проход
     
     # AI Integration
     AI_API_KEY: str = ""
     AI_PROVIDER: str = "openai"
     
+    # Report statistics rollups
+    STATS_ROLLUP_ENABLED: bool = True
+    STATS_ROLLUP_REFRESH_DAYS: int = 2  # сколько последних дней пересчитывать на каждом проходе
+    STATS_ROLLUP_BATCH_DAYS: int = 31  # размер порции при первичном заполнении
+    STATS_ROLLUP_WATERMARK_OVERLAP_SECONDS: int = 300  # запас при поиске изменений по updated_at
+    
+    # Report result cache
+    REPORT_CACHE_ENABLED: bool = True
+    REPORT_CACHE_TTL_SECONDS: int = 60
+    REPORT_CACHE_MAX_ENTRIES: int = 256
+    
+    # Columnar card facts snapshot for reports
+    CARD_FACTS_ENABLED: bool = True
+    CARD_FACTS_MAX_MB: int = 256  # бюджет памяти; при превышении отчеты считаются SQL
+    CARD_FACTS_REFRESH_SECONDS: int = 30  # инкрементальное обновление
+    CARD_FACTS_FULL_REFRESH_SECONDS: int = 900  # полное перечитывание снимка
+    CARD_FACTS_WATERMARK_OVERLAP_SECONDS: int = 300  # запас при поиске изменений по updated_at
+    
+    # Search
+    SEARCH_SUGGEST_CACHE_SIZE: int = 2048  # префиксов в кэше подсказок
+    SEARCH_BACKEND: str = "auto"  # auto | postgres | index | like
+    SEARCH_FANOUT_WORKERS: int = 8  # потоков для параллельного поиска по категориям; меньше 2 - последовательно
+    SEARCH_CATEGORY_TIMEOUT_MS: int = 1500  # после этого категория возвращается пустой с признаком partial
+    SEARCH_INDEX_SNAPSHOT_PATH: str = "data/search_index.pickle"  # снимок встроенного индекса; пусто - не сохранять
+    SEARCH_INDEX_WATERMARK_OVERLAP_SECONDS: int = 300  # запас при поиске изменений по updated_at
+    
+    # Realtime
+    EVENT_BUS: str = "auto"  # auto | postgres | memory; postgres - LISTEN/NOTIFY между воркерами
+    REALTIME_QUEUE_SIZE: int = 256  # событий в очереди подключения; при переполнении подключение закрывается
+    CHAT_TYPING_INTERVAL_SECONDS: float = 3.0  # не чаще одного события "печатает" на беседу
+    NOTIFICATION_STREAMS_PER_USER: int = 5  # одновременных потоков /notifications/stream на пользователя в одном воркере
+    NOTIFICATION_STREAM_HEARTBEAT_SECONDS: int = 25
+    NOTIFICATION_STREAM_RESUME_LIMIT: int = 100  # уведомлений, досылаемых по Last-Event-ID
+    NOTIFICATION_DIGEST_MIN_CARDS: int = 5  # от стольких задач одного типа за сутки - одно уведомление-дайджест; 0 - без дайджестов
+    
+    # Notification retention
+    NOTIFICATION_RETENTION_DAYS: int = 90  # прочитанные уведомления старше переносятся в архив; 0 - не переносить
+    NOTIFICATION_ARCHIVE_RETENTION_DAYS: int = 365  # записи архива старше удаляются; 0 - хранить всегда
+    NOTIFICATION_PURGE_BATCH_SIZE: int = 5000  # строк в одной транзакции
+    NOTIFICATION_PURGE_MAX_BATCHES: int = 20  # порций за один проход фоновой задачи
+    
     class Config:
         env_file = ".env"
         case_sensitive = True
@@ -9,8 +9,30 @@ import os
 import threading
 
 from app.core.config import settings
+from app.core.database import SessionLocal
 from app.api.api import api_router
+from app.services.data_version import install_session_hooks
+from app.services.event_bus import event_bus
+from app.services import card_facts, file_storage, notification_events, stats_rollup, unread_counters
+from app.services.search.inverted_index import install_index_hooks
 from app.tasks.cleanup import start_background_tasks
+from app.tasks.search_index import load_search_index_on_startup
+
+# Версии данных для инвалидации кэшей при записи
+install_session_hooks(SessionLocal)
+# Дни, агрегаты которых устарели после изменений, для пересчета rollup-таблиц
+stats_rollup.install_session_hooks(SessionLocal)
+# Изменения карточек для инкрементального обновления снимка отчетов
+card_facts.install_session_hooks(SessionLocal)
+# Инкрементальное обновление встроенного поискового индекса
+install_index_hooks(SessionLocal)
+# Push-события публикуются при фиксации транзакций
+event_bus.install(SessionLocal)
+notification_events.install_session_hooks(SessionLocal)
+unread_counters.install_session_hooks(SessionLocal)
+# Файлы содержимого без ссылок удаляются после фиксации
+file_storage.install_session_hooks(SessionLocal)
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -19,11 +41,14 @@ async def lifespan(app: FastAPI):
     background_thread = threading.Thread(target=start_background_tasks, daemon=True)
     background_thread.start()
     print("✅ Фоновые задачи запущены")
+    threading.Thread(target=load_search_index_on_startup, daemon=True).start()
+    await event_bus.start()
     
     yield
     
     # Shutdown
     print("⏹️  Остановка фоновых задач...")
+    await event_bus.stop()
 
 # Create FastAPI application
 app = FastAPI(
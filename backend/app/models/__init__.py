@@ -4,10 +4,12 @@ Database models
 from app.models.user import User
 from app.models.board import Board, Column, Card, CardComment, CardChecklist, CardChecklistItem, BoardStatus, CardPriority
 from app.models.contact import Contact
-from app.models.file import File
-from app.models.notification import Notification
+from app.models.file import File, FileBlob
+from app.models.notification import Notification, NotificationArchive
 from app.models.calendar_event import CalendarEvent
 from app.models.chat import ChatConversation, ChatMessage
+from app.models.stats import DailyStats, DailyBoardStats, DailyUserStats, StatsRollupState, StatsRollupDirtyDay
+from app.models.unread_counter import UserUnreadCounter
 
 __all__ = [
     "User",
@@ -21,9 +23,17 @@ __all__ = [
     "CardPriority",
     "Contact",
     "File",
+    "FileBlob",
     "Notification",
+    "NotificationArchive",
     "CalendarEvent",
     "ChatConversation",
     "ChatMessage",
+    "DailyStats",
+    "DailyBoardStats",
+    "DailyUserStats",
+    "StatsRollupState",
+    "StatsRollupDirtyDay",
+    "UserUnreadCounter",
 ]
 
@@ -1,7 +1,7 @@
 """
 Board (Project) and Card (Task) models for Kanban functionality
 """
-from sqlalchemy import Integer, String, Text, Boolean, DateTime, ForeignKey, Table, Enum as SQLEnum, Column
+from sqlalchemy import Integer, String, Text, Boolean, DateTime, ForeignKey, Table, Enum as SQLEnum, Column, Index, text
 from sqlalchemy.orm import relationship, Mapped, mapped_column
 from sqlalchemy.sql import func
 from typing import Optional, List
@@ -58,7 +58,7 @@ class Board(Base):
     color: Mapped[str] = mapped_column(String, default="#3B82F6")  # Tailwind blue-500
     
     # Timestamps
-    created_at: Mapped[DateTime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    created_at: Mapped[DateTime] = mapped_column(DateTime(timezone=True), server_default=func.now(), index=True)
     updated_at: Mapped[Optional[DateTime]] = mapped_column(DateTime(timezone=True), onupdate=func.now(), nullable=True)
     
     # Relationships
@@ -94,6 +94,14 @@ class Column(Base):
 class Card(Base):
     """Card (Task) model"""
     __tablename__ = "cards"
+    __table_args__ = (
+        # Частичный индекс открытых задач с дедлайном (см. app.services.deadlines)
+        Index(
+            "ix_cards_open_due_date",
+            "due_date",
+            postgresql_where=text("completed = false AND due_date IS NOT NULL"),
+        ),
+    )
     
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
     title: Mapped[str] = mapped_column(String, nullable=False)
@@ -110,8 +118,8 @@ class Card(Base):
     contact_id: Mapped[Optional[int]] = mapped_column(Integer, ForeignKey("contacts.id"), nullable=True)
     
     # Timestamps
-    created_at: Mapped[DateTime] = mapped_column(DateTime(timezone=True), server_default=func.now())
-    updated_at: Mapped[Optional[DateTime]] = mapped_column(DateTime(timezone=True), onupdate=func.now(), nullable=True)
+    created_at: Mapped[DateTime] = mapped_column(DateTime(timezone=True), server_default=func.now(), index=True)
+    updated_at: Mapped[Optional[DateTime]] = mapped_column(DateTime(timezone=True), onupdate=func.now(), nullable=True, index=True)
     completed_at: Mapped[Optional[DateTime]] = mapped_column(DateTime(timezone=True), nullable=True)
     
     # Relationships
@@ -142,7 +150,7 @@ class CardComment(Base):
     status_at: Mapped[Optional[DateTime]] = mapped_column(DateTime(timezone=True), nullable=True)
     
     # Timestamps
-    created_at: Mapped[DateTime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    created_at: Mapped[DateTime] = mapped_column(DateTime(timezone=True), server_default=func.now(), index=True)
     updated_at: Mapped[Optional[DateTime]] = mapped_column(DateTime(timezone=True), onupdate=func.now(), nullable=True)
     
     # Relationships
@@ -1,7 +1,7 @@
 """
 Chat models
 """
-from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, ForeignKey, Table
+from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, ForeignKey, Table, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 
@@ -12,7 +12,11 @@ chat_participants = Table(
     'chat_participants',
     Base.metadata,
     Column('conversation_id', Integer, ForeignKey('chat_conversations.id'), primary_key=True),
-    Column('user_id', Integer, ForeignKey('users.id'), primary_key=True),
+    Column('user_id', Integer, ForeignKey('users.id'), primary_key=True, index=True),
+    # Курсор прочтения: сообщения с id не больше прочитаны участником
+    Column('last_read_message_id', Integer, nullable=False, default=0, server_default='0'),
+    # Непрочитанные участником сообщения (ведется в send_message и отметках о прочтении)
+    Column('unread_count', Integer, nullable=False, default=0, server_default='0'),
 )
 
 
@@ -23,17 +27,36 @@ class ChatConversation(Base):
     id = Column(Integer, primary_key=True, index=True)
     type = Column(String, nullable=False, default="direct")  # direct, group
     title = Column(String, nullable=True)  # Название для группового чата
+    # Личный чат: "<меньший id>:<больший id>" участников, у групповых NULL
+    direct_key = Column(String, nullable=True, unique=True, index=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
+    # Последнее сообщение (денормализовано для списка чатов)
+    last_message_id = Column(
+        Integer,
+        ForeignKey("chat_messages.id", use_alter=True, name="fk_chat_conversations_last_message_id", ondelete="SET NULL"),
+        nullable=True
+    )
+    last_message_at = Column(DateTime(timezone=True), nullable=True, index=True)
+    
     # Relationships
     participants = relationship("User", secondary=chat_participants, back_populates="chat_conversations")
-    messages = relationship("ChatMessage", back_populates="conversation", cascade="all, delete-orphan")
+    messages = relationship(
+        "ChatMessage",
+        back_populates="conversation",
+        cascade="all, delete-orphan",
+        foreign_keys="ChatMessage.conversation_id"
+    )
 
 
 class ChatMessage(Base):
     """Chat message model"""
     __tablename__ = "chat_messages"
+    __table_args__ = (
+        # Сообщения беседы по порядку (поиск и постраничная выдача)
+        Index("ix_chat_messages_conversation_id_id", "conversation_id", "id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     conversation_id = Column(Integer, ForeignKey("chat_conversations.id"), nullable=False)
@@ -43,14 +66,14 @@ class ChatMessage(Base):
     # Link to task/card (опционально)
     linked_card_id = Column(Integer, ForeignKey("cards.id"), nullable=True)
     
-    # Read status
+    # Read status (устарело: прочтение хранится курсором участника в chat_participants)
     is_read = Column(Boolean, default=False)
     
     # Timestamps
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
     # Relationships
-    conversation = relationship("ChatConversation", back_populates="messages")
+    conversation = relationship("ChatConversation", back_populates="messages", foreign_keys=[conversation_id])
     sender = relationship("User", foreign_keys=[sender_id], back_populates="chat_messages_sent")
     linked_card = relationship("Card", foreign_keys=[linked_card_id])
 
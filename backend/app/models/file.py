@@ -18,6 +18,8 @@ class File(Base):
     file_path = Column(String, nullable=False)
     mime_type = Column(String, nullable=True)
     file_size = Column(BigInteger, nullable=False)  # in bytes
+    # Содержимое хранится один раз на хеш (FileBlob); NULL - файл еще не перенесен в хранилище по хешу
+    sha256 = Column(String(64), ForeignKey("file_blobs.sha256", name="fk_files_sha256_file_blobs"), nullable=True, index=True)
     
     # Links
     card_id = Column(Integer, ForeignKey("cards.id", ondelete="CASCADE"), nullable=True)
@@ -28,7 +30,7 @@ class File(Base):
     expires_at = Column(DateTime(timezone=True), nullable=True)  # Calculated deletion date
     
     # Timestamps
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
     
     # Relationships
     card = relationship("Card", back_populates="files")
@@ -37,3 +39,16 @@ class File(Base):
     def __repr__(self):
         return f"<File {self.original_filename}>"
 
+
+class FileBlob(Base):
+    """Содержимое файла в хранилище по хешу (см. app.services.file_storage)"""
+    __tablename__ = "file_blobs"
+    
+    sha256 = Column(String(64), primary_key=True)
+    file_size = Column(BigInteger, nullable=False)
+    ref_count = Column(Integer, nullable=False, default=0, server_default="0")  # записей files с этим содержимым
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    def __repr__(self):
+        return f"<FileBlob {self.sha256}>"
+
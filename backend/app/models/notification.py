@@ -1,9 +1,9 @@
 """
 Notification model
 """
-from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, ForeignKey, Enum as SQLEnum
+from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, ForeignKey, Index, JSON, Enum as SQLEnum
 from sqlalchemy.orm import relationship
-from sqlalchemy.sql import func
+from sqlalchemy.sql import func, text
 import enum
 
 from app.core.database import Base
@@ -23,6 +23,29 @@ class NotificationType(str, enum.Enum):
 class Notification(Base):
     """Notification model"""
     __tablename__ = "notifications"
+    # created_at возвращается из INSERT (нужен для push-событий без повторного чтения)
+    __mapper_args__ = {"eager_defaults": True}
+    __table_args__ = (
+        # Уведомления по расписанию (дедлайны) создаются не чаще одного раза
+        # за период: INSERT ... ON CONFLICT DO NOTHING по этому индексу
+        Index(
+            "uq_notifications_period",
+            "user_id", "card_id", "type", "period",
+            unique=True,
+            postgresql_where=text("period IS NOT NULL"),
+            sqlite_where=text("period IS NOT NULL"),
+        ),
+        # Дайджест (card_id IS NULL): один на пользователя, тип и период
+        Index(
+            "uq_notifications_digest",
+            "user_id", "type", "period",
+            unique=True,
+            postgresql_where=text("card_id IS NULL AND period IS NOT NULL"),
+            sqlite_where=text("card_id IS NULL AND period IS NOT NULL"),
+        ),
+        # Списки уведомлений пользователя: user_id + сортировка по created_at
+        Index("ix_notifications_user_id_created_at", "user_id", "created_at"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
@@ -34,6 +57,12 @@ class Notification(Base):
     card_id = Column(Integer, ForeignKey("cards.id", ondelete="CASCADE"), nullable=True)
     link = Column(String, nullable=True)
     
+    # Период уведомления по расписанию (например, дата UTC), иначе NULL
+    period = Column(String, nullable=True)
+    
+    # Дайджест: {"card_ids": [...]} вместо отдельных уведомлений по задачам
+    payload = Column(JSON, nullable=True)
+    
     # Status
     is_read = Column(Boolean, default=False)
     
@@ -44,6 +73,39 @@ class Notification(Base):
     # Relationships
     user = relationship("User", back_populates="notifications")
     
+    @property
+    def card_ids(self):
+        """Задачи дайджеста"""
+        return (self.payload or {}).get("card_ids")
+    
     def __repr__(self):
         return f"<Notification {self.title}>"
 
+
+class NotificationArchive(Base):
+    """
+    Архив прочитанных уведомлений старше NOTIFICATION_RETENTION_DAYS
+    (см. app.services.notification_retention). API его не читает.
+    """
+    __tablename__ = "notifications_archive"
+    __table_args__ = (
+        Index("ix_notifications_archive_user_id_created_at", "user_id", "created_at"),
+    )
+    
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    type = Column(SQLEnum(NotificationType), nullable=False)
+    title = Column(String, nullable=False)
+    message = Column(Text, nullable=False)
+    card_id = Column(Integer, nullable=True)  # без внешнего ключа: задача могла быть удалена
+    link = Column(String, nullable=True)
+    period = Column(String, nullable=True)
+    payload = Column(JSON, nullable=True)
+    is_read = Column(Boolean, default=True)
+    created_at = Column(DateTime(timezone=True))
+    read_at = Column(DateTime(timezone=True), nullable=True)
+    archived_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    def __repr__(self):
+        return f"<NotificationArchive {self.id}>"
+
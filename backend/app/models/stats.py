@@ -0,0 +1,75 @@
+"""
+Daily statistics rollup models for reports
+"""
+from sqlalchemy import Column, Integer, String, Date, DateTime
+from sqlalchemy.sql import func
+
+from app.core.database import Base
+
+
+class DailyStats(Base):
+    """Общая статистика за день"""
+    __tablename__ = "stats_daily"
+
+    day = Column(Date, primary_key=True)
+    boards_created = Column(Integer, nullable=False, default=0)
+    cards_created = Column(Integer, nullable=False, default=0)
+    cards_created_completed = Column(Integer, nullable=False, default=0)  # созданы в этот день и уже завершены
+    contacts_created = Column(Integer, nullable=False, default=0)
+    comments_created = Column(Integer, nullable=False, default=0)
+    files_uploaded = Column(Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<DailyStats {self.day}>"
+
+
+class DailyBoardStats(Base):
+    """Статистика доски за день"""
+    __tablename__ = "stats_daily_board"
+
+    day = Column(Date, primary_key=True)
+    board_id = Column(Integer, primary_key=True, index=True)
+    cards_created = Column(Integer, nullable=False, default=0)
+    cards_created_completed = Column(Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<DailyBoardStats {self.day} board={self.board_id}>"
+
+
+class DailyUserStats(Base):
+    """Статистика пользователя за день"""
+    __tablename__ = "stats_daily_user"
+
+    day = Column(Date, primary_key=True)
+    user_id = Column(Integer, primary_key=True, index=True)
+    cards_assigned = Column(Integer, nullable=False, default=0)  # назначенные карточки, созданные в этот день
+    cards_assigned_completed = Column(Integer, nullable=False, default=0)
+    comments_created = Column(Integer, nullable=False, default=0)
+    files_uploaded = Column(Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<DailyUserStats {self.day} user={self.user_id}>"
+
+
+class StatsRollupState(Base):
+    """Водяной знак инкрементального пересчета"""
+    __tablename__ = "stats_rollup_state"
+
+    name = Column(String, primary_key=True)
+    last_day = Column(Date, nullable=True)  # последний полностью агрегированный день
+    last_run_at = Column(DateTime(timezone=True), nullable=True)  # время предыдущего прохода
+
+    def __repr__(self):
+        return f"<StatsRollupState {self.name} {self.last_day}>"
+
+
+class StatsRollupDirtyDay(Base):
+    """День, агрегаты которого устарели после изменения данных"""
+    __tablename__ = "stats_rollup_dirty_days"
+
+    id = Column(Integer, primary_key=True)
+    day = Column(Date, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    def __repr__(self):
+        return f"<StatsRollupDirtyDay {self.day}>"
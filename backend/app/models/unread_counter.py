@@ -0,0 +1,20 @@
+"""
+Per-user unread counters
+"""
+from sqlalchemy import Column, Integer, DateTime, ForeignKey
+from sqlalchemy.sql import func
+
+from app.core.database import Base
+
+
+class UserUnreadCounter(Base):
+    """Непрочитанные уведомления и сообщения чата пользователя (см. app.services.unread_counters)"""
+    __tablename__ = "user_unread_counters"
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    notifications = Column(Integer, nullable=False, default=0, server_default="0")
+    chat = Column(Integer, nullable=False, default=0, server_default="0")
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    def __repr__(self):
+        return f"<UserUnreadCounter {self.user_id}>"
@@ -39,6 +39,12 @@ class ChatMessageWithSender(ChatMessage):
         from_attributes = True
 
 
+class ChatMessagePage(BaseModel):
+    """Schema for a page of chat messages"""
+    items: List[ChatMessageWithSender] = []
+    next_cursor: Optional[int] = None
+
+
 class ChatConversationBase(BaseModel):
     """Base chat conversation schema"""
     type: str = "direct"
@@ -55,8 +61,10 @@ class ChatConversation(ChatConversationBase):
     id: int
     created_at: datetime
     updated_at: Optional[datetime] = None
+    last_message_at: Optional[datetime] = None
     participants: List[UserSchema] = []
     messages: List[ChatMessageWithSender] = []
+    messages_next_cursor: Optional[int] = None
     
     class Config:
         from_attributes = True
@@ -65,6 +73,7 @@ class ChatConversation(ChatConversationBase):
 class ChatConversationList(ChatConversation):
     """Schema for conversation list response"""
     unread_count: int = 0
+    last_read_message_id: int = 0
     last_message: Optional[ChatMessageWithSender] = None
     
     class Config:
@@ -19,6 +19,7 @@ class FileInDB(FileBase):
     filename: str
     file_path: str
     file_size: int
+    sha256: Optional[str] = None
     card_id: Optional[int] = None
     uploaded_by_id: int
     retention_days: Optional[int] = None
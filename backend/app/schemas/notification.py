@@ -1,7 +1,7 @@
 """
 Notification schemas
 """
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 from pydantic import BaseModel
 from app.models.notification import NotificationType
@@ -26,6 +26,7 @@ class NotificationInDB(NotificationBase):
     id: int
     user_id: int
     card_id: Optional[int] = None
+    card_ids: Optional[List[int]] = None  # задачи дайджеста
     is_read: bool
     created_at: datetime
     read_at: Optional[datetime] = None
@@ -0,0 +1,496 @@
+"""
+Columnar in-process snapshot of card facts for report computations
+
+Снимок хранит факты карточек компактными массивами numpy (id, колонка,
+код приоритета, даты создания/дедлайна/завершения) и индекс исполнителей
+в формате CSR. Доска карточки определяется через справочник колонок.
+Хук сессии собирает изменения, зафиксированные в этом процессе: id
+измененных карточек (в том числе смена исполнителей), удаленных карточек
+и признак изменения справочников (колонки, доски, пользователи). После
+такой фиксации снимок обновляется при следующем чтении, изменения других
+воркеров видны не позже чем через CARD_FACTS_REFRESH_SECONDS.
+Обновление инкрементальное: перечитываются карточки из собранного списка
+и карточки с updated_at/created_at после водяного знака (с запасом
+CARD_FACTS_WATERMARK_OVERLAP_SECONDS: now() - время начала транзакции),
+исполнители - только для этих карточек, справочники - только после их
+изменения или по истечении CARD_FACTS_REFRESH_SECONDS. Удаления в других
+воркерах видны после полного перечитывания раз в
+CARD_FACTS_FULL_REFRESH_SECONDS. Если снимок выключен или не помещается
+в бюджет памяти, get_card_facts() возвращает None и отчеты считаются
+SQL-запросами.
+"""
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+from sqlalchemy import event, inspect, or_, select, func
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.user import User
+from app.models.board import Board, Card, CardPriority, Column, card_assignees
+
+
+PRIORITY_CODES = {
+    CardPriority.LOW: 0,
+    CardPriority.MEDIUM: 1,
+    CardPriority.HIGH: 2,
+    CardPriority.URGENT: 3,
+}
+PRIORITY_BY_CODE = {code: priority.value for priority, code in PRIORITY_CODES.items()}
+
+# Оценка размера одной карточки в снимке (без индекса исполнителей)
+_BYTES_PER_CARD = 8 + 4 + 1 + 1 + 8 * 3 + 8
+_BYTES_PER_ASSIGNMENT = 4 + 8
+_FETCH_SIZE = 50000
+_IN_CHUNK = 1000
+_NAT = np.datetime64("NaT", "s")
+_CHANGES_KEY = "card_facts_changes"
+_DIMENSION_FIELDS = ("column_boards", "column_titles", "board_owners", "board_titles", "user_names")
+
+
+def _to_datetime64(values: Sequence[Optional[datetime]]) -> np.ndarray:
+    """Даты в datetime64[s] (UTC, без часового пояса); None -> NaT"""
+    converted = [
+        value.astimezone(timezone.utc).replace(tzinfo=None) if value is not None and value.tzinfo is not None else value
+        for value in values
+    ]
+    return np.array(converted, dtype="datetime64[s]")
+
+
+class CardFacts:
+    """Неизменяемый снимок фактов карточек"""
+
+    def __init__(
+        self,
+        ids: np.ndarray,
+        column_ids: np.ndarray,
+        priority_codes: np.ndarray,
+        completed: np.ndarray,
+        created_at: np.ndarray,
+        due_date: np.ndarray,
+        completed_at: np.ndarray,
+        assignee_indptr: np.ndarray,
+        assignee_ids: np.ndarray,
+        column_boards: Dict[int, int],
+        column_titles: Dict[int, str],
+        board_owners: Dict[int, int],
+        board_titles: Dict[int, str],
+        user_names: Dict[int, str],
+        loaded_at: float,
+        watermark,
+    ):
+        self.ids = ids
+        self.column_ids = column_ids
+        self.priority_codes = priority_codes
+        self.completed = completed
+        self.created_at = created_at
+        self.due_date = due_date
+        self.completed_at = completed_at
+        self.assignee_indptr = assignee_indptr
+        self.assignee_ids = assignee_ids
+        self.column_boards = column_boards
+        self.column_titles = column_titles
+        self.board_owners = board_owners
+        self.board_titles = board_titles
+        self.user_names = user_names
+        self.loaded_at = loaded_at
+        self.watermark = watermark
+
+        # Доска и владелец доски для каждой карточки
+        self.board_ids = self._lookup(column_ids, column_boards)
+        self.board_owner_ids = self._lookup(self.board_ids, board_owners)
+
+    @staticmethod
+    def _lookup(keys: np.ndarray, mapping: Dict[int, int]) -> np.ndarray:
+        """Векторный поиск по словарю; отсутствующие ключи -> -1"""
+        if not len(keys):
+            return np.zeros(0, dtype=np.int64)
+        size = max(int(keys.max()), max(mapping.keys(), default=0)) + 1
+        table = np.full(size, -1, dtype=np.int64)
+        if mapping:
+            table[np.fromiter(mapping.keys(), dtype=np.int64)] = np.fromiter(mapping.values(), dtype=np.int64)
+        return table[np.clip(keys, 0, size - 1)]
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def nbytes(self) -> int:
+        arrays = (
+            self.ids, self.column_ids, self.priority_codes, self.completed, self.created_at,
+            self.due_date, self.completed_at, self.assignee_indptr, self.assignee_ids,
+            self.board_ids, self.board_owner_ids,
+        )
+        return sum(array.nbytes for array in arrays)
+
+    # Фильтры и группировки
+
+    def assignee_card_positions(self) -> np.ndarray:
+        """Позиция карточки для каждой записи индекса исполнителей"""
+        return np.repeat(np.arange(len(self.ids)), np.diff(self.assignee_indptr))
+
+    def filter_cards(
+        self,
+        board_ids: Optional[Iterable[int]] = None,
+        priority_code: Optional[int] = None,
+        assignee_id: Optional[int] = None,
+        created_from: Optional[datetime] = None,
+    ) -> np.ndarray:
+        """Маска карточек, удовлетворяющих фильтрам"""
+        mask = np.ones(len(self.ids), dtype=bool)
+        if board_ids:
+            mask &= np.isin(self.board_ids, np.fromiter(board_ids, dtype=np.int64))
+        if priority_code is not None:
+            mask &= self.priority_codes == priority_code
+        if assignee_id is not None:
+            has_assignee = np.zeros(len(self.ids), dtype=bool)
+            has_assignee[self.assignee_card_positions()[self.assignee_ids == assignee_id]] = True
+            mask &= has_assignee
+        if created_from is not None:
+            mask &= self.created_at >= np.datetime64(created_from.replace(tzinfo=None), "s")
+        return mask
+
+    def owner_stats(self) -> Dict[int, Dict[str, float]]:
+        """
+        Показатели карточек по владельцам досок: всего, завершено,
+        завершено после дедлайна, сумма и число положительных задержек (дни)
+        """
+        owners = self.board_owner_ids
+        valid = owners >= 0
+        if not valid.any():
+            return {}
+        owners = owners[valid]
+        size = int(owners.max()) + 1
+
+        due = self.due_date[valid]
+        completed_at = self.completed_at[valid]
+        both = ~np.isnat(due) & ~np.isnat(completed_at)
+        late = both & (due < completed_at)
+        delay_days = np.zeros(len(owners), dtype=np.int64)
+        delay_days[both] = (completed_at[both] - due[both]).astype(np.int64) // 86400
+        positive = delay_days > 0
+
+        total = np.bincount(owners, minlength=size)
+        completed = np.bincount(owners, weights=self.completed[valid], minlength=size)
+        overdue = np.bincount(owners, weights=late, minlength=size)
+        delay_sum = np.bincount(owners, weights=np.where(positive, delay_days, 0), minlength=size)
+        delay_count = np.bincount(owners, weights=positive, minlength=size)
+
+        return {
+            int(owner_id): {
+                "total": int(total[owner_id]),
+                "completed": int(completed[owner_id]),
+                "overdue": int(overdue[owner_id]),
+                "delay_sum": float(delay_sum[owner_id]),
+                "delay_count": int(delay_count[owner_id]),
+            }
+            for owner_id in np.nonzero(total)[0]
+        }
+
+    def group_counts(self, mask: np.ndarray) -> Dict[str, Dict]:
+        """Количество отобранных карточек по колонкам, приоритетам, доскам и исполнителям"""
+        def counts(values: np.ndarray) -> Dict[int, int]:
+            unique, occurrences = np.unique(values, return_counts=True)
+            return dict(zip(unique.tolist(), occurrences.tolist()))
+
+        entry_mask = mask[self.assignee_card_positions()]
+        assignment_counts = np.diff(self.assignee_indptr)
+        return {
+            "by_column": counts(self.column_ids[mask]),
+            "by_priority": counts(self.priority_codes[mask]),
+            "by_board": counts(self.board_ids[mask]),
+            "by_assignee": counts(self.assignee_ids[entry_mask]),
+            "unassigned": int(np.count_nonzero(mask & (assignment_counts == 0))),
+        }
+
+    def card_assignees(self, position: int) -> np.ndarray:
+        return self.assignee_ids[self.assignee_indptr[position]:self.assignee_indptr[position + 1]]
+
+
+def _build_csr(ids: np.ndarray, pair_card_ids: np.ndarray, pair_user_ids: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """CSR-индекс исполнителей по отсортированному массиву id карточек"""
+    if len(pair_card_ids):
+        positions = np.searchsorted(ids, pair_card_ids)
+        known = (positions < len(ids)) & (ids[np.minimum(positions, len(ids) - 1)] == pair_card_ids) if len(ids) else np.zeros(len(pair_card_ids), dtype=bool)
+        positions, users = positions[known], pair_user_ids[known]
+        order = np.argsort(positions, kind="stable")
+        positions, users = positions[order], users[order]
+    else:
+        positions = np.zeros(0, dtype=np.int64)
+        users = np.zeros(0, dtype=np.int32)
+    indptr = np.zeros(len(ids) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(positions, minlength=len(ids)), out=indptr[1:])
+    return indptr, users.astype(np.int32)
+
+
+class CardFactsStore:
+    """Хранит текущий снимок и обновляет его под блокировкой"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._snapshot: Optional[CardFacts] = None
+        self._full_loaded_at = 0.0
+        self.over_budget = False
+        # Изменения, зафиксированные после загрузки снимка
+        self._changes_lock = threading.Lock()
+        self._changed_cards: Set[int] = set()
+        self._deleted_cards: Set[int] = set()
+        self._dimensions_changed = False
+
+    @property
+    def budget_bytes(self) -> int:
+        return settings.CARD_FACTS_MAX_MB * 1024 * 1024
+
+    def record_changes(self, cards: Iterable[int] = (), deleted: Iterable[int] = (), dimensions: bool = False) -> None:
+        """Учесть зафиксированные изменения: следующее чтение обновит снимок"""
+        with self._changes_lock:
+            self._changed_cards.update(cards)
+            self._deleted_cards.update(deleted)
+            self._dimensions_changed = self._dimensions_changed or dimensions
+
+    def _take_changes(self) -> Tuple[Set[int], Set[int], bool]:
+        with self._changes_lock:
+            changes = (self._changed_cards, self._deleted_cards, self._dimensions_changed)
+            self._changed_cards, self._deleted_cards, self._dimensions_changed = set(), set(), False
+        return changes
+
+    def _is_fresh(self, snapshot: Optional[CardFacts]) -> bool:
+        if snapshot is None or time.monotonic() - snapshot.loaded_at >= settings.CARD_FACTS_REFRESH_SECONDS:
+            return False
+        with self._changes_lock:
+            return not (self._changed_cards or self._deleted_cards or self._dimensions_changed)
+
+    def get(self, db: Session) -> Optional[CardFacts]:
+        if not settings.CARD_FACTS_ENABLED:
+            return None
+        snapshot = self._snapshot
+        if self._is_fresh(snapshot):
+            return snapshot
+        with self._lock:
+            snapshot = self._snapshot
+            if self._is_fresh(snapshot):
+                return snapshot
+            # Изменения забираются до чтения: зафиксированные во время загрузки вызовут новое обновление
+            changes = self._take_changes()
+            full = snapshot is None or time.monotonic() - self._full_loaded_at >= settings.CARD_FACTS_FULL_REFRESH_SECONDS
+            try:
+                snapshot = self._load_full(db) if full else self._load_incremental(db, snapshot, *changes)
+            except Exception:
+                self.record_changes(*changes)
+                raise
+            if snapshot is not None and snapshot.nbytes > self.budget_bytes:
+                snapshot = None
+            self.over_budget = snapshot is None
+            self._snapshot = snapshot
+            return snapshot
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._snapshot = None
+
+    def stats(self) -> Dict:
+        snapshot = self._snapshot
+        return {
+            "enabled": settings.CARD_FACTS_ENABLED,
+            "over_budget": self.over_budget,
+            "cards": len(snapshot) if snapshot is not None else 0,
+            "bytes": snapshot.nbytes if snapshot is not None else 0,
+            "budget_bytes": self.budget_bytes,
+        }
+
+    # Загрузка
+
+    @staticmethod
+    def _load_dimensions(db: Session) -> Tuple[Dict[int, int], Dict[int, str], Dict[int, int], Dict[int, str], Dict[int, str]]:
+        column_boards: Dict[int, int] = {}
+        column_titles: Dict[int, str] = {}
+        for column_id, board_id, title in db.execute(select(Column.id, Column.board_id, Column.title)):
+            column_boards[column_id] = board_id
+            column_titles[column_id] = title
+        board_owners: Dict[int, int] = {}
+        board_titles: Dict[int, str] = {}
+        for board_id, owner_id, title in db.execute(select(Board.id, Board.owner_id, Board.title)):
+            board_owners[board_id] = owner_id
+            board_titles[board_id] = title
+        user_names = dict(db.execute(select(User.id, User.full_name)).all())
+        return column_boards, column_titles, board_owners, board_titles, user_names
+
+    @staticmethod
+    def _fetch_cards(db: Session, condition=None) -> Dict[str, np.ndarray]:
+        statement = select(
+            Card.id, Card.column_id, Card.priority, Card.completed,
+            Card.created_at, Card.due_date, Card.completed_at,
+        ).order_by(Card.id)
+        if condition is not None:
+            statement = statement.where(condition)
+
+        parts: Dict[str, List[np.ndarray]] = {name: [] for name in (
+            "ids", "column_ids", "priority_codes", "completed", "created_at", "due_date", "completed_at"
+        )}
+        result = db.execute(statement.execution_options(yield_per=_FETCH_SIZE))
+        for partition in result.partitions():
+            ids, column_ids, priorities, completed, created_at, due_date, completed_at = zip(*partition)
+            parts["ids"].append(np.array(ids, dtype=np.int64))
+            parts["column_ids"].append(np.array(column_ids, dtype=np.int32))
+            parts["priority_codes"].append(np.array(
+                [PRIORITY_CODES.get(priority, -1) for priority in priorities], dtype=np.int8
+            ))
+            parts["completed"].append(np.array([bool(value) for value in completed], dtype=bool))
+            parts["created_at"].append(_to_datetime64(created_at))
+            parts["due_date"].append(_to_datetime64(due_date))
+            parts["completed_at"].append(_to_datetime64(completed_at))
+
+        empty = {
+            "ids": np.int64, "column_ids": np.int32, "priority_codes": np.int8, "completed": bool,
+            "created_at": "datetime64[s]", "due_date": "datetime64[s]", "completed_at": "datetime64[s]",
+        }
+        return {
+            name: np.concatenate(chunks) if chunks else np.zeros(0, dtype=empty[name])
+            for name, chunks in parts.items()
+        }
+
+    @staticmethod
+    def _fetch_assignments(db: Session, card_ids: Optional[Iterable[int]] = None) -> Tuple[np.ndarray, np.ndarray]:
+        statement = select(card_assignees.c.card_id, card_assignees.c.user_id).where(
+            card_assignees.c.card_id.isnot(None),
+            card_assignees.c.user_id.isnot(None),
+        )
+        if card_ids is None:
+            statements = [statement.execution_options(yield_per=_FETCH_SIZE)]
+        else:
+            ids = sorted(card_ids)
+            statements = [
+                statement.where(card_assignees.c.card_id.in_(ids[start:start + _IN_CHUNK]))
+                for start in range(0, len(ids), _IN_CHUNK)
+            ]
+
+        card_parts: List[np.ndarray] = []
+        user_parts: List[np.ndarray] = []
+        for statement in statements:
+            for partition in db.execute(statement).partitions(_FETCH_SIZE):
+                card_column, user_column = zip(*partition)
+                card_parts.append(np.array(card_column, dtype=np.int64))
+                user_parts.append(np.array(user_column, dtype=np.int32))
+        if not card_parts:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int32)
+        return np.concatenate(card_parts), np.concatenate(user_parts)
+
+    def _load_full(self, db: Session) -> Optional[CardFacts]:
+        watermark = db.query(func.now()).scalar()
+
+        # Оценка размера до загрузки, чтобы не превышать бюджет памяти
+        card_count = db.query(func.count(Card.id)).scalar() or 0
+        assignment_count = db.execute(select(func.count()).select_from(card_assignees)).scalar() or 0
+        if card_count * _BYTES_PER_CARD + assignment_count * _BYTES_PER_ASSIGNMENT > self.budget_bytes:
+            return None
+
+        cards = self._fetch_cards(db)
+        pair_cards, pair_users = self._fetch_assignments(db)
+        indptr, assignee_ids = _build_csr(cards["ids"], pair_cards, pair_users)
+        self._full_loaded_at = time.monotonic()
+        return CardFacts(
+            **cards,
+            assignee_indptr=indptr,
+            assignee_ids=assignee_ids,
+            **dict(zip(_DIMENSION_FIELDS, self._load_dimensions(db))),
+            loaded_at=time.monotonic(),
+            watermark=watermark,
+        )
+
+    def _load_incremental(
+        self,
+        db: Session,
+        snapshot: CardFacts,
+        changed_cards: Set[int],
+        deleted_cards: Set[int],
+        dimensions_changed: bool,
+    ) -> CardFacts:
+        watermark = db.query(func.now()).scalar()
+        since = snapshot.watermark - timedelta(seconds=max(settings.CARD_FACTS_WATERMARK_OVERLAP_SECONDS, 0))
+        condition = or_(Card.updated_at >= since, Card.created_at >= since)
+        if changed_cards:
+            condition = or_(condition, Card.id.in_(sorted(changed_cards)))
+        changed = self._fetch_cards(db, condition)
+
+        # Справочники меняются редко: перечитываются после изменения в этом
+        # процессе или по сроку (изменения других воркеров)
+        if dimensions_changed or time.monotonic() - snapshot.loaded_at >= settings.CARD_FACTS_REFRESH_SECONDS:
+            dimensions = dict(zip(_DIMENSION_FIELDS, self._load_dimensions(db)))
+        else:
+            dimensions = {name: getattr(snapshot, name) for name in _DIMENSION_FIELDS}
+
+        # Строки удаленных и изменившихся карточек отбрасываются, изменившиеся читаются заново
+        replaced = np.fromiter(changed_cards | deleted_cards, dtype=np.int64, count=len(changed_cards | deleted_cards))
+        keep = ~np.isin(snapshot.ids, changed["ids"]) & ~np.isin(snapshot.ids, replaced)
+        columns = {}
+        for name in ("ids", "column_ids", "priority_codes", "completed", "created_at", "due_date", "completed_at"):
+            columns[name] = np.concatenate([getattr(snapshot, name)[keep], changed[name]])
+        order = np.argsort(columns["ids"], kind="stable")
+        columns = {name: values[order] for name, values in columns.items()}
+
+        # Индекс исполнителей: сохраненные пары оставшихся карточек + свежие пары перечитанных
+        entry_positions = snapshot.assignee_card_positions()
+        kept_entries = keep[entry_positions]
+        pair_cards, pair_users = self._fetch_assignments(db, changed["ids"].tolist())
+        indptr, assignee_ids = _build_csr(
+            columns["ids"],
+            np.concatenate([snapshot.ids[entry_positions][kept_entries], pair_cards]),
+            np.concatenate([snapshot.assignee_ids[kept_entries], pair_users]),
+        )
+
+        return CardFacts(
+            **columns,
+            assignee_indptr=indptr,
+            assignee_ids=assignee_ids,
+            **dimensions,
+            loaded_at=time.monotonic(),
+            watermark=watermark,
+        )
+
+
+card_facts_store = CardFactsStore()
+
+
+def get_card_facts(db: Session) -> Optional[CardFacts]:
+    """Актуальный снимок фактов карточек или None (тогда отчеты используют SQL)"""
+    return card_facts_store.get(db)
+
+
+# Хуки сессии
+
+def _after_flush(session: Session, flush_context) -> None:
+    changes = session.info.setdefault(_CHANGES_KEY, {"cards": set(), "deleted": set(), "dimensions": False})
+    for obj in session.deleted:
+        if isinstance(obj, Card):
+            changes["deleted"].add(obj.id)
+        elif isinstance(obj, (Column, Board, User)):
+            changes["dimensions"] = True
+    for obj in list(session.new) + [obj for obj in session.dirty if session.is_modified(obj)]:
+        if isinstance(obj, Card):
+            changes["cards"].add(obj.id)
+        elif isinstance(obj, (Column, Board, User)):
+            changes["dimensions"] = True
+            if isinstance(obj, User):
+                # Назначение через пользователя меняет исполнителей карточек
+                history = inspect(obj).attrs.assigned_cards.history
+                changes["cards"].update(card.id for card in (*history.added, *history.deleted) if card.id is not None)
+
+
+def _after_commit(session: Session) -> None:
+    changes = session.info.pop(_CHANGES_KEY, None)
+    if changes and (changes["cards"] or changes["deleted"] or changes["dimensions"]):
+        card_facts_store.record_changes(changes["cards"], changes["deleted"], changes["dimensions"])
+
+
+def _after_rollback(session: Session) -> None:
+    session.info.pop(_CHANGES_KEY, None)
+
+
+def install_session_hooks(session_factory) -> None:
+    """Подключить учет изменений карточек к фабрике сессий"""
+    event.listen(session_factory, "after_flush", _after_flush)
+    event.listen(session_factory, "after_commit", _after_commit)
+    event.listen(session_factory, "after_rollback", _after_rollback)
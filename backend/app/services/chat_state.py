@@ -0,0 +1,86 @@
+"""
+Denormalized chat conversation state
+
+Для списка чатов беседа хранит ссылку на последнее сообщение и его время
+(last_message_id, last_message_at), а строка участника в
+chat_participants - курсор прочтения (last_read_message_id: все сообщения
+с id не больше прочитаны) и счетчик непрочитанных. Значения обновляются
+в той же транзакции, что и отправка сообщения или отметка о прочтении,
+поэтому список чатов строится одним запросом без подсчетов по сообщениям.
+Сумма непрочитанного пользователя по всем беседам поддерживается в
+app.services.unread_counters.
+"""
+from typing import Optional, Tuple
+
+from sqlalchemy import case, func, select, update
+from sqlalchemy.orm import Session
+
+from app.models.chat import ChatConversation, ChatMessage, chat_participants
+from app.services import unread_counters
+
+
+def record_message(db: Session, conversation: ChatConversation, message: ChatMessage) -> None:
+    """Учесть новое сообщение: последнее сообщение беседы и счетчики остальных участников"""
+    db.flush()
+    conversation.last_message_id = message.id
+    # now() в PostgreSQL - время начала транзакции, совпадает с created_at сообщения
+    conversation.last_message_at = func.now()
+    recipients = db.execute(
+        update(chat_participants)
+        .where(
+            chat_participants.c.conversation_id == conversation.id,
+            chat_participants.c.user_id != message.sender_id,
+        )
+        .values(unread_count=chat_participants.c.unread_count + 1)
+        .returning(chat_participants.c.user_id)
+    ).scalars().all()
+    unread_counters.add(db, {user_id: {"chat": 1} for user_id in recipients})
+
+
+def mark_read(db: Session, conversation_id: int, user_id: int, message_id: Optional[int]) -> None:
+    """
+    Сдвинуть курсор прочтения участника до message_id (назад не сдвигается)
+    и пересчитать счетчик непрочитанных по индексу (conversation_id, id).
+    Одно обновление строки участника.
+    """
+    if message_id is None:
+        return
+    cursor = case(
+        (chat_participants.c.last_read_message_id < message_id, message_id),
+        else_=chat_participants.c.last_read_message_id,
+    )
+    unread = (
+        select(func.count(ChatMessage.id))
+        .where(
+            ChatMessage.conversation_id == conversation_id,
+            ChatMessage.id > cursor,
+            ChatMessage.sender_id != user_id,
+        )
+        .scalar_subquery()
+    )
+    db.execute(
+        update(chat_participants)
+        .where(
+            chat_participants.c.conversation_id == conversation_id,
+            chat_participants.c.user_id == user_id,
+        )
+        .values(last_read_message_id=cursor, unread_count=unread)
+    )
+    unread_counters.recount_chat(db, [user_id])
+
+
+def read_state(db: Session, conversation_id: int, user_id: int) -> Tuple[int, int]:
+    """Курсор прочтения и счетчик непрочитанных участника"""
+    row = db.execute(
+        select(chat_participants.c.last_read_message_id, chat_participants.c.unread_count).where(
+            chat_participants.c.conversation_id == conversation_id,
+            chat_participants.c.user_id == user_id,
+        )
+    ).first()
+    return (row[0], row[1]) if row is not None else (0, 0)
+
+
+def direct_key(user_id: int, other_user_id: int) -> str:
+    """Канонический ключ личного чата двух пользователей"""
+    first, second = sorted((user_id, other_user_id))
+    return f"{first}:{second}"
@@ -0,0 +1,136 @@
+"""
+Data versions for cache invalidation
+
+Каждая зафиксированная транзакция, изменившая данные отчетов, увеличивает
+глобальную версию, а также версии затронутых досок. Кэши сравнивают
+сохраненный снимок версий с текущим и не отдают устаревшие значения.
+Изменения, которые нельзя отнести к доске (пользователи, контакты),
+увеличивают общую "внедосочную" версию.
+"""
+import threading
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session
+
+from app.models.user import User
+from app.models.board import Board, Column, Card, CardComment
+from app.models.contact import Contact
+from app.models.file import File
+
+
+_PENDING_KEY = "data_version_pending"
+
+
+class DataVersions:
+    """Потокобезопасные счетчики версий данных"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._global = 0
+        self._unscoped = 0
+        self._boards: Dict[int, int] = {}
+
+    def bump(self, board_ids: Iterable[int] = (), unscoped: bool = False) -> None:
+        with self._lock:
+            self._global += 1
+            for board_id in board_ids:
+                self._boards[board_id] = self._boards.get(board_id, 0) + 1
+            if unscoped:
+                self._unscoped += 1
+
+    def snapshot(self, board_ids: Optional[Iterable[int]] = None) -> Tuple:
+        """
+        Снимок версий: для board_ids=None - глобальная версия,
+        иначе версии перечисленных досок и внедосочная версия
+        """
+        with self._lock:
+            if board_ids is None:
+                return ("global", self._global)
+            return (
+                "boards",
+                self._unscoped,
+                tuple((board_id, self._boards.get(board_id, 0)) for board_id in sorted(set(board_ids))),
+            )
+
+
+data_versions = DataVersions()
+
+
+def _pending(session: Session) -> dict:
+    return session.info.setdefault(_PENDING_KEY, {"boards": set(), "unscoped": False, "dirty": False})
+
+
+def _attribute_values(obj, name: str) -> Set[int]:
+    """Текущее и предыдущее значения атрибута (для переносов между колонками)"""
+    history = inspect(obj).attrs[name].history
+    values = set(history.added or ()) | set(history.unchanged or ()) | set(history.deleted or ())
+    value = getattr(obj, name, None)
+    if value is not None:
+        values.add(value)
+    return {v for v in values if v is not None}
+
+
+def _after_flush(session: Session, flush_context) -> None:
+    pending = _pending(session)
+    column_ids: Set[int] = set()
+    card_ids: Set[int] = set()
+
+    changed = list(session.new) + list(session.deleted) + [
+        obj for obj in session.dirty if session.is_modified(obj)
+    ]
+    for obj in changed:
+        if isinstance(obj, Board):
+            pending["boards"].add(obj.id)
+        elif isinstance(obj, Column):
+            pending["boards"].update(_attribute_values(obj, "board_id"))
+        elif isinstance(obj, Card):
+            column_ids.update(_attribute_values(obj, "column_id"))
+        elif isinstance(obj, (CardComment, File)):
+            if obj.card_id is None:
+                pending["unscoped"] = True
+            else:
+                card_ids.update(_attribute_values(obj, "card_id"))
+        elif isinstance(obj, (User, Contact)):
+            pending["unscoped"] = True
+        else:
+            continue
+        pending["dirty"] = True
+
+    if not column_ids and not card_ids:
+        return
+
+    # Доски определяем запросом в той же транзакции, без autoflush
+    connection = session.connection()
+    if card_ids:
+        card_columns = dict(connection.execute(
+            select(Card.id, Card.column_id).where(Card.id.in_(card_ids))
+        ).all())
+        column_ids.update(card_columns.values())
+        if len(card_columns) < len(card_ids):
+            # Карточка уже удалена - доску не определить, считаем изменение внедосочным
+            pending["unscoped"] = True
+    if column_ids:
+        column_boards = dict(connection.execute(
+            select(Column.id, Column.board_id).where(Column.id.in_(column_ids))
+        ).all())
+        pending["boards"].update(column_boards.values())
+        if len(column_boards) < len(column_ids):
+            pending["unscoped"] = True
+
+
+def _after_commit(session: Session) -> None:
+    pending = session.info.pop(_PENDING_KEY, None)
+    if pending and pending["dirty"]:
+        data_versions.bump(pending["boards"], pending["unscoped"])
+
+
+def _after_rollback(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
+
+
+def install_session_hooks(session_factory) -> None:
+    """Подключить отслеживание изменений к фабрике сессий"""
+    event.listen(session_factory, "after_flush", _after_flush)
+    event.listen(session_factory, "after_commit", _after_commit)
+    event.listen(session_factory, "after_rollback", _after_rollback)
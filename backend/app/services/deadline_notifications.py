@@ -0,0 +1,107 @@
+"""
+Deadline notifications
+
+Проверка дедлайнов запускается каждый час, но по каждой задаче
+пользователь получает не больше одного уведомления каждого типа за
+сутки (UTC): уведомление хранит период, а уникальный индекс
+uq_notifications_period (user_id, card_id, type, period) отсекает
+повторы. Получатели всех задач (исполнители и владелец доски) читаются
+одним запросом, уведомления вставляются одним INSERT ... ON CONFLICT DO
+NOTHING. Массовая вставка идет в обход unit of work, поэтому push-события
+и счетчики непрочитанного для вставленных строк обновляются явно.
+Много задач одного типа у пользователя сворачиваются в дайджест
+(app.services.notification_digest).
+"""
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy.orm import Session
+
+from app.models.board import Board, Card, Column, card_assignees
+from app.models.notification import Notification, NotificationType
+from app.core.config import settings
+from app.services import notification_digest, notification_events, unread_counters
+from app.services.deadlines import due_soon_window, is_overdue, open_with_deadline
+
+
+def _insert(db: Session):
+    if db.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(Notification)
+
+
+def _texts(kind: NotificationType, title: str, manager: bool) -> Dict[str, str]:
+    if kind == NotificationType.CARD_OVERDUE:
+        return {"title": f"Просрочено: {title}", "message": f"Задача '{title}' просрочена!"}
+    return {
+        "title": f"Дедлайн близко: {title}" if manager else f"Дедлайн скоро: {title}",
+        "message": f"У задачи '{title}' дедлайн наступает завтра",
+    }
+
+
+def deadline_notification_rows(db: Session, now: Optional[datetime] = None) -> List[Dict[str, Any]]:
+    """
+    Строки уведомлений о скором дедлайне и просрочке за период now.
+    Один запрос: задачи окна с доской и исполнителями.
+    """
+    now = now or datetime.utcnow()
+    _, end = due_soon_window(now)
+    period = now.strftime("%Y-%m-%d")
+
+    rows = open_with_deadline(
+        db.query(Card.id, Card.title, Card.due_date, Column.board_id, Board.owner_id, card_assignees.c.user_id)
+        .join(Column, Column.id == Card.column_id)
+        .join(Board, Board.id == Column.board_id)
+        .outerjoin(card_assignees, card_assignees.c.card_id == Card.id)
+    ).filter(Card.due_date <= end).all()
+
+    result: Dict[tuple, Dict[str, Any]] = {}
+
+    def add(card_id, title, board_id, kind, user_id, manager):
+        # Один пользователь - одно уведомление на задачу (исполнитель важнее владельца)
+        key = (user_id, card_id, kind)
+        if user_id is None or key in result:
+            return
+        result[key] = {
+            "user_id": user_id,
+            "type": kind,
+            "card_id": card_id,
+            "link": f"/boards/{board_id}#card-{card_id}",
+            "period": period,
+            "is_read": False,
+            **_texts(kind, title, manager),
+        }
+
+    cards = []
+    for card_id, title, due_date, board_id, owner_id, assignee_id in rows:
+        kind = NotificationType.CARD_OVERDUE if is_overdue(due_date, False, now) else NotificationType.CARD_DUE_SOON
+        add(card_id, title, board_id, kind, assignee_id, False)
+        cards.append((card_id, title, board_id, kind, owner_id))
+    for card_id, title, board_id, kind, owner_id in cards:
+        add(card_id, title, board_id, kind, owner_id, True)
+    return list(result.values())
+
+
+def create_deadline_notifications(db: Session, now: Optional[datetime] = None) -> int:
+    """Создать недостающие уведомления о дедлайнах; возвращает число новых"""
+    rows = deadline_notification_rows(db, now)
+    digests = 0
+    if settings.NOTIFICATION_DIGEST_MIN_CARDS > 0:
+        rows, digests = notification_digest.coalesce(db, rows, settings.NOTIFICATION_DIGEST_MIN_CARDS)
+    if not rows:
+        return digests
+    statement = _insert(db).on_conflict_do_nothing(
+        index_elements=["user_id", "card_id", "type", "period"],
+        index_where=Notification.period.isnot(None),
+    ).returning(Notification)
+    created = db.scalars(statement, rows).all()
+
+    notification_events.publish_created(db, created)
+    unread_counters.add(db, {
+        user_id: {"notifications": count}
+        for user_id, count in Counter(notification.user_id for notification in created).items()
+    })
+    return len(created) + digests
@@ -0,0 +1,71 @@
+"""
+Deadline window queries
+
+Общие запросы "дедлайн скоро" и "просрочено" для уведомлений, отчетов и
+PDF-экспорта. Условия повторяют предикат частичного индекса
+ix_cards_open_due_date (completed = false AND due_date IS NOT NULL),
+поэтому планировщик выбирает сканирование по индексу, а не по всей
+таблице карточек. Проверка плана: scripts/benchmark_deadlines.py.
+"""
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Query, Session
+
+from app.models.board import Card, Column
+
+
+def _naive_utc(value: datetime) -> datetime:
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def open_with_deadline(query: Query) -> Query:
+    """Открытые задачи с дедлайном (предикат частичного индекса)"""
+    return query.filter(
+        Card.completed == False,
+        Card.due_date.isnot(None)
+    )
+
+
+def due_soon_window(now: Optional[datetime] = None) -> Tuple[datetime, datetime]:
+    """Окно "дедлайн скоро": от текущего момента до начала следующих суток"""
+    now = now or datetime.utcnow()
+    return now, now.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+
+
+def _scoped(query: Query, board_id: Optional[int]) -> Query:
+    if board_id is not None:
+        query = query.join(Card.column).filter(Column.board_id == board_id)
+    return query
+
+
+def overdue_cards(db: Session, now: Optional[datetime] = None, board_id: Optional[int] = None, query: Optional[Query] = None) -> Query:
+    """Просроченные открытые задачи"""
+    now = now or datetime.utcnow()
+    query = query if query is not None else db.query(Card)
+    return _scoped(open_with_deadline(query), board_id).filter(Card.due_date < now)
+
+
+def due_soon_cards(db: Session, now: Optional[datetime] = None, board_id: Optional[int] = None, query: Optional[Query] = None) -> Query:
+    """Открытые задачи, дедлайн которых наступает до конца текущих суток"""
+    start, end = due_soon_window(now)
+    query = query if query is not None else db.query(Card)
+    return _scoped(open_with_deadline(query), board_id).filter(
+        Card.due_date > start,
+        Card.due_date <= end
+    )
+
+
+def count_overdue(db: Session, now: Optional[datetime] = None, board_id: Optional[int] = None) -> int:
+    """Количество просроченных открытых задач"""
+    return overdue_cards(db, now, board_id, query=db.query(func.count(Card.id))).scalar() or 0
+
+
+def is_overdue(due_date: Optional[datetime], completed: bool, now: Optional[datetime] = None) -> bool:
+    """Просрочена ли задача (для уже загруженных карточек)"""
+    if not due_date or completed:
+        return False
+    return _naive_utc(due_date) < _naive_utc(now or datetime.utcnow())
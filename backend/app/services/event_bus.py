@@ -0,0 +1,257 @@
+"""
+Event bus for realtime events across workers
+
+Push-события (чат, уведомления, изменения досок) публикуются в шину в
+той же транзакции, что и изменение данных: event_bus.publish(db, ...)
+только накапливает событие в сессии, повторы одного и того же события
+отбрасываются, а при фиксации транзакции весь пакет отправляется разом.
+При откате пакет отбрасывается.
+
+Реализации:
+- PostgresEventBus - LISTEN/NOTIFY в существующей базе. Пакет
+  отправляется pg_notify внутри транзакции (PostgreSQL доставляет
+  уведомления только после COMMIT), каждый воркер держит одно
+  соединение LISTEN и одну задачу-диспетчер в своем event loop, которая
+  раздает события подключениям воркера (app.services.realtime).
+- InMemoryEventBus - доставка внутри процесса (тесты, SQLite, один воркер).
+"""
+import asyncio
+import json
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import event, func, select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.services.realtime import ConnectionRegistry, registry as default_registry
+
+
+CHANNEL = "crm_events"
+MAX_PAYLOAD_BYTES = 7500  # предел NOTIFY - 8000 байт
+RECONNECT_DELAY_SECONDS = (1, 2, 5, 10, 30)
+_PENDING_KEY = "event_bus_pending"
+_COMMITTING_KEY = "event_bus_committing"
+
+
+def _encode(item: Dict[str, Any]) -> str:
+    return json.dumps(item, ensure_ascii=False, sort_keys=True, separators=(",", ":"), default=str)
+
+
+class EventBus:
+    """Шина событий, адресованных пользователям"""
+
+    def __init__(self, registry: Optional[ConnectionRegistry] = None):
+        self.registry = registry or default_registry
+
+    def publish(self, db: Optional[Session], channel: str, user_ids: Iterable[int], event: Dict[str, Any]) -> None:
+        """
+        Опубликовать событие канала для пользователей. С сессией - при
+        фиксации ее транзакции, без сессии - сразу.
+        """
+        item = {"channel": channel, "users": sorted(set(user_ids)), "event": event}
+        if not item["users"]:
+            return
+        if db is None:
+            self._send_now([item])
+            return
+        pending = db.info.setdefault(_PENDING_KEY, {})
+        pending.setdefault(_encode(item), item)
+
+    def _deliver(self, items: Iterable[Dict[str, Any]]) -> None:
+        """Раздать события подключениям этого процесса"""
+        for item in items:
+            self.registry.publish_threadsafe(item["channel"], item["users"], item["event"])
+
+    # Отправка пакета
+
+    def _send_in_transaction(self, db: Session, items: List[Dict[str, Any]]) -> None:
+        """Пакет транзакции перед COMMIT, пока транзакция открыта"""
+
+    def _committed(self, items: List[Dict[str, Any]]) -> None:
+        """Пакет транзакции после COMMIT"""
+
+    def _send_now(self, items: List[Dict[str, Any]]) -> None:
+        """События, опубликованные без сессии"""
+
+    # Хуки сессии
+
+    def _before_commit(self, db: Session) -> None:
+        # События, которые публикуются хуками after_flush (новые уведомления),
+        # должны попасть в пакет до его отправки
+        if db.new or db.dirty or db.deleted:
+            db.flush()
+        pending = db.info.pop(_PENDING_KEY, None)
+        if pending:
+            items = list(pending.values())
+            self._send_in_transaction(db, items)
+            db.info[_COMMITTING_KEY] = items
+
+    def _after_commit(self, db: Session) -> None:
+        items = db.info.pop(_COMMITTING_KEY, [])
+        # Опубликованные уже после отправки пакета - отдельно
+        late = db.info.pop(_PENDING_KEY, None)
+        if items:
+            self._committed(items)
+        if late:
+            self._send_now(list(late.values()))
+
+    def _after_rollback(self, db: Session) -> None:
+        db.info.pop(_PENDING_KEY, None)
+        db.info.pop(_COMMITTING_KEY, None)
+
+    def install(self, session_factory) -> None:
+        """Подключить шину к фабрике сессий"""
+        event.listen(session_factory, "before_commit", self._before_commit)
+        event.listen(session_factory, "after_commit", self._after_commit)
+        event.listen(session_factory, "after_rollback", self._after_rollback)
+
+    # Диспетчер воркера
+
+    async def start(self) -> None:
+        """Запустить прием событий в event loop воркера"""
+
+    async def stop(self) -> None:
+        """Остановить прием событий"""
+
+
+class InMemoryEventBus(EventBus):
+    """Доставка внутри процесса после фиксации транзакции"""
+
+    def _committed(self, items):
+        self._deliver(items)
+
+    def _send_now(self, items):
+        self._deliver(items)
+
+
+class PostgresEventBus(EventBus):
+    """LISTEN/NOTIFY: пакет событий транзакции - одно или несколько уведомлений"""
+
+    def __init__(self, dsn: str, registry: Optional[ConnectionRegistry] = None):
+        super().__init__(registry)
+        self.dsn = dsn
+        self._connection = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._reconnect: Optional[asyncio.Task] = None
+        self._stopped = False
+
+    @staticmethod
+    def _payloads(items: List[Dict[str, Any]]) -> List[str]:
+        """Пакет, разбитый на уведомления не больше MAX_PAYLOAD_BYTES"""
+        payloads, batch, size = [], [], 2
+        for item in items:
+            encoded = _encode(item)
+            if len(encoded.encode("utf-8")) > MAX_PAYLOAD_BYTES - 2:
+                # Слишком большое событие (длинное сообщение) - без вложенных данных,
+                # клиент перечитает их через API
+                encoded = _encode({**item, "event": {
+                    **{k: v for k, v in item["event"].items() if not isinstance(v, (dict, list, str)) or k == "type"},
+                    "truncated": True,
+                }})
+            encoded_size = len(encoded.encode("utf-8")) + 1
+            if batch and size + encoded_size > MAX_PAYLOAD_BYTES:
+                payloads.append("[" + ",".join(batch) + "]")
+                batch, size = [], 2
+            batch.append(encoded)
+            size += encoded_size
+        if batch:
+            payloads.append("[" + ",".join(batch) + "]")
+        return payloads
+
+    def _send_in_transaction(self, db, items):
+        for payload in self._payloads(items):
+            db.execute(select(func.pg_notify(CHANNEL, payload)))
+
+    def _send_now(self, items):
+        # Публикация без сессии: отдельная короткая транзакция
+        from app.core.database import SessionLocal
+        db = SessionLocal()
+        try:
+            self._send_in_transaction(db, items)
+            db.commit()
+        finally:
+            db.close()
+
+    def _on_readable(self) -> None:
+        connection = self._connection
+        try:
+            connection.poll()
+        except Exception as e:
+            print(f"Ошибка соединения шины событий: {e}")
+            self._disconnect()
+            self._schedule_reconnect()
+            return
+        while connection.notifies:
+            notify = connection.notifies.pop(0)
+            try:
+                items = json.loads(notify.payload)
+            except ValueError:
+                continue
+            self._deliver(items)
+
+    def _connect(self) -> None:
+        import psycopg2
+        import psycopg2.extensions
+
+        connection = psycopg2.connect(self.dsn)
+        connection.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+        with connection.cursor() as cursor:
+            cursor.execute(f"LISTEN {CHANNEL}")
+        self._connection = connection
+        self._loop.add_reader(connection.fileno(), self._on_readable)
+
+    def _disconnect(self) -> None:
+        connection, self._connection = self._connection, None
+        if connection is None:
+            return
+        try:
+            self._loop.remove_reader(connection.fileno())
+        except Exception:
+            pass
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def _schedule_reconnect(self) -> None:
+        if not self._stopped and (self._reconnect is None or self._reconnect.done()):
+            self._reconnect = self._loop.create_task(self._reconnect_loop())
+
+    async def _reconnect_loop(self) -> None:
+        attempt = 0
+        while not self._stopped and self._connection is None:
+            await asyncio.sleep(RECONNECT_DELAY_SECONDS[min(attempt, len(RECONNECT_DELAY_SECONDS) - 1)])
+            attempt += 1
+            try:
+                self._connect()
+                print("✅ Шина событий переподключена")
+            except Exception as e:
+                print(f"Ошибка подключения шины событий: {e}")
+
+    async def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._stopped = False
+        try:
+            self._connect()
+        except Exception as e:
+            print(f"Ошибка подключения шины событий: {e}")
+            self._schedule_reconnect()
+
+    async def stop(self) -> None:
+        self._stopped = True
+        if self._reconnect is not None:
+            self._reconnect.cancel()
+        self._disconnect()
+
+
+def create_event_bus() -> EventBus:
+    """Шина по настройке EVENT_BUS (auto - PostgreSQL, если база PostgreSQL)"""
+    choice = settings.EVENT_BUS
+    if choice == "auto":
+        choice = "postgres" if settings.DATABASE_URL.startswith("postgresql") else "memory"
+    if choice == "postgres":
+        return PostgresEventBus(settings.DATABASE_URL.replace("postgresql+psycopg2://", "postgresql://"))
+    return InMemoryEventBus()
+
+
+event_bus = create_event_bus()
@@ -0,0 +1,310 @@
+"""
+Content-addressed file storage
+
+Содержимое файлов хранится один раз на SHA-256:
+UPLOAD_DIR/blobs/ab/cd/<sha256>. Запись files ссылается на содержимое
+через files.sha256, а file_blobs.ref_count - число таких записей.
+Одинаковые документы, прикрепленные к разным задачам, занимают место на
+диске (и в резервных копиях) один раз.
+
+Загрузка копируется из UploadFile во временный файл порциями по
+UPLOAD_CHUNK_SIZE через aiofiles: в памяти одновременно находится одна
+порция, запись не блокирует event loop, SHA-256 считается по ходу
+копирования. Как только размер превышает MAX_UPLOAD_SIZE, копирование
+прерывается и временный файл удаляется. Затем счетчик ссылок
+увеличивается (INSERT ... ON CONFLICT DO UPDATE), а временный файл
+атомарно переименовывается в путь по хешу или удаляется, если такое
+содержимое уже есть.
+
+При удалении записи счетчик уменьшается; последняя ссылка удаляет строку
+file_blobs, а сам файл удаляется хуком сессии после фиксации транзакции
+(при откате файл остается на месте). Перед удалением файла в отдельной
+транзакции вставляется пустая строка file_blobs: если то же содержимое
+уже загружено заново (в том числе в незафиксированной транзакции -
+PostgreSQL дожидается ее завершения), вставка не проходит и файл не
+трогается; иначе строка до фиксации блокирует acquire() параллельных
+загрузок, и они не могут посчитать удаляемый файл существующим. Записи, удаленные каскадом в базе (удаление задачи),
+исправляет фоновая сверка collect_blobs. Файлы, загруженные до хранилища
+по хешу, переносятся фоновой задачей relink_legacy_files.
+"""
+import hashlib
+import os
+import shutil
+import time
+import uuid
+from typing import Optional, Tuple
+
+import aiofiles
+import aiofiles.os
+from fastapi import UploadFile
+from sqlalchemy import and_, delete, event, exists, func, select, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.file import File, FileBlob
+
+
+BLOB_DIR = "blobs"
+TEMP_SUFFIX = ".part"
+HASH_CHUNK_SIZE = 1024 * 1024
+_RELEASED_KEY = "file_storage_released"
+
+
+class UploadTooLarge(Exception):
+    """Загрузка больше допустимого размера"""
+
+
+def blob_path(sha256: str) -> str:
+    """Путь к содержимому по хешу"""
+    return os.path.join(settings.UPLOAD_DIR, BLOB_DIR, sha256[:2], sha256[2:4], sha256)
+
+
+def _insert(bind):
+    if bind.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(FileBlob)
+
+
+def _unreferenced(sha256: str):
+    return and_(
+        FileBlob.sha256 == sha256,
+        FileBlob.ref_count <= 0,
+        ~exists().where(File.sha256 == sha256),
+    )
+
+
+def _unlink(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _remove_blobs(bind, hashes) -> int:
+    """Удалить файлы содержимого, для которого нет строки file_blobs"""
+    removed = 0
+    for sha256 in set(hashes):
+        with bind.begin() as connection:
+            locked = connection.execute(
+                _insert(connection).values(sha256=sha256, file_size=0, ref_count=0)
+                .on_conflict_do_nothing(index_elements=[FileBlob.sha256])
+            ).rowcount
+            if not locked:
+                continue
+            _unlink(blob_path(sha256))
+            connection.execute(delete(FileBlob).where(_unreferenced(sha256)))
+        removed += 1
+    return removed
+
+
+# Счетчики ссылок
+
+def acquire(db: Session, sha256: str, file_size: int) -> None:
+    """Добавить ссылку на содержимое (строка file_blobs создается при первой)"""
+    statement = _insert(db.get_bind()).values(sha256=sha256, file_size=file_size, ref_count=1)
+    db.execute(statement.on_conflict_do_update(
+        index_elements=[FileBlob.sha256],
+        set_={"ref_count": FileBlob.ref_count + 1},
+    ))
+
+
+def release(db: Session, sha256: str) -> None:
+    """
+    Снять ссылку (запись files уже удалена); последняя удаляет строку
+    file_blobs, файл удаляется после фиксации транзакции
+    """
+    remaining = db.execute(
+        update(FileBlob)
+        .where(FileBlob.sha256 == sha256)
+        .values(ref_count=FileBlob.ref_count - 1)
+        .returning(FileBlob.ref_count)
+    ).scalar()
+    if remaining is not None and remaining <= 0:
+        if db.execute(delete(FileBlob).where(_unreferenced(sha256))).rowcount:
+            db.info.setdefault(_RELEASED_KEY, set()).add(sha256)
+
+
+def delete_file_record(db: Session, file: File) -> None:
+    """Удалить запись файла и, если это последняя ссылка, содержимое (без commit)"""
+    sha256, file_path = file.sha256, file.file_path
+    db.delete(file)
+    db.flush()
+    if sha256 is not None:
+        release(db, sha256)
+    elif os.path.exists(file_path):
+        os.remove(file_path)
+
+
+# Загрузка
+
+async def _remove_temp(temp_path: str) -> None:
+    try:
+        await aiofiles.os.remove(temp_path)
+    except OSError:
+        pass
+
+
+async def _write_temp(upload: UploadFile, max_size: int) -> Tuple[str, int, str]:
+    await aiofiles.os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
+    temp_path = os.path.join(settings.UPLOAD_DIR, f".{uuid.uuid4().hex}{TEMP_SUFFIX}")
+
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        async with aiofiles.open(temp_path, "wb") as target:
+            while chunk := await upload.read(settings.UPLOAD_CHUNK_SIZE):
+                size += len(chunk)
+                if size > max_size:
+                    raise UploadTooLarge()
+                digest.update(chunk)
+                await target.write(chunk)
+    except BaseException:
+        await _remove_temp(temp_path)
+        raise
+    return temp_path, size, digest.hexdigest()
+
+
+async def store_upload(db: Session, upload: UploadFile, max_size: Optional[int] = None) -> Tuple[str, int, str]:
+    """
+    Сохранить загрузку в хранилище по хешу и добавить ссылку на содержимое
+    (без commit). Возвращает путь, размер и SHA-256; UploadTooLarge - при
+    превышении max_size.
+    """
+    max_size = settings.MAX_UPLOAD_SIZE if max_size is None else max_size
+    temp_path, size, sha256 = await _write_temp(upload, max_size)
+    path = blob_path(sha256)
+    try:
+        acquire(db, sha256, size)
+        if await aiofiles.os.path.exists(path):
+            await _remove_temp(temp_path)
+        else:
+            await aiofiles.os.makedirs(os.path.dirname(path), exist_ok=True)
+            await aiofiles.os.replace(temp_path, path)
+    except BaseException:
+        await _remove_temp(temp_path)
+        raise
+    return path, size, sha256
+
+
+# Фоновое обслуживание
+
+def _hash_file(path: str) -> Tuple[int, str]:
+    digest = hashlib.sha256()
+    size = 0
+    with open(path, "rb") as source:
+        while chunk := source.read(HASH_CHUNK_SIZE):
+            size += len(chunk)
+            digest.update(chunk)
+    return size, digest.hexdigest()
+
+
+def _link_or_copy(source: str, target: str) -> None:
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    temp_path = f"{target}.{uuid.uuid4().hex}{TEMP_SUFFIX}"
+    try:
+        try:
+            os.link(source, temp_path)
+        except OSError:
+            shutil.copyfile(source, temp_path)
+        os.replace(temp_path, target)
+    except BaseException:
+        _unlink(temp_path)
+        raise
+
+
+def relink_legacy_files(db: Session, after_id: int = 0, limit: Optional[int] = None) -> Tuple[int, int]:
+    """
+    Перенести порцию файлов без хеша (загруженных до хранилища по хешу) в
+    хранилище: посчитать хеш, добавить ссылку, переключить запись на путь
+    по хешу; старый файл удаляется после фиксации. Возвращает число
+    перенесенных файлов и id последней просмотренной записи (0 - порция пуста).
+    """
+    files = db.query(File).filter(
+        File.sha256.is_(None),
+        File.id > after_id
+    ).order_by(File.id).limit(limit or settings.FILE_RELINK_BATCH_SIZE).all()
+    if not files:
+        return 0, 0
+
+    replaced = []
+    for file in files:
+        if not os.path.exists(file.file_path):
+            continue
+        size, sha256 = _hash_file(file.file_path)
+        path = blob_path(sha256)
+        acquire(db, sha256, size)
+        if not os.path.exists(path):
+            _link_or_copy(file.file_path, path)
+        replaced.append(file.file_path)
+        file.file_path = path
+        file.filename = sha256
+        file.file_size = size
+        file.sha256 = sha256
+    last_id = files[-1].id
+    db.commit()
+
+    for old_path in replaced:
+        _unlink(old_path)
+    return len(replaced), last_id
+
+
+def collect_blobs(db: Session) -> Tuple[int, int]:
+    """
+    Сверить счетчики ссылок с таблицей files (записи удаляются каскадом
+    вместе с задачами) и удалить содержимое без ссылок. Возвращает число
+    исправленных счетчиков и удаленных файлов.
+    """
+    actual = select(func.count(File.id)).where(File.sha256 == FileBlob.sha256).scalar_subquery()
+    fixed = db.execute(
+        update(FileBlob).where(FileBlob.ref_count != actual).values(ref_count=actual)
+    ).rowcount
+    removed = []
+    for sha256 in db.execute(select(FileBlob.sha256).where(FileBlob.ref_count <= 0)).scalars().all():
+        if db.execute(delete(FileBlob).where(_unreferenced(sha256))).rowcount:
+            removed.append(sha256)
+    db.commit()
+    _remove_blobs(db.get_bind(), removed)
+    return fixed, len(removed)
+
+
+def remove_stale_temp_files(directory: str, max_age_seconds: int = 3600) -> int:
+    """
+    Удалить временные файлы прерванных загрузок и переносов (например, при
+    остановке процесса), включая каталоги хранилища по хешу
+    """
+    if not os.path.isdir(directory):
+        return 0
+    removed = 0
+    deadline = time.time() - max_age_seconds
+    for root, _, names in os.walk(directory):
+        for name in names:
+            if not name.endswith(TEMP_SUFFIX):
+                continue
+            path = os.path.join(root, name)
+            try:
+                if os.path.getmtime(path) < deadline:
+                    os.remove(path)
+                    removed += 1
+            except OSError:
+                pass
+    return removed
+
+
+# Хуки сессии
+
+def _after_commit(session: Session) -> None:
+    released = session.info.pop(_RELEASED_KEY, None)
+    if released:
+        _remove_blobs(session.get_bind(), released)
+
+
+def _after_rollback(session: Session) -> None:
+    session.info.pop(_RELEASED_KEY, None)
+
+
+def install_session_hooks(session_factory) -> None:
+    """Удалять файлы содержимого без ссылок после фиксации транзакций"""
+    event.listen(session_factory, "after_commit", _after_commit)
+    event.listen(session_factory, "after_rollback", _after_rollback)
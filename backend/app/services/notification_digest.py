@@ -0,0 +1,141 @@
+"""
+Notification digests
+
+Если за период у пользователя набирается не меньше
+NOTIFICATION_DIGEST_MIN_CARDS уведомлений о дедлайнах одного типа, вместо
+отдельных уведомлений по задачам создается одно уведомление-дайджест:
+card_id пустой, список задач - в payload {"card_ids": [...]}, уникальный
+индекс uq_notifications_digest допускает один дайджест на пользователя,
+тип и период. Дайджест заменяет отдельные уведомления: непрочитанные
+уведомления того же типа за период, созданные предыдущими проверками
+(до того, как задач набралось достаточно), удаляются в той же
+транзакции. Если в следующих проверках за тот же период появляются
+новые задачи, дайджест заменяется новым (непрочитанным) со всеми
+задачами - пользователь получает одно push-событие вместо десятка.
+
+Текст дайджеста строится по текущим названиям задач при чтении
+(render), в строке хранится только краткий вариант на момент создания.
+"""
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.models.board import Card
+from app.models.notification import Notification, NotificationType
+from app.schemas.notification import Notification as NotificationSchema
+
+
+PREVIEW_CARDS = 3
+
+
+def _card_titles(db: Session, card_ids: Iterable[int]) -> Dict[int, str]:
+    card_ids = set(card_ids)
+    if not card_ids:
+        return {}
+    return dict(db.execute(select(Card.id, Card.title).where(Card.id.in_(card_ids))).all())
+
+
+def _title(kind: NotificationType, count: int) -> str:
+    if kind == NotificationType.CARD_OVERDUE:
+        return f"Просрочено задач: {count}"
+    return f"Дедлайн наступает завтра у задач: {count}"
+
+
+def _message(titles: List[str]) -> str:
+    if not titles:
+        return "Задачи уже удалены"
+    preview = ", ".join(f"'{title}'" for title in titles[:PREVIEW_CARDS])
+    rest = len(titles) - PREVIEW_CARDS
+    return f"Задачи: {preview}" + (f" и еще {rest}" if rest > 0 else "")
+
+
+def coalesce(db: Session, rows: List[Dict[str, Any]], min_cards: int) -> Tuple[List[Dict[str, Any]], int]:
+    """
+    Свернуть строки уведомлений о дедлайнах (одного периода) в дайджесты.
+    Возвращает строки, остающиеся отдельными уведомлениями, и число
+    созданных дайджестов (без commit).
+    """
+    if not rows:
+        return rows, 0
+    period = rows[0]["period"]
+    groups: Dict[tuple, List[Dict[str, Any]]] = defaultdict(list)
+    for row in rows:
+        groups[(row["user_id"], row["type"])].append(row)
+
+    existing = {
+        (digest.user_id, digest.type): digest
+        for digest in db.query(Notification).filter(
+            Notification.period == period,
+            Notification.card_id.is_(None),
+            Notification.user_id.in_({user_id for user_id, _ in groups}),
+        )
+    }
+
+    individual: List[Dict[str, Any]] = []
+    digests: Dict[tuple, List[int]] = {}
+    for key, group in groups.items():
+        card_ids = [row["card_id"] for row in group]
+        digest = existing.get(key)
+        if digest is not None:
+            known = list(digest.card_ids or ())
+            known_ids = set(known)
+            new_ids = [card_id for card_id in card_ids if card_id not in known_ids]
+            if new_ids:
+                digests[key] = known + new_ids
+                db.delete(digest)
+        elif len(card_ids) >= min_cards:
+            digests[key] = card_ids
+        else:
+            individual.extend(group)
+    if not digests:
+        return individual, 0
+
+    # Отдельные непрочитанные уведомления за период заменяются дайджестом
+    # (счетчики непрочитанного уменьшает хук сессии)
+    for notification in db.query(Notification).filter(
+        Notification.period == period,
+        Notification.card_id.isnot(None),
+        Notification.is_read == False,  # noqa: E712
+        Notification.user_id.in_({user_id for user_id, _ in digests}),
+    ):
+        if (notification.user_id, notification.type) in digests:
+            db.delete(notification)
+    # Старые дайджесты удаляются до вставки новых (уникальный индекс)
+    db.flush()
+
+    titles = _card_titles(db, (card_id for card_ids in digests.values() for card_id in card_ids))
+    created = 0
+    for (user_id, kind), card_ids in digests.items():
+        try:
+            with db.begin_nested():
+                db.add(Notification(
+                    user_id=user_id,
+                    type=kind,
+                    title=_title(kind, len(card_ids)),
+                    message=_message([titles[i] for i in card_ids if i in titles]),
+                    period=period,
+                    payload={"card_ids": card_ids},
+                    is_read=False,
+                ))
+            created += 1
+        except IntegrityError:
+            # Дайджест за период уже создан параллельной проверкой
+            pass
+    return individual, created
+
+
+def render(db: Session, notifications: List[Notification]) -> List[NotificationSchema]:
+    """Уведомления для ответа API; текст дайджестов - по текущим названиям задач"""
+    titles = _card_titles(db, (card_id for n in notifications for card_id in (n.card_ids or ())))
+    result = []
+    for notification in notifications:
+        item = NotificationSchema.model_validate(notification)
+        if notification.card_ids is not None:
+            item = item.model_copy(update={
+                "message": _message([titles[i] for i in notification.card_ids if i in titles]),
+            })
+        result.append(item)
+    return result
@@ -0,0 +1,43 @@
+"""
+Push events for notifications
+
+Каждое новое уведомление (из эндпоинтов или фоновых задач вроде проверки
+дедлайнов) публикуется в шину событий в канал "notifications" при
+фиксации транзакции, в которой оно создано, - производителям ничего
+делать не нужно. Событие читает поток GET /notifications/stream.
+Уведомления, вставленные массово в обход unit of work (см.
+app.services.deadline_notifications), публикуются через publish_created.
+"""
+from typing import Any, Dict, Iterable
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.models.notification import Notification
+from app.schemas.notification import Notification as NotificationSchema
+from app.services.event_bus import event_bus
+
+
+CHANNEL = "notifications"
+
+
+def notification_event(notification: Notification) -> Dict[str, Any]:
+    return {
+        "type": "notification",
+        "notification": NotificationSchema.model_validate(notification).model_dump(mode="json"),
+    }
+
+
+def publish_created(db: Session, notifications: Iterable[Notification]) -> None:
+    """Опубликовать новые уведомления при фиксации транзакции db"""
+    for notification in notifications:
+        event_bus.publish(db, CHANNEL, [notification.user_id], notification_event(notification))
+
+
+def _after_flush(session: Session, flush_context) -> None:
+    publish_created(session, [obj for obj in session.new if isinstance(obj, Notification)])
+
+
+def install_session_hooks(session_factory) -> None:
+    """Публиковать новые уведомления при фиксации транзакций"""
+    event.listen(session_factory, "after_flush", _after_flush)
@@ -0,0 +1,93 @@
+"""
+Notification retention
+
+Таблица notifications хранит только актуальные уведомления: прочитанные
+старше NOTIFICATION_RETENTION_DAYS переносятся в notifications_archive,
+а записи архива старше NOTIFICATION_ARCHIVE_RETENTION_DAYS удаляются.
+Перенос идет порциями по NOTIFICATION_PURGE_BATCH_SIZE строк, каждая
+порция - отдельная короткая транзакция (INSERT ... SELECT и DELETE по
+списку id), за один проход - не больше NOTIFICATION_PURGE_MAX_BATCHES
+порций; остаток переносится следующими проходами. Порции выбираются в
+порядке первичного ключа, поэтому старые строки находятся без
+отдельного индекса.
+
+Переносятся только прочитанные уведомления, поэтому счетчики
+непрочитанного (app.services.unread_counters) не меняются.
+"""
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+
+from sqlalchemy import delete, insert, select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.notification import Notification, NotificationArchive
+
+
+ARCHIVED_COLUMNS = (
+    "id", "user_id", "type", "title", "message", "card_id", "link", "period", "payload",
+    "is_read", "created_at", "read_at",
+)
+
+
+def _batches(limit: Optional[int]) -> range:
+    return range(limit if limit is not None else max(settings.NOTIFICATION_PURGE_MAX_BATCHES, 1))
+
+
+def archive_read_notifications(db: Session, now: Optional[datetime] = None, max_batches: Optional[int] = None) -> int:
+    """Перенести старые прочитанные уведомления в архив; возвращает число строк"""
+    if settings.NOTIFICATION_RETENTION_DAYS <= 0:
+        return 0
+    cutoff = (now or datetime.utcnow()) - timedelta(days=settings.NOTIFICATION_RETENTION_DAYS)
+    batch_size = max(settings.NOTIFICATION_PURGE_BATCH_SIZE, 1)
+    columns = [getattr(Notification, name) for name in ARCHIVED_COLUMNS]
+
+    moved = 0
+    for _ in _batches(max_batches):
+        ids = db.execute(
+            select(Notification.id)
+            .where(Notification.is_read == True, Notification.created_at < cutoff)  # noqa: E712
+            .order_by(Notification.id)
+            .limit(batch_size)
+        ).scalars().all()
+        if not ids:
+            break
+        db.execute(
+            insert(NotificationArchive).from_select(ARCHIVED_COLUMNS, select(*columns).where(Notification.id.in_(ids)))
+        )
+        db.execute(delete(Notification).where(Notification.id.in_(ids)))
+        db.commit()
+        moved += len(ids)
+        if len(ids) < batch_size:
+            break
+    return moved
+
+
+def purge_archive(db: Session, now: Optional[datetime] = None, max_batches: Optional[int] = None) -> int:
+    """Удалить записи архива старше срока хранения; возвращает число строк"""
+    if settings.NOTIFICATION_ARCHIVE_RETENTION_DAYS <= 0:
+        return 0
+    cutoff = (now or datetime.utcnow()) - timedelta(days=settings.NOTIFICATION_ARCHIVE_RETENTION_DAYS)
+    batch_size = max(settings.NOTIFICATION_PURGE_BATCH_SIZE, 1)
+
+    purged = 0
+    for _ in _batches(max_batches):
+        ids = db.execute(
+            select(NotificationArchive.id)
+            .where(NotificationArchive.created_at < cutoff)
+            .order_by(NotificationArchive.id)
+            .limit(batch_size)
+        ).scalars().all()
+        if not ids:
+            break
+        db.execute(delete(NotificationArchive).where(NotificationArchive.id.in_(ids)))
+        db.commit()
+        purged += len(ids)
+        if len(ids) < batch_size:
+            break
+    return purged
+
+
+def apply_retention(db: Session, now: Optional[datetime] = None) -> Tuple[int, int]:
+    """Перенос в архив и очистка архива; (перенесено, удалено)"""
+    return archive_read_notifications(db, now), purge_archive(db, now)
@@ -0,0 +1,104 @@
+"""
+In-process realtime event broker
+
+Реестр подключений по id пользователя. Подключение слушает один канал
+("chat" - WebSocket чата, "notifications" - поток уведомлений SSE).
+Событие адресуется каналу и списку пользователей и кладется в очередь
+отправки каждого их подключения к этому каналу; отправкой из очереди
+занимается отдельная задача подключения, поэтому медленный клиент не
+задерживает остальных.
+Очередь ограничена: если клиент не успевает забирать события, подключение
+закрывается (клиент переподключается и перечитывает состояние через API).
+
+Реестр живет в event loop приложения. Из других потоков (фоновые задачи)
+события публикуются через publish_threadsafe.
+"""
+import asyncio
+from typing import Any, Callable, Dict, Iterable, Optional, Set
+
+from app.core.config import settings
+
+
+class Connection:
+    """Подключение пользователя с ограниченной очередью отправки"""
+
+    def __init__(self, user_id: int, channel: str, queue_size: Optional[int] = None,
+                 on_overflow: Optional[Callable[["Connection"], None]] = None):
+        self.user_id = user_id
+        self.channel = channel
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size or settings.REALTIME_QUEUE_SIZE)
+        self.on_overflow = on_overflow
+        self.closed = False
+        self.dropped = 0
+
+    def offer(self, event: Dict[str, Any]) -> bool:
+        """Поставить событие в очередь; False, если очередь переполнена"""
+        if self.closed:
+            return False
+        try:
+            self.queue.put_nowait(event)
+            return True
+        except asyncio.QueueFull:
+            self.dropped += 1
+            self.closed = True
+            if self.on_overflow is not None:
+                self.on_overflow(self)
+            return False
+
+
+class ConnectionRegistry:
+    """Подключения по пользователям и рассылка событий"""
+
+    def __init__(self):
+        self._connections: Dict[int, Set[Connection]] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def register(self, connection: Connection) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._connections.setdefault(connection.user_id, set()).add(connection)
+
+    def unregister(self, connection: Connection) -> None:
+        connection.closed = True
+        connections = self._connections.get(connection.user_id)
+        if connections is None:
+            return
+        connections.discard(connection)
+        if not connections:
+            del self._connections[connection.user_id]
+
+    def connection_count(self, user_id: int, channel: Optional[str] = None) -> int:
+        return sum(
+            1 for connection in self._connections.get(user_id, ())
+            if channel is None or connection.channel == channel
+        )
+
+    def publish(self, channel: str, user_ids: Iterable[int], event: Dict[str, Any]) -> int:
+        """Разослать событие подключениям пользователей к каналу (в потоке event loop)"""
+        delivered = 0
+        for user_id in set(user_ids):
+            for connection in list(self._connections.get(user_id, ())):
+                if connection.channel == channel and connection.offer(event):
+                    delivered += 1
+        return delivered
+
+    def publish_threadsafe(self, channel: str, user_ids: Iterable[int], event: Dict[str, Any]) -> None:
+        """Разослать событие из любого потока"""
+        if self._loop is None or self._loop.is_closed():
+            return
+        try:
+            in_loop = asyncio.get_running_loop() is self._loop
+        except RuntimeError:
+            in_loop = False
+        if in_loop:
+            self.publish(channel, user_ids, event)
+        else:
+            self._loop.call_soon_threadsafe(self.publish, channel, list(user_ids), event)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "users": len(self._connections),
+            "connections": sum(len(connections) for connections in self._connections.values()),
+        }
+
+
+registry = ConnectionRegistry()
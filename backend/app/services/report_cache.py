@@ -0,0 +1,162 @@
+"""
+Report result cache
+
+Записи кэшируются по ключу (отчет, нормализованные параметры, роль) и
+считаются актуальными, пока не истек TTL и не изменились версии данных
+(см. app.services.data_version). Одновременные одинаковые запросы
+объединяются: отчет вычисляется один раз, остальные ждут результат.
+Вычисление идет в отдельной задаче со своей сессией БД и не зависит от
+запроса, который его начал: если клиент отключился, остальные ожидающие
+получат результат, а он попадет в кэш.
+Кэш локален для процесса; между воркерами согласованность ограничена TTL.
+"""
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.services.data_version import data_versions
+
+
+class _Entry:
+    __slots__ = ("value", "versions", "expires_at")
+
+    def __init__(self, value: Any, versions: Tuple, expires_at: float):
+        self.value = value
+        self.versions = versions
+        self.expires_at = expires_at
+
+
+class ReportCache:
+    """LRU-кэш результатов отчетов с TTL и инвалидацией по версиям данных"""
+
+    def __init__(self, ttl_seconds: int, max_entries: int, enabled: bool = True, session_factory=SessionLocal):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.enabled = enabled
+        self.session_factory = session_factory
+        self._entries: "OrderedDict[Tuple, _Entry]" = OrderedDict()
+        self._inflight: Dict[Tuple, asyncio.Future] = {}
+        self._tasks = set()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(endpoint: str, params: Dict[str, Any], role: Any) -> Tuple:
+        """Ключ записи: параметры без пустых значений, в отсортированном порядке"""
+        normalized = tuple(sorted(
+            (name, tuple(value) if isinstance(value, (list, tuple)) else value)
+            for name, value in params.items()
+            if value is not None
+        ))
+        return (endpoint, normalized, getattr(role, "value", role))
+
+    async def get_or_compute(
+        self,
+        endpoint: str,
+        params: Dict[str, Any],
+        role: Any,
+        compute: Callable[[Session], Any],
+        board_ids: Optional[Iterable[int]] = None,
+    ) -> Any:
+        """
+        Вернуть результат из кэша или вычислить его в пуле потоков.
+        compute получает собственную сессию БД вычисления.
+        board_ids сужает инвалидацию до версий указанных досок.
+        """
+        if not self.enabled:
+            return await run_in_threadpool(self._run, compute)
+
+        board_ids = sorted(set(board_ids)) if board_ids else None
+        key = self.make_key(endpoint, params, role)
+        versions = data_versions.snapshot(board_ids)
+
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry.versions == versions and entry.expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry.value
+            del self._entries[key]
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.coalesced += 1
+            return await asyncio.shield(inflight)
+
+        self.misses += 1
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._inflight[key] = future
+        # Отмена запроса, начавшего вычисление, не отменяет саму задачу
+        task = loop.create_task(self._compute(key, compute, future, versions, board_ids))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return await asyncio.shield(future)
+
+    def _run(self, compute: Callable[[Session], Any]) -> Any:
+        db = self.session_factory()
+        try:
+            return compute(db)
+        finally:
+            db.close()
+
+    async def _compute(
+        self,
+        key: Tuple,
+        compute: Callable[[Session], Any],
+        future: asyncio.Future,
+        versions: Tuple,
+        board_ids: Optional[Iterable[int]],
+    ) -> None:
+        try:
+            value = await run_in_threadpool(self._run, compute)
+        except BaseException as exc:
+            self._inflight.pop(key, None)
+            if isinstance(exc, asyncio.CancelledError):
+                future.cancel()
+                raise
+            future.set_exception(exc)
+            # Исключение получат ожидающие запросы; помечаем его как прочитанное
+            future.exception()
+            return
+
+        # Если данные изменились во время вычисления, результат не кэшируем
+        if data_versions.snapshot(board_ids) == versions:
+            self._entries[key] = _Entry(value, versions, time.monotonic() + self.ttl_seconds)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        self._inflight.pop(key, None)
+        future.set_result(value)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "hit_ratio": round((self.hits + self.coalesced) / lookups, 4) if lookups else 0.0,
+        }
+
+
+report_cache = ReportCache(
+    ttl_seconds=settings.REPORT_CACHE_TTL_SECONDS,
+    max_entries=settings.REPORT_CACHE_MAX_ENTRIES,
+    enabled=settings.REPORT_CACHE_ENABLED,
+)
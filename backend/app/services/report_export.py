@@ -0,0 +1,430 @@
+"""
+Streaming export of report datasets (CSV / XLSX / Parquet)
+
+Строки читаются серверным курсором порциями (yield_per) и сразу
+сериализуются, поэтому потребление памяти не зависит от объема выгрузки.
+"""
+import csv
+import io
+import re
+import zipfile
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Sequence, Tuple
+from xml.sax.saxutils import escape
+
+from sqlalchemy import func, literal_column, select
+from sqlalchemy.orm import Session
+
+from app.core.database import SessionLocal
+from app.models.user import User
+from app.models.board import Board, Card, Column, card_assignees
+from app.services.deadlines import is_overdue
+
+
+EXPORT_FORMATS = {
+    "csv": ("text/csv; charset=utf-8", "csv"),
+    "xlsx": ("application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", "xlsx"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+
+# Отчеты, доступные для выгрузки
+EXPORT_DATASETS = ("gantt-chart", "flexible-summary")
+
+# Количество строк, читаемых из курсора за один раз
+FETCH_SIZE = 2000
+
+
+def column_progress(column_title: Optional[str]) -> int:
+    """
+    Прогресс задачи по названию колонки (статуса):
+    Запланировано = 0%, В работе = 33%, На проверке = 66%, Готово = 100%
+    """
+    if not column_title:
+        return 0
+    status = column_title.lower()
+    if "готово" in status or "done" in status:
+        return 100
+    if "проверке" in status or "review" in status:
+        return 66
+    if "работе" in status or "progress" in status:
+        return 33
+    return 0
+
+
+@lru_cache(maxsize=1)
+def _pyarrow_available() -> bool:
+    # Установленный пакет может не импортироваться (например, сборка под
+    # другую версию numpy) - тогда выгрузка оборвалась бы после ответа 200
+    try:
+        import pyarrow  # noqa: F401
+        import pyarrow.parquet  # noqa: F401
+    except Exception:
+        return False
+    return True
+
+
+def format_available(export_format: str) -> bool:
+    """Parquet требует необязательную зависимость pyarrow"""
+    if export_format == "parquet":
+        return _pyarrow_available()
+    return export_format in EXPORT_FORMATS
+
+
+# Наборы данных
+
+class ExportDataset:
+    """Набор строк отчета: колонки (имя, тип) и запрос"""
+
+    def __init__(self, columns: Sequence[Tuple[str, str]], statement, row_mapper: Callable[[Any], tuple]):
+        self.columns = list(columns)
+        self.statement = statement
+        self.row_mapper = row_mapper
+
+    @property
+    def header(self) -> List[str]:
+        return [name for name, _ in self.columns]
+
+
+def _assignee_names(dialect_name: str):
+    """Имена исполнителей карточки одной строкой (коррелированный подзапрос)"""
+    if dialect_name == "postgresql":
+        names = func.string_agg(User.full_name, literal_column("', '"))
+    else:
+        names = func.group_concat(User.full_name, ", ")
+    return select(names).select_from(card_assignees).join(
+        User, User.id == card_assignees.c.user_id
+    ).where(card_assignees.c.card_id == Card.id).scalar_subquery()
+
+
+def _priority_value(priority) -> Optional[str]:
+    return priority.value if hasattr(priority, "value") else priority
+
+
+def gantt_dataset(dialect_name: str, board_id: Optional[int] = None) -> ExportDataset:
+    """Строки диаграммы Ганта"""
+    statement = select(
+        Card.id,
+        Card.title,
+        Board.id,
+        Board.title,
+        Column.title,
+        Card.created_at,
+        Card.due_date,
+        Card.priority,
+        _assignee_names(dialect_name),
+        Card.completed,
+    ).join(Column, Card.column_id == Column.id).join(Board, Column.board_id == Board.id)
+    if board_id:
+        statement = statement.where(Board.id == board_id)
+    statement = statement.order_by(Board.id, Card.id)
+
+    now = datetime.utcnow()
+
+    def row_mapper(row) -> tuple:
+        card_id, title, row_board_id, board_title, column_title, created_at, due_date, priority, assignees, completed = row
+        return (
+            card_id,
+            title,
+            row_board_id,
+            board_title,
+            column_title,
+            created_at,
+            due_date,
+            column_progress(column_title),
+            _priority_value(priority),
+            assignees or "",
+            bool(completed),
+            is_overdue(due_date, completed, now),
+        )
+
+    columns = [
+        ("task_id", "int"),
+        ("task_name", "str"),
+        ("board_id", "int"),
+        ("board_name", "str"),
+        ("status", "str"),
+        ("start_date", "datetime"),
+        ("end_date", "datetime"),
+        ("progress", "int"),
+        ("priority", "str"),
+        ("assignees", "str"),
+        ("completed", "bool"),
+        ("overdue", "bool"),
+    ]
+    return ExportDataset(columns, statement, row_mapper)
+
+
+def flexible_summary_dataset(
+    dialect_name: str,
+    board_id_list: List[int],
+    priority: Optional[str],
+    assignee_id: Optional[int],
+    days: int,
+) -> ExportDataset:
+    """Строки гибкой сводки с теми же фильтрами, что и /reports/flexible-summary"""
+    start_date = datetime.utcnow() - timedelta(days=days)
+    statement = select(
+        Card.id,
+        Card.title,
+        Board.title,
+        Column.title,
+        Card.priority,
+        _assignee_names(dialect_name),
+        Card.due_date,
+        Card.completed,
+    ).join(Column, Card.column_id == Column.id).join(Board, Column.board_id == Board.id).where(
+        Card.created_at >= start_date
+    )
+    if board_id_list:
+        statement = statement.where(Board.id.in_(board_id_list))
+    if priority:
+        statement = statement.where(Card.priority == priority)
+    if assignee_id:
+        statement = statement.where(Card.id.in_(
+            select(card_assignees.c.card_id).where(card_assignees.c.user_id == assignee_id)
+        ))
+    statement = statement.order_by(Card.id)
+
+    def row_mapper(row) -> tuple:
+        card_id, title, board_title, column_title, priority_value, assignees, due_date, completed = row
+        return (
+            card_id,
+            title,
+            board_title,
+            column_title,
+            _priority_value(priority_value),
+            assignees or "",
+            due_date,
+            bool(completed),
+        )
+
+    columns = [
+        ("id", "int"),
+        ("title", "str"),
+        ("board", "str"),
+        ("status", "str"),
+        ("priority", "str"),
+        ("assignees", "str"),
+        ("due_date", "datetime"),
+        ("completed", "bool"),
+    ]
+    return ExportDataset(columns, statement, row_mapper)
+
+
+def iter_dataset_rows(
+    dataset_factory: Callable[[str], ExportDataset],
+    session_factory: Callable[[], Session] = SessionLocal,
+) -> Tuple[ExportDataset, Iterator[tuple]]:
+    """
+    Открыть отдельную сессию и читать строки серверным курсором.
+    Сессия закрывается, когда поток строк исчерпан или закрыт.
+    """
+    db: Session = session_factory()
+    dataset = dataset_factory(db.get_bind().dialect.name)
+
+    def rows() -> Iterator[tuple]:
+        try:
+            result = db.execute(dataset.statement.execution_options(yield_per=FETCH_SIZE))
+            for partition in result.partitions():
+                for row in partition:
+                    yield dataset.row_mapper(row)
+        finally:
+            db.close()
+
+    return dataset, rows()
+
+
+# Сериализация
+
+class _ChunkSink:
+    """Несмещаемый (non-seekable) приемник байтов, из которого забираются готовые куски"""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def seek(self, *args):
+        raise io.UnsupportedOperation("seek")
+
+    def flush(self) -> None:
+        pass
+
+    @property
+    def closed(self) -> bool:
+        return False
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _text_value(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return str(value)
+
+
+def iter_csv(header: List[str], rows: Iterable[tuple], batch_rows: int = 500) -> Iterator[bytes]:
+    """CSV в UTF-8 с BOM (корректно открывается в Excel)"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+    yield ("\ufeff" + buffer.getvalue()).encode("utf-8")
+    buffer.seek(0)
+    buffer.truncate()
+
+    count = 0
+    for row in rows:
+        writer.writerow([_text_value(value) for value in row])
+        count += 1
+        if count % batch_rows == 0:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+_XML_ILLEGAL = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+_XLSX_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '</Types>'
+)
+_XLSX_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+_XLSX_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="Report" sheetId="1" r:id="rId1"/></sheets>'
+    '</workbook>'
+)
+_XLSX_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+    'Target="worksheets/sheet1.xml"/>'
+    '</Relationships>'
+)
+
+
+def _xlsx_cell(value) -> str:
+    if value is None:
+        return "<c/>"
+    if isinstance(value, bool):
+        return f'<c t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, (int, float)):
+        return f"<c><v>{value}</v></c>"
+    text = _XML_ILLEGAL.sub("", _text_value(value))
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{escape(text)}</t></is></c>'
+
+
+def iter_xlsx(header: List[str], rows: Iterable[tuple], batch_rows: int = 500) -> Iterator[bytes]:
+    """
+    Минимальная книга XLSX с одним листом и inline-строками.
+    Архив пишется в несмещаемый поток (zip data descriptors), поэтому
+    готовые куски можно отдавать клиенту сразу.
+    """
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("[Content_Types].xml", _XLSX_CONTENT_TYPES)
+        archive.writestr("_rels/.rels", _XLSX_RELS)
+        archive.writestr("xl/workbook.xml", _XLSX_WORKBOOK)
+        archive.writestr("xl/_rels/workbook.xml.rels", _XLSX_WORKBOOK_RELS)
+        yield sink.drain()
+
+        with archive.open("xl/worksheets/sheet1.xml", mode="w", force_zip64=True) as sheet:
+            sheet.write((
+                '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+                '<row>' + "".join(_xlsx_cell(name) for name in header) + '</row>'
+            ).encode("utf-8"))
+
+            count = 0
+            for row in rows:
+                sheet.write(("<row>" + "".join(_xlsx_cell(value) for value in row) + "</row>").encode("utf-8"))
+                count += 1
+                if count % batch_rows == 0:
+                    chunk = sink.drain()
+                    if chunk:
+                        yield chunk
+
+            sheet.write(b"</sheetData></worksheet>")
+    yield sink.drain()
+
+
+def iter_parquet(columns: List[Tuple[str, str]], rows: Iterable[tuple], batch_rows: int = FETCH_SIZE) -> Iterator[bytes]:
+    """Parquet: каждая порция строк записывается отдельной row group"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    arrow_types = {
+        "int": pa.int64(),
+        "float": pa.float64(),
+        "str": pa.string(),
+        "bool": pa.bool_(),
+        "datetime": pa.timestamp("us", tz="UTC"),
+    }
+    schema = pa.schema([(name, arrow_types[kind]) for name, kind in columns])
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema)
+
+    def write_batch(batch: List[tuple]) -> None:
+        arrays = [list(values) for values in zip(*batch)]
+        writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+
+    try:
+        batch: List[tuple] = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= batch_rows:
+                write_batch(batch)
+                batch = []
+                yield sink.drain()
+        if batch:
+            write_batch(batch)
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+def iter_export(export_format: str, dataset: ExportDataset, rows: Iterator[tuple]) -> Iterator[bytes]:
+    """Сериализовать строки в выбранный формат"""
+    if export_format == "csv":
+        return iter_csv(dataset.header, rows)
+    if export_format == "xlsx":
+        return iter_xlsx(dataset.header, rows)
+    if export_format == "parquet":
+        return iter_parquet(dataset.columns, rows)
+    raise ValueError(f"Unsupported export format: {export_format}")
+
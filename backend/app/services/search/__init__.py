@@ -0,0 +1 @@
+# Search package
@@ -0,0 +1,135 @@
+"""
+Search backends
+
+Эндпоинты поиска работают через интерфейс SearchBackend, реализация
+выбирается настройкой SEARCH_BACKEND:
+- postgres - полнотекстовый и триграммный поиск PostgreSQL (fts, trigram);
+- index - встроенный инвертированный индекс в памяти процесса
+  (SQLite, тестовые прогоны, небольшие установки), см. inverted_index;
+- like - поиск подстрокой ILIKE без индексов;
+- auto - postgres для PostgreSQL, иначе index.
+Все реализации возвращают строки одинаковой формы: id, rank, title,
+subtitle, ref_id, snippet.
+"""
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import Integer, Text, cast, null, or_, select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.board import Board, Card, CardComment
+from app.models.contact import Contact
+from app.models.chat import ChatMessage
+from app.models.file import File
+from app.services.search import fts
+from app.services.search.trigram import like_pattern, LIKE_ESCAPE
+from app.services.search.visibility import SearchVisibility
+
+
+Page = Tuple[List[Dict[str, Any]], Optional[int]]
+
+# Поля для поиска подстрокой
+LIKE_FIELDS = {
+    "boards": (Board.title, Board.description),
+    "cards": (Card.title, Card.description),
+    "contacts": (Contact.company_name, Contact.contact_person, Contact.email),
+    "comments": (CardComment.content,),
+    "messages": (ChatMessage.content,),
+    "files": (File.original_filename,),
+}
+
+
+def row_columns(category_name: str):
+    """Колонки строки результата без ранга и сниппета"""
+    category = fts.CATEGORIES[category_name]
+    return (
+        category.model.id.label("id"),
+        cast(category.title, Text).label("title"),
+        cast(category.subtitle if category.subtitle is not None else null(), Text).label("subtitle"),
+        cast(category.ref_id if category.ref_id is not None else null(), Integer).label("ref_id"),
+    )
+
+
+def paginate(rows: List[Dict[str, Any]], limit: int) -> Page:
+    """Страница из limit + 1 строк и курсор следующей страницы"""
+    next_cursor = rows[limit - 1]["id"] if len(rows) > limit else None
+    return rows[:limit], next_cursor
+
+
+class SearchBackend:
+    """Интерфейс поискового бэкенда"""
+
+    name = "base"
+
+    def search(self, db: Session, q: str, limit: int, visibility: SearchVisibility,
+               categories: Optional[Sequence[str]] = None) -> Dict[str, List[Dict[str, Any]]]:
+        """Top-N по категориям"""
+        raise NotImplementedError
+
+    def search_page(self, db: Session, category: str, q: str, cursor: Optional[int], limit: int,
+                    visibility: SearchVisibility) -> Page:
+        """Страница одной категории от новых к старым"""
+        raise NotImplementedError
+
+
+class PostgresSearchBackend(SearchBackend):
+    """Полнотекстовый и триграммный поиск PostgreSQL"""
+
+    name = "postgres"
+
+    def search(self, db, q, limit, visibility, categories=None):
+        return fts.search(db, q, limit, categories, filters=visibility.filters())
+
+    def search_page(self, db, category, q, cursor, limit, visibility):
+        return fts.search_page(db, category, q, cursor, limit, visibility.filters().get(category, ()))
+
+
+class LikeSearchBackend(SearchBackend):
+    """Поиск подстрокой ILIKE для баз без полнотекстового поиска"""
+
+    name = "like"
+
+    @staticmethod
+    def _statement(category_name: str, q: str, filters: Sequence):
+        pattern = like_pattern(q)
+        return select(*row_columns(category_name)).where(
+            or_(*[field.ilike(pattern, escape=LIKE_ESCAPE) for field in LIKE_FIELDS[category_name]]),
+            *filters
+        )
+
+    def search(self, db, q, limit, visibility, categories=None):
+        names = list(categories or fts.CATEGORIES)
+        filters = visibility.filters()
+        results = {name: [] for name in names}
+        for name in fts.available_categories(names, filters):
+            statement = self._statement(name, q, filters.get(name, ())).limit(limit)
+            results[name] = [dict(row) for row in db.execute(statement).mappings()]
+        return results
+
+    def search_page(self, db, category, q, cursor, limit, visibility):
+        filters = visibility.filters().get(category, ())
+        if fts.CATEGORIES[category].requires_filter and not filters:
+            return [], None
+        model = fts.CATEGORIES[category].model
+        statement = self._statement(category, q, filters)
+        if cursor is not None:
+            statement = statement.where(model.id < cursor)
+        statement = statement.order_by(model.id.desc()).limit(limit + 1)
+        return paginate([dict(row) for row in db.execute(statement).mappings()], limit)
+
+
+postgres_backend = PostgresSearchBackend()
+like_backend = LikeSearchBackend()
+
+
+def get_backend(db: Session) -> SearchBackend:
+    """Бэкенд по настройке SEARCH_BACKEND и диалекту базы"""
+    choice = settings.SEARCH_BACKEND
+    if choice == "auto":
+        choice = "postgres" if db.get_bind().dialect.name == "postgresql" else "index"
+    if choice == "postgres":
+        return postgres_backend
+    if choice == "index":
+        from app.services.search.inverted_index import index_backend
+        return index_backend
+    return like_backend
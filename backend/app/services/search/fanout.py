@@ -0,0 +1,69 @@
+"""
+Concurrent search fan-out
+
+Категории глобального поиска выполняются параллельно в пуле потоков,
+каждая в своей сессии (сессия SQLAlchemy не потокобезопасна) на том же
+движке, что и запрос. Время ответа определяется самой медленной
+категорией, а не суммой. Категория, не уложившаяся в
+SEARCH_CATEGORY_TIMEOUT_MS или завершившаяся ошибкой, возвращается
+пустой и попадает в список partial. В PostgreSQL запрос категории
+ограничен statement_timeout, поэтому опоздавший запрос прерывается
+сервером и не удерживает соединение.
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.services.search import fts
+from app.services.search.backend import SearchBackend
+from app.services.search.visibility import SearchVisibility
+
+
+Results = Dict[str, List[Dict[str, Any]]]
+
+_executor = ThreadPoolExecutor(max_workers=settings.SEARCH_FANOUT_WORKERS, thread_name_prefix="search")
+
+
+def _search_category(backend: SearchBackend, bind, name: str, q: str, limit: int,
+                     visibility: SearchVisibility) -> List[Dict[str, Any]]:
+    db = Session(bind=bind)
+    try:
+        if bind.dialect.name == "postgresql":
+            db.execute(text(f"SET LOCAL statement_timeout = {int(settings.SEARCH_CATEGORY_TIMEOUT_MS)}"))
+        return backend.search(db, q, limit, visibility, [name]).get(name, [])
+    finally:
+        db.close()
+
+
+async def search_concurrently(backend: SearchBackend, db: Session, q: str, limit: int, visibility: SearchVisibility,
+                              categories: Optional[Sequence[str]] = None) -> Tuple[Results, List[str]]:
+    """Результаты по категориям и список категорий с неполным результатом"""
+    names = list(categories or fts.CATEGORIES)
+    if len(names) < 2 or settings.SEARCH_FANOUT_WORKERS < 2:
+        return backend.search(db, q, limit, visibility, names), []
+
+    bind = db.get_bind()
+    tasks = {
+        asyncio.wrap_future(_executor.submit(_search_category, backend, bind, name, q, limit, visibility)): name
+        for name in names
+    }
+    done, pending = await asyncio.wait(tasks, timeout=settings.SEARCH_CATEGORY_TIMEOUT_MS / 1000)
+
+    results: Results = {name: [] for name in names}
+    partial = []
+    for task in pending:
+        # Еще не начатые категории отменяются, выполняемые завершатся по statement_timeout
+        task.cancel()
+        partial.append(tasks[task])
+    for task in done:
+        name = tasks[task]
+        try:
+            results[name] = task.result()
+        except Exception as e:
+            print(f"Ошибка поиска в категории {name}: {e}")
+            partial.append(name)
+    return results, sorted(partial)
@@ -0,0 +1,207 @@
+"""
+PostgreSQL full-text search
+
+Поиск по сгенерированным колонкам search_vector (tsvector с русской и
+английской конфигурациями, GIN-индексы, см. миграцию
+add_full_text_search_vectors). Колонки не описаны в моделях, чтобы модели
+оставались переносимыми на SQLite. Каждая категория отбирает top-N по
+ts_rank в подзапросе, сниппеты строятся только для отобранных строк,
+а все категории объединяются в один UNION ALL. Для коротких полей
+(контакты, заголовки карточек) совпадения дополняются триграммным
+поиском подстроки с опечатками (см. app.services.search.trigram), имена
+файлов ищутся только триграммами.
+
+Категории с обязательным условием видимости (сообщения чата) без этого
+условия не выполняются. Для длинных выдач есть постраничный поиск по
+курсору (id последнего элемента, от новых к старым).
+"""
+import re
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import Integer, Text, cast, func, literal, literal_column, null, or_, select, union_all
+from sqlalchemy.dialects.postgresql import REGCONFIG, TSVECTOR
+from sqlalchemy.orm import Session
+
+from app.models.board import Board, Card, CardComment
+from app.models.contact import Contact
+from app.models.chat import ChatMessage
+from app.models.file import File
+from app.services.search import trigram
+
+
+CATEGORY_LIMIT = 10
+MAX_QUERY_TOKENS = 8
+SEARCH_CONFIGS = ("russian", "english")
+HEADLINE_CONFIG = "russian"  # русская конфигурация обрабатывает и латиницу (english_stem)
+HEADLINE_OPTIONS = "StartSel=<mark>, StopSel=</mark>, MaxWords=25, MinWords=8, ShortWord=2, MaxFragments=2, FragmentDelimiter= … "
+
+_TOKEN_RE = re.compile(r"[^\W_]+", re.UNICODE)
+
+
+def tokenize_query(q: str) -> List[str]:
+    """Слова запроса без операторов tsquery и спецсимволов"""
+    return [token.lower() for token in _TOKEN_RE.findall(q)][:MAX_QUERY_TOKENS]
+
+
+def build_tsquery(tokens: Sequence[str]):
+    """
+    Префиксный tsquery: все слова запроса (последнее может быть недописано),
+    с русской или английской морфологией
+    """
+    text = " & ".join(f"{token}:*" for token in tokens)
+    queries = [func.to_tsquery(literal(config, REGCONFIG), text) for config in SEARCH_CONFIGS]
+    query = queries[0]
+    for other in queries[1:]:
+        query = query.op("||")(other)
+    return query
+
+
+class SearchCategory:
+    """Описание категории поиска: таблица, поля ответа и источник сниппета"""
+
+    def __init__(self, name: str, model, title, subtitle=None, ref_id=None, snippet_source=None, trigram_fields=(),
+                 full_text: bool = True, requires_filter: bool = False):
+        self.name = name
+        self.model = model
+        self.title = title
+        self.subtitle = subtitle
+        self.ref_id = ref_id
+        self.snippet_source = snippet_source if snippet_source is not None else title
+        self.trigram_fields = trigram_fields
+        self.full_text = full_text
+        self.requires_filter = requires_filter
+
+    @property
+    def vector(self):
+        return literal_column(f"{self.model.__tablename__}.search_vector", TSVECTOR)
+
+
+CATEGORIES: Dict[str, SearchCategory] = {
+    category.name: category
+    for category in (
+        SearchCategory("boards", Board, Board.title, Board.description,
+                       snippet_source=func.concat_ws(" ", Board.title, Board.description)),
+        SearchCategory("cards", Card, Card.title, Card.description,
+                       snippet_source=func.concat_ws(" ", Card.title, Card.description),
+                       trigram_fields=trigram.CARD_FIELDS),
+        SearchCategory("contacts", Contact, Contact.company_name, Contact.contact_person,
+                       snippet_source=func.concat_ws(" ", Contact.company_name, Contact.contact_person, Contact.email, Contact.notes),
+                       trigram_fields=trigram.CONTACT_FIELDS),
+        SearchCategory("comments", CardComment, CardComment.content, ref_id=CardComment.card_id),
+        SearchCategory("messages", ChatMessage, ChatMessage.content, ref_id=ChatMessage.conversation_id,
+                       requires_filter=True),
+        SearchCategory("files", File, File.original_filename, File.mime_type, ref_id=File.card_id,
+                       trigram_fields=trigram.FILE_FIELDS, full_text=False),
+    )
+}
+
+
+def category_match(category: SearchCategory, query, q: str) -> Tuple:
+    """Условие совпадения и ранг строки категории"""
+    if not category.full_text:
+        return (
+            trigram.match_condition(category.trigram_fields, q),
+            trigram.similarity(category.trigram_fields, q),
+        )
+    match = category.vector.op("@@")(query)
+    rank = func.ts_rank(category.vector, query)
+    if category.trigram_fields:
+        match = or_(match, trigram.match_condition(category.trigram_fields, q))
+        rank = func.greatest(rank, trigram.similarity(category.trigram_fields, q))
+    return match, rank
+
+
+def _snippet(category: SearchCategory, query):
+    if not category.full_text:
+        return cast(null(), Text)
+    return func.ts_headline(literal(HEADLINE_CONFIG, REGCONFIG), category.snippet_source, query, HEADLINE_OPTIONS)
+
+
+def _result_columns(category: SearchCategory, query, rank):
+    return (
+        literal(category.name).label("category"),
+        category.model.id.label("id"),
+        rank.label("rank"),
+        cast(category.title, Text).label("title"),
+        cast(category.subtitle if category.subtitle is not None else null(), Text).label("subtitle"),
+        cast(category.ref_id if category.ref_id is not None else null(), Integer).label("ref_id"),
+        _snippet(category, query).label("snippet"),
+    )
+
+
+def category_statement(category: SearchCategory, query, q: str, limit: int = CATEGORY_LIMIT, filters: Sequence = ()):
+    """Top-N категории по рангу со сниппетами"""
+    model = category.model
+    match, rank = category_match(category, query, q)
+    top = (
+        select(model.id.label("id"), rank.label("rank"))
+        .where(match, *filters)
+        .order_by(rank.desc(), model.id)
+        .limit(limit)
+        .subquery(f"top_{category.name}")
+    )
+    return (
+        select(*_result_columns(category, query, top.c.rank))
+        .select_from(model)
+        .join(top, top.c.id == model.id)
+    )
+
+
+def available_categories(categories: Optional[Sequence[str]], filters: Dict[str, Sequence]) -> List[str]:
+    """Категории, которые можно выполнить с переданными условиями видимости"""
+    return [
+        name for name in (categories or CATEGORIES)
+        if not CATEGORIES[name].requires_filter or filters.get(name)
+    ]
+
+
+def search_statement(q: str, tokens: Sequence[str], categories: Sequence[str],
+                     limit: int = CATEGORY_LIMIT, filters: Optional[Dict[str, Sequence]] = None):
+    """Все категории одним UNION ALL"""
+    query = build_tsquery(tokens)
+    filters = filters or {}
+    branches = [
+        category_statement(CATEGORIES[name], query, q, limit, filters.get(name, ()))
+        for name in categories
+    ]
+    union = union_all(*branches).subquery("results")
+    return select(union).order_by(union.c.category, union.c.rank.desc(), union.c.id)
+
+
+def search(db: Session, q: str, limit: int = CATEGORY_LIMIT, categories: Optional[Sequence[str]] = None,
+           filters: Optional[Dict[str, Sequence]] = None) -> Dict[str, List[dict]]:
+    """Результаты поиска по категориям, упорядоченные по рангу"""
+    filters = filters or {}
+    names = list(categories or CATEGORIES)
+    results: Dict[str, List[dict]] = {name: [] for name in names}
+    runnable = available_categories(names, filters)
+    tokens = tokenize_query(q)
+    if not tokens or not runnable:
+        return results
+
+    for row in db.execute(search_statement(q.strip(), tokens, runnable, limit, filters)).mappings():
+        results[row["category"]].append(dict(row))
+    return results
+
+
+def search_page(db: Session, category_name: str, q: str, cursor: Optional[int] = None, limit: int = 20,
+                filters: Sequence = ()) -> Tuple[List[dict], Optional[int]]:
+    """
+    Страница результатов одной категории от новых к старым.
+    cursor - id последнего элемента предыдущей страницы.
+    """
+    category = CATEGORIES[category_name]
+    tokens = tokenize_query(q)
+    if not tokens or (category.requires_filter and not filters):
+        return [], None
+
+    query = build_tsquery(tokens)
+    match, rank = category_match(category, query, q.strip())
+    statement = select(*_result_columns(category, query, rank)).where(match, *filters)
+    if cursor is not None:
+        statement = statement.where(category.model.id < cursor)
+    statement = statement.order_by(category.model.id.desc()).limit(limit + 1)
+
+    rows = [dict(row) for row in db.execute(statement).mappings()]
+    next_cursor = rows[limit - 1]["id"] if len(rows) > limit else None
+    return rows[:limit], next_cursor
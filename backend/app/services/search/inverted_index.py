@@ -0,0 +1,442 @@
+"""
+Embedded inverted-index search backend
+
+Поиск без PostgreSQL (SQLite в тестах, установки на одном компьютере):
+инвертированный индекс в памяти процесса по доскам, задачам, контактам
+и комментариям. Для каждой основы слова хранится отсортированный список
+id документов (array('I')) и параллельный список весов (array('H')):
+вес поля (заголовок важнее описания) умножается на число вхождений.
+Основы строятся стеммером app.services.search.stemmer, запрос ищется по
+префиксу основ (последнее слово может быть недописано), документ должен
+содержать все слова запроса, ранг - сумма весов с idf.
+
+Индекс обновляется после фиксации транзакций (хуки сессии, как у версий
+данных), периодически сверяется с базой (изменения мимо ORM, другие
+процессы) и сохраняется на диск, чтобы после перезапуска догружать
+только изменения с момента снимка. При сверке изменения ищутся по
+updated_at/created_at с запасом SEARCH_INDEX_WATERMARK_OVERLAP_SECONDS
+(now() - время начала транзакции, более ранние незафиксированные
+изменения иначе потерялись бы); чтение из базы идет без блокировки
+индекса, под ней только применение прочитанного. Сообщения чата и файлы в индекс не
+входят и ищутся подстрокой (LikeSearchBackend).
+"""
+import heapq
+import math
+import os
+import pickle
+import threading
+from array import array
+from bisect import bisect_left
+from datetime import timedelta
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from sqlalchemy import event, func, or_, select, union
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.board import Board, Card, CardComment
+from app.models.contact import Contact, contact_shared_users
+from app.services.search import fts
+from app.services.search.backend import SearchBackend, like_backend, paginate, row_columns
+from app.services.search.stemmer import stem, terms, tokenize
+
+
+SNAPSHOT_VERSION = 1
+MAX_WEIGHT = 0xFFFF
+SNIPPET_WORDS = 25
+_PENDING_KEY = "search_index_pending"
+
+# Индексируемые поля категорий и их веса
+INDEX_FIELDS = {
+    "boards": (Board, ((Board.title, 3), (Board.description, 1))),
+    "cards": (Card, ((Card.title, 3), (Card.description, 1))),
+    "contacts": (Contact, ((Contact.company_name, 3), (Contact.contact_person, 3), (Contact.email, 2),
+                           (Contact.notes, 1))),
+    "comments": (CardComment, ((CardComment.content, 1),)),
+}
+_CATEGORY_BY_MODEL = {model: name for name, (model, _) in INDEX_FIELDS.items()}
+
+
+def document_terms(values: Sequence[Optional[str]], weights: Sequence[int]) -> Dict[str, int]:
+    """Веса основ документа по значениям полей"""
+    result: Dict[str, int] = {}
+    for value, weight in zip(values, weights):
+        for term in terms(value):
+            result[term] = min(result.get(term, 0) + weight, MAX_WEIGHT)
+    return result
+
+
+class CategoryIndex:
+    """Инвертированный индекс одной категории"""
+
+    def __init__(self):
+        self.postings: Dict[str, array] = {}
+        self.weights: Dict[str, array] = {}
+        self.doc_terms: Dict[int, Tuple[str, ...]] = {}
+        self._vocabulary: Optional[List[str]] = None
+
+    def __len__(self) -> int:
+        return len(self.doc_terms)
+
+    def __getstate__(self):
+        return {"postings": self.postings, "weights": self.weights, "doc_terms": self.doc_terms}
+
+    def __setstate__(self, state):
+        self.__init__()
+        self.__dict__.update(state)
+
+    def remove(self, doc_id: int) -> None:
+        for term in self.doc_terms.pop(doc_id, ()):
+            ids, weights = self.postings[term], self.weights[term]
+            position = bisect_left(ids, doc_id)
+            if position < len(ids) and ids[position] == doc_id:
+                del ids[position]
+                del weights[position]
+            if not ids:
+                del self.postings[term], self.weights[term]
+                self._vocabulary = None
+
+    def add(self, doc_id: int, doc_terms: Dict[str, int]) -> None:
+        self.remove(doc_id)
+        if not doc_terms:
+            return
+        for term, weight in doc_terms.items():
+            ids = self.postings.get(term)
+            if ids is None:
+                self.postings[term] = array("I", (doc_id,))
+                self.weights[term] = array("H", (weight,))
+                self._vocabulary = None
+                continue
+            position = bisect_left(ids, doc_id)
+            ids.insert(position, doc_id)
+            self.weights[term].insert(position, weight)
+        self.doc_terms[doc_id] = tuple(doc_terms)
+
+    def expand(self, prefix: str) -> List[str]:
+        """Основы словаря, начинающиеся с prefix"""
+        if self._vocabulary is None:
+            self._vocabulary = sorted(self.postings)
+        vocabulary = self._vocabulary
+        start = bisect_left(vocabulary, prefix)
+        end = start
+        while end < len(vocabulary) and vocabulary[end].startswith(prefix):
+            end += 1
+        return vocabulary[start:end]
+
+    def scores(self, stems: Sequence[str], allowed: Optional[Set[int]] = None) -> Dict[int, float]:
+        """Ранги документов, содержащих все слова запроса"""
+        total = max(len(self.doc_terms), 1)
+        result: Optional[Dict[int, float]] = None
+        for prefix in stems:
+            token_scores: Dict[int, float] = {}
+            for term in self.expand(prefix):
+                ids, weights = self.postings[term], self.weights[term]
+                idf = math.log(1 + total / len(ids))
+                for doc_id, weight in zip(ids, weights):
+                    if result is not None and doc_id not in result:
+                        continue
+                    if allowed is not None and doc_id not in allowed:
+                        continue
+                    token_scores[doc_id] = token_scores.get(doc_id, 0.0) + weight * idf
+            if result is None:
+                result = token_scores
+            else:
+                result = {doc_id: result[doc_id] + score for doc_id, score in token_scores.items()}
+            if not result:
+                break
+        return result or {}
+
+
+class InvertedIndex:
+    """Индексы всех категорий, водяной знак и сохранение снимков"""
+
+    def __init__(self):
+        self.categories: Dict[str, CategoryIndex] = {name: CategoryIndex() for name in INDEX_FIELDS}
+        self.watermark = None
+        self.ready = False
+        self._lock = threading.RLock()
+        # Сверки с базой идут по одной, поиск при этом не блокируется
+        self._refresh_lock = threading.Lock()
+
+    # Загрузка и сверка с базой
+
+    @staticmethod
+    def _rows(db: Session, name: str, condition=None):
+        model, fields = INDEX_FIELDS[name]
+        statement = select(model.id, *[field for field, _ in fields])
+        if condition is not None:
+            statement = statement.where(condition)
+        return db.execute(statement.execution_options(yield_per=1000))
+
+    @staticmethod
+    def _documents(name: str, rows: Iterable) -> List[Tuple[int, Dict[str, int]]]:
+        weights = [weight for _, weight in INDEX_FIELDS[name][1]]
+        return [(row[0], document_terms(row[1:], weights)) for row in rows]
+
+    def build(self, db: Session) -> None:
+        """Полное построение индекса"""
+        with self._refresh_lock:
+            self._build(db)
+
+    def _build(self, db: Session) -> None:
+        watermark = db.query(func.now()).scalar()
+        categories = {name: CategoryIndex() for name in INDEX_FIELDS}
+        for name, (_, fields) in INDEX_FIELDS.items():
+            weights = [weight for _, weight in fields]
+            index = categories[name]
+            for row in self._rows(db, name):
+                index.add(row[0], document_terms(row[1:], weights))
+        with self._lock:
+            self.categories = categories
+            self.watermark = watermark
+            self.ready = True
+
+    def catch_up(self, db: Session) -> int:
+        """
+        Догрузить изменения с момента водяного знака и удалить документы,
+        которых больше нет в базе
+        """
+        with self._refresh_lock:
+            return self._refresh(db)
+
+    def _refresh(self, db: Session) -> int:
+        if self.watermark is None:
+            self._build(db)
+            return sum(len(index) for index in self.categories.values())
+        return self._catch_up(db)
+
+    def _catch_up(self, db: Session) -> int:
+        watermark = db.query(func.now()).scalar()
+        since = self.watermark - timedelta(seconds=max(settings.SEARCH_INDEX_WATERMARK_OVERLAP_SECONDS, 0))
+        # Документы, известные до чтения: добавленные хуками во время
+        # чтения могут отсутствовать в прочитанном списке id
+        with self._lock:
+            known = {name: list(index.doc_terms) for name, index in self.categories.items()}
+        updates = {}
+        missing = {}
+        for name, (model, _) in INDEX_FIELDS.items():
+            updates[name] = self._documents(name, self._rows(db, name, or_(
+                model.updated_at >= since,
+                model.created_at >= since,
+            )))
+            existing = set(db.execute(select(model.id).execution_options(yield_per=10000)).scalars())
+            missing[name] = [doc_id for doc_id in known[name] if doc_id not in existing]
+        changed = 0
+        with self._lock:
+            for name, index in self.categories.items():
+                for doc_id, doc_terms in updates[name]:
+                    index.add(doc_id, doc_terms)
+                for doc_id in missing[name]:
+                    index.remove(doc_id)
+                changed += len(updates[name]) + len(missing[name])
+            self.watermark = watermark
+            self.ready = True
+        return changed
+
+    def ensure_ready(self, db: Session) -> None:
+        """Построить индекс при первом обращении, если он еще не загружен"""
+        if self.ready:
+            return
+        with self._refresh_lock:
+            if not self.ready:
+                self._refresh(db)
+
+    def save(self, path: str) -> None:
+        """Атомарно сохранить снимок индекса"""
+        with self._lock:
+            data = pickle.dumps(
+                {"version": SNAPSHOT_VERSION, "watermark": self.watermark, "categories": self.categories},
+                protocol=pickle.HIGHEST_PROTOCOL,
+            )
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temporary = f"{path}.tmp"
+        with open(temporary, "wb") as f:
+            f.write(data)
+        os.replace(temporary, path)
+
+    def load(self, path: str) -> bool:
+        """Загрузить снимок; False, если снимка нет или он несовместим"""
+        try:
+            with open(path, "rb") as f:
+                data = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+            return False
+        if not isinstance(data, dict) or data.get("version") != SNAPSHOT_VERSION \
+                or set(data.get("categories", {})) != set(INDEX_FIELDS):
+            return False
+        with self._lock:
+            self.categories = data["categories"]
+            self.watermark = data["watermark"]
+        return True
+
+    # Инкрементальные изменения
+
+    def apply(self, changes: Dict[Tuple[str, int], Optional[Tuple]]) -> None:
+        """Применить зафиксированные изменения: None - удаление, иначе значения полей"""
+        with self._lock:
+            for (name, doc_id), values in changes.items():
+                if values is None:
+                    self.categories[name].remove(doc_id)
+                else:
+                    weights = [weight for _, weight in INDEX_FIELDS[name][1]]
+                    self.categories[name].add(doc_id, document_terms(values, weights))
+
+    # Поиск
+
+    def scores(self, name: str, q: str, allowed: Optional[Set[int]] = None) -> Dict[int, float]:
+        stems = [stem(token) for token in tokenize(q)[:fts.MAX_QUERY_TOKENS]]
+        if not stems:
+            return {}
+        with self._lock:
+            return self.categories[name].scores(stems, allowed)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "ready": self.ready,
+                "documents": {name: len(index) for name, index in self.categories.items()},
+                "terms": {name: len(index.postings) for name, index in self.categories.items()},
+            }
+
+
+search_index = InvertedIndex()
+
+
+def snippet(texts: Sequence[Optional[str]], stems: Sequence[str]) -> Optional[str]:
+    """Фрагмент текста вокруг первого совпадения с подсветкой <mark>"""
+    words = " ".join(text for text in texts if text).split()
+    if not words:
+        return None
+
+    def matched(word: str) -> bool:
+        return any(stem(token).startswith(prefix) for token in tokenize(word) for prefix in stems)
+
+    flags = [matched(word) for word in words]
+    first = flags.index(True) if any(flags) else 0
+    start = max(0, first - SNIPPET_WORDS // 3)
+    fragment = [
+        f"<mark>{word}</mark>" if flag else word
+        for word, flag in zip(words[start:start + SNIPPET_WORDS], flags[start:start + SNIPPET_WORDS])
+    ]
+    prefix = "… " if start > 0 else ""
+    suffix = " …" if start + SNIPPET_WORDS < len(words) else ""
+    return prefix + " ".join(fragment) + suffix
+
+
+class IndexSearchBackend(SearchBackend):
+    """Поиск по встроенному индексу; сообщения и файлы - подстрокой"""
+
+    name = "index"
+
+    def __init__(self, index: InvertedIndex):
+        self.index = index
+
+    @staticmethod
+    def _visible_contacts(db: Session, visibility) -> Set[int]:
+        if not visibility.truncated:
+            return set(visibility.contact_ids)
+        return set(db.execute(union(
+            select(Contact.id).where(Contact.created_by_id == visibility.user_id),
+            select(contact_shared_users.c.contact_id).where(contact_shared_users.c.user_id == visibility.user_id),
+        )).scalars())
+
+    def _fetch(self, db: Session, name: str, ranked: List[Tuple[int, float]], q: str) -> List[Dict]:
+        """Строки результата в порядке ranked; удаленные из базы пропускаются"""
+        if not ranked:
+            return []
+        model, fields = INDEX_FIELDS[name]
+        statement = select(*row_columns(name), *[field for field, _ in fields]).where(
+            model.id.in_([doc_id for doc_id, _ in ranked])
+        )
+        rows = {row[0]: row for row in db.execute(statement)}
+        stems = [stem(token) for token in tokenize(q)[:fts.MAX_QUERY_TOKENS]]
+        results = []
+        for doc_id, rank in ranked:
+            row = rows.get(doc_id)
+            if row is None:
+                continue
+            results.append({
+                "id": row.id,
+                "rank": rank,
+                "title": row.title,
+                "subtitle": row.subtitle,
+                "ref_id": row.ref_id,
+                "snippet": snippet(row[4:], stems),
+            })
+        return results
+
+    def _scores(self, db: Session, name: str, q: str, visibility) -> Dict[int, float]:
+        allowed = self._visible_contacts(db, visibility) if name == "contacts" else None
+        return self.index.scores(name, q, allowed)
+
+    def search(self, db, q, limit, visibility, categories=None):
+        names = list(categories or fts.CATEGORIES)
+        results = {name: [] for name in names}
+        delegated = [name for name in names if name not in INDEX_FIELDS]
+        if delegated:
+            results.update(like_backend.search(db, q, limit, visibility, delegated))
+        self.index.ensure_ready(db)
+        for name in names:
+            if name not in INDEX_FIELDS:
+                continue
+            scores = self._scores(db, name, q, visibility)
+            ranked = heapq.nsmallest(limit, scores.items(), key=lambda item: (-item[1], item[0]))
+            results[name] = self._fetch(db, name, ranked, q)
+        return results
+
+    def search_page(self, db, category, q, cursor, limit, visibility):
+        if category not in INDEX_FIELDS:
+            return like_backend.search_page(db, category, q, cursor, limit, visibility)
+        self.index.ensure_ready(db)
+        scores = self._scores(db, category, q, visibility)
+        ids = sorted((doc_id for doc_id in scores if cursor is None or doc_id < cursor), reverse=True)
+        rows = self._fetch(db, category, [(doc_id, scores[doc_id]) for doc_id in ids[:limit + 1]], q)
+        return paginate(rows, limit)
+
+
+index_backend = IndexSearchBackend(search_index)
+
+
+def _pending(session: Session) -> dict:
+    return session.info.setdefault(_PENDING_KEY, {})
+
+
+def _after_flush(session: Session, flush_context) -> None:
+    changed = list(session.new) + [obj for obj in session.dirty if session.is_modified(obj)]
+    for obj in changed:
+        name = _CATEGORY_BY_MODEL.get(type(obj))
+        if name is not None:
+            _pending(session)[(name, obj.id)] = tuple(getattr(obj, field.key) for field, _ in INDEX_FIELDS[name][1])
+    for obj in session.deleted:
+        name = _CATEGORY_BY_MODEL.get(type(obj))
+        if name is not None:
+            _pending(session)[(name, obj.id)] = None
+
+
+def _after_commit(session: Session) -> None:
+    pending = session.info.pop(_PENDING_KEY, None)
+    if pending and search_index.ready:
+        search_index.apply(pending)
+
+
+def _after_rollback(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
+
+
+def install_index_hooks(session_factory) -> None:
+    """Подключить обновление индекса к фабрике сессий"""
+    event.listen(session_factory, "after_flush", _after_flush)
+    event.listen(session_factory, "after_commit", _after_commit)
+    event.listen(session_factory, "after_rollback", _after_rollback)
+
+
+def load_search_index(db: Session) -> int:
+    """Загрузить снимок (если есть) и догрузить изменения из базы"""
+    if settings.SEARCH_INDEX_SNAPSHOT_PATH:
+        search_index.load(settings.SEARCH_INDEX_SNAPSHOT_PATH)
+    changed = search_index.catch_up(db)
+    if settings.SEARCH_INDEX_SNAPSHOT_PATH:
+        search_index.save(settings.SEARCH_INDEX_SNAPSHOT_PATH)
+    return changed
@@ -0,0 +1,136 @@
+"""
+Tokenization and stemming for the embedded search index
+
+Токены - последовательности букв и цифр в нижнем регистре, "ё" заменяется
+на "е". Кириллические слова обрабатываются русским стеммером Snowball,
+латинские - упрощенным английским (отбрасывание окончаний). Один и тот же
+стеммер применяется к документам и запросам, поэтому важна
+согласованность, а не лингвистическая полнота.
+"""
+import re
+from functools import lru_cache
+from typing import List, Tuple
+
+_TOKEN_RE = re.compile(r"[^\W_]+", re.UNICODE)
+_CYRILLIC_RE = re.compile(r"[а-я]")
+
+_VOWELS = "аеиоуыэюя"
+
+_PERFECTIVE_GERUND = re.compile(r"((?<=[ая])(в|вши|вшись)|(ив|ивши|ившись|ыв|ывши|ывшись))$")
+_REFLEXIVE = re.compile(r"(ся|сь)$")
+_ADJECTIVE = re.compile(r"(ее|ие|ые|ое|ими|ыми|ей|ий|ый|ой|ем|им|ым|ом|его|ого|ему|ому|их|ых|ую|юю|ая|яя|ою|ею)$")
+_PARTICIPLE = re.compile(r"((?<=[ая])(ем|нн|вш|ющ|щ)|(ивш|ывш|ующ))$")
+_VERB = re.compile(
+    r"((?<=[ая])(ла|на|ете|йте|ли|й|л|ем|н|ло|но|ет|ют|ны|ть|ешь|нно)"
+    r"|(ила|ыла|ена|ейте|уйте|ите|или|ыли|ей|уй|ил|ыл|им|ым|ен|ило|ыло|ено|ят|ует|уют|ит|ыт|ены|ить|ыть|ишь|ую|ю))$"
+)
+_NOUN = re.compile(
+    r"(а|ев|ов|ие|ье|е|иями|ями|ами|еи|ии|и|ией|ей|ой|ий|й|иям|ям|ием|ем|ам|ом|о|у|ах|иях|ях|ы|ь|ию|ью|ю|ия|ья|я)$"
+)
+_DERIVATIONAL = re.compile(r"(ост|ость)$")
+_SUPERLATIVE = re.compile(r"(ейше|ейш)$")
+
+_ENGLISH_SUFFIXES = ("ational", "ization", "fulness", "ousness", "iveness", "ments", "ment", "ness",
+                     "ings", "ing", "edly", "ied", "ies", "ed", "ly", "es", "s")
+
+
+def _regions(word: str):
+    """RV и R2 алгоритма Snowball (индексы начала областей)"""
+    rv = len(word)
+    for i, char in enumerate(word):
+        if char in _VOWELS:
+            rv = i + 1
+            break
+    r1 = len(word)
+    for i in range(1, len(word)):
+        if word[i] not in _VOWELS and word[i - 1] in _VOWELS:
+            r1 = i + 1
+            break
+    r2 = len(word)
+    for i in range(r1 + 1, len(word)):
+        if word[i] not in _VOWELS and word[i - 1] in _VOWELS:
+            r2 = i + 1
+            break
+    return rv, r2
+
+
+def _strip(pattern, word: str) -> Tuple[str, bool]:
+    stripped = pattern.sub("", word, count=1)
+    return stripped, stripped != word
+
+
+def stem_russian(word: str) -> str:
+    rv_start, r2_start = _regions(word)
+    prefix, rv = word[:rv_start], word[rv_start:]
+
+    # Шаг 1
+    rv, removed = _strip(_PERFECTIVE_GERUND, rv)
+    if not removed:
+        rv, _ = _strip(_REFLEXIVE, rv)
+        rv, removed = _strip(_ADJECTIVE, rv)
+        if removed:
+            rv, _ = _strip(_PARTICIPLE, rv)
+        else:
+            rv, removed = _strip(_VERB, rv)
+            if not removed:
+                rv, _ = _strip(_NOUN, rv)
+
+    # Шаг 2
+    if rv.endswith("и"):
+        rv = rv[:-1]
+
+    # Шаг 3: словообразовательные окончания только в R2
+    r2 = (prefix + rv)[r2_start:] if r2_start < len(prefix + rv) else ""
+    if _DERIVATIONAL.search(r2):
+        rv, _ = _strip(_DERIVATIONAL, rv)
+
+    # Шаг 4
+    if rv.endswith("нн"):
+        rv = rv[:-1]
+    else:
+        rv, removed = _strip(_SUPERLATIVE, rv)
+        if removed and rv.endswith("нн"):
+            rv = rv[:-1]
+        elif rv.endswith("ь"):
+            rv = rv[:-1]
+
+    return prefix + rv
+
+
+def stem_english(word: str) -> str:
+    if len(word) <= 3:
+        return word
+    for suffix in _ENGLISH_SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            if suffix in ("ied", "ies"):
+                return word[:-len(suffix)] + "y"
+            if suffix == "s" and word.endswith("ss"):
+                return word
+            word = word[:-len(suffix)]
+            # running -> run, planned -> plan
+            if suffix in ("ing", "ings", "ed", "edly") and word[-1] == word[-2] and word[-1] not in "lsz":
+                word = word[:-1]
+            break
+    if word.endswith("e") and len(word) > 4:
+        word = word[:-1]
+    return word
+
+
+@lru_cache(maxsize=65536)
+def stem(token: str) -> str:
+    """Основа токена (токен уже в нижнем регистре)"""
+    if token.isdigit():
+        return token
+    if _CYRILLIC_RE.search(token):
+        return stem_russian(token)
+    return stem_english(token)
+
+
+def tokenize(text: str) -> List[str]:
+    """Токены текста без стемминга"""
+    return _TOKEN_RE.findall((text or "").lower().replace("ё", "е"))
+
+
+def terms(text: str) -> List[str]:
+    """Основы слов текста"""
+    return [stem(token) for token in tokenize(text)]
@@ -0,0 +1,230 @@
+"""
+Typeahead suggestions
+
+Подсказки ищут заголовки, у которых каждое слово запроса является
+началом какого-либо слова заголовка. В PostgreSQL условие проверяется
+по GIN-индексам to_tsvector('simple', ...) (префиксный tsquery без
+морфологии). На других СУБД (SQLite при разработке и в тестах) lower()
+и ILIKE не учитывают регистр кириллицы, поэтому строки читаются в
+порядке выдачи и отбираются в Python функцией matches() до FETCH_LIMIT
+совпадений на источник.
+
+Недавние префиксы хранятся в LRU-кэше процесса вместе со снимком версий
+данных. Если для более короткого префикса ("ab") в кэше есть полный
+список кандидатов, ответ для "abc" получается фильтрацией этого списка
+без обращения к базе.
+"""
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import func, literal, select, union_all
+from sqlalchemy.dialects.postgresql import REGCONFIG
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.board import Board, Card
+from app.models.contact import Contact
+from app.services.data_version import data_versions
+from app.services.search.fts import tokenize_query
+from app.services.search.visibility import SearchVisibility
+
+
+MIN_PREFIX_LENGTH = 2
+FETCH_LIMIT = 50  # кандидатов на источник; меньше - список полный и пригоден для уточнения
+SCAN_BATCH_SIZE = 500  # строк за раз при отборе в Python
+
+# Источники подсказок: тип, модель, поле
+SUGGEST_SOURCES = (
+    ("board", Board, Board.title),
+    ("card", Card, Card.title),
+    ("contact", Contact, Contact.company_name),
+    ("contact", Contact, Contact.contact_person),
+)
+
+_WORD_RE = re.compile(r"[^\W_]+", re.UNICODE)
+
+
+def normalize_query(q: str) -> str:
+    return " ".join(tokenize_query(q))
+
+
+def matches(tokens: Sequence[str], text: Optional[str]) -> bool:
+    """Каждое слово запроса - начало какого-либо слова текста"""
+    words = _WORD_RE.findall((text or "").lower())
+    return all(any(word.startswith(token) for word in words) for token in tokens)
+
+
+def refines(tokens: Sequence[str], cached_tokens: Sequence[str]) -> bool:
+    """Совпадения tokens заведомо входят в совпадения cached_tokens"""
+    return all(any(token.startswith(cached) for token in tokens) for cached in cached_tokens)
+
+
+def _source_statement(source: int, tokens: Optional[Sequence[str]], visibility: Optional[SearchVisibility]):
+    """Запрос кандидатов источника; tokens=None - без условия по тексту и без лимита"""
+    suggestion_type, model, field = SUGGEST_SOURCES[source]
+    filters = visibility.filters().get(f"{suggestion_type}s", []) if visibility is not None else []
+    statement = (
+        select(
+            literal(source).label("source"),
+            literal(suggestion_type).label("type"),
+            model.id.label("id"),
+            field.label("text"),
+        )
+        .where(field.isnot(None), *filters)
+        .order_by(func.length(field), field, model.id)
+    )
+    if tokens is None:
+        return statement
+    simple = literal("simple", REGCONFIG)
+    condition = func.to_tsvector(simple, func.coalesce(field, "")).op("@@")(
+        func.to_tsquery(simple, " & ".join(f"{token}:*" for token in tokens))
+    )
+    return statement.where(condition).limit(FETCH_LIMIT)
+
+
+def _scan_source(db: Session, source: int, tokens: Sequence[str],
+                 visibility: Optional[SearchVisibility]) -> List[Dict]:
+    """Первые FETCH_LIMIT совпадений источника, отобранных в Python"""
+    result = db.execute(
+        _source_statement(source, None, visibility).execution_options(yield_per=SCAN_BATCH_SIZE)
+    ).mappings()
+    rows = []
+    try:
+        for row in result:
+            if matches(tokens, row["text"]):
+                rows.append(row)
+                if len(rows) >= FETCH_LIMIT:
+                    break
+    finally:
+        result.close()
+    return rows
+
+
+def fetch_suggestions(db: Session, tokens: Sequence[str],
+                      visibility: Optional[SearchVisibility] = None) -> Tuple[List[Dict], bool]:
+    """Кандидаты из базы и признак полноты списка"""
+    if db.get_bind().dialect.name == "postgresql":
+        statement = union_all(*[
+            select(_source_statement(source, tokens, visibility).subquery())
+            for source in range(len(SUGGEST_SOURCES))
+        ])
+        rows = db.execute(statement).mappings().all()
+    else:
+        rows = [
+            row
+            for source in range(len(SUGGEST_SOURCES))
+            for row in _scan_source(db, source, tokens, visibility)
+        ]
+
+    per_source = [0] * len(SUGGEST_SOURCES)
+    candidates = []
+    for row in rows:
+        per_source[row["source"]] += 1
+        if matches(tokens, row["text"]):
+            candidates.append({"type": row["type"], "id": row["id"], "text": row["text"]})
+
+    complete = all(count < FETCH_LIMIT for count in per_source)
+    candidates.sort(key=lambda item: (len(item["text"]), item["text"], item["id"]))
+    return candidates, complete
+
+
+class _Entry:
+    __slots__ = ("tokens", "candidates", "complete", "versions")
+
+    def __init__(self, tokens: Tuple[str, ...], candidates: List[Dict], complete: bool, versions: Tuple):
+        self.tokens = tokens
+        self.candidates = candidates
+        self.complete = complete
+        self.versions = versions
+
+
+class PrefixCache:
+    """
+    LRU-кэш кандидатов по нормализованным префиксам. Записи разделены
+    по области видимости (scope): у пользователей разные видимые контакты.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.refined = 0
+        self.misses = 0
+
+    def _get(self, key: Tuple, versions: Tuple) -> Optional[_Entry]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.versions != versions:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def lookup(self, scope, key: str, tokens: Tuple[str, ...], versions: Tuple) -> Optional[List[Dict]]:
+        """Кандидаты из кэша: точное совпадение или уточнение более короткого префикса"""
+        with self._lock:
+            entry = self._get((scope, key), versions)
+            if entry is not None:
+                self.hits += 1
+                return entry.candidates
+
+            for cut in range(len(key) - 1, MIN_PREFIX_LENGTH - 1, -1):
+                shorter = self._get((scope, key[:cut].rstrip()), versions)
+                if shorter is None or not shorter.complete or not refines(tokens, shorter.tokens):
+                    continue
+                candidates = [item for item in shorter.candidates if matches(tokens, item["text"])]
+                self._store((scope, key), _Entry(tokens, candidates, True, versions))
+                self.refined += 1
+                return candidates
+
+            self.misses += 1
+            return None
+
+    def store(self, scope, key: str, tokens: Tuple[str, ...], candidates: List[Dict], complete: bool,
+              versions: Tuple) -> None:
+        with self._lock:
+            self._store((scope, key), _Entry(tokens, candidates, complete, versions))
+
+    def _store(self, key: Tuple, entry: _Entry) -> None:
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "refined": self.refined,
+            "misses": self.misses,
+        }
+
+
+prefix_cache = PrefixCache(settings.SEARCH_SUGGEST_CACHE_SIZE)
+
+
+def suggest(db: Session, q: str, limit: int = 10, visibility: Optional[SearchVisibility] = None) -> List[Dict]:
+    """Подсказки для набираемого запроса"""
+    key = normalize_query(q)
+    if len(key) < MIN_PREFIX_LENGTH:
+        return []
+    tokens = tuple(key.split(" "))
+    scope = visibility.cache_scope if visibility is not None else None
+    versions = data_versions.snapshot()
+
+    candidates = prefix_cache.lookup(scope, key, tokens, versions)
+    if candidates is None:
+        candidates, complete = fetch_suggestions(db, tokens, visibility)
+        # Если данные изменились во время запроса, не кэшируем
+        if data_versions.snapshot() == versions:
+            prefix_cache.store(scope, key, tokens, candidates, complete, versions)
+    return candidates[:limit]
@@ -0,0 +1,62 @@
+"""
+Trigram substring search (pg_trgm)
+
+Подстрочный поиск по коротким полям (название компании, контактное лицо,
+email, заголовок карточки, имя файла) через GIN-индексы gin_trgm_ops. Индексы
+ускоряют ILIKE '%q%', а оператор word_similarity (<%) находит значения
+с опечатками. Результаты упорядочиваются по близости к запросу.
+На других СУБД остается обычный ILIKE.
+"""
+from typing import Sequence
+
+from sqlalchemy import func, or_
+from sqlalchemy.orm import Query, Session
+
+from app.models.board import Card
+from app.models.contact import Contact
+from app.models.file import File
+
+
+CONTACT_FIELDS = (Contact.company_name, Contact.contact_person, Contact.email)
+CARD_FIELDS = (Card.title,)
+FILE_FIELDS = (File.original_filename,)
+LIKE_ESCAPE = "/"
+
+
+def like_pattern(q: str) -> str:
+    """Шаблон ILIKE с экранированными спецсимволами"""
+    escaped = q.replace(LIKE_ESCAPE, LIKE_ESCAPE * 2).replace("%", LIKE_ESCAPE + "%").replace("_", LIKE_ESCAPE + "_")
+    return f"%{escaped}%"
+
+
+def is_supported(db: Session) -> bool:
+    return db.get_bind().dialect.name == "postgresql"
+
+
+def match_condition(fields: Sequence, q: str, fuzzy: bool = True):
+    """Подстрока в любом из полей или (для PostgreSQL) похожее слово"""
+    pattern = like_pattern(q)
+    conditions = [field.ilike(pattern, escape=LIKE_ESCAPE) for field in fields]
+    if fuzzy:
+        conditions += [field.op("%>")(q) for field in fields]
+    return or_(*conditions)
+
+
+def similarity(fields: Sequence, q: str):
+    """Наибольшая word_similarity запроса к полям"""
+    scores = [func.coalesce(func.word_similarity(q, field), 0) for field in fields]
+    return func.greatest(*scores) if len(scores) > 1 else scores[0]
+
+
+def filter_ranked(db: Session, query: Query, fields: Sequence, q: str, order_by_similarity: bool = True) -> Query:
+    """Отфильтровать запрос по подстроке и упорядочить по близости"""
+    if not is_supported(db):
+        return query.filter(match_condition(fields, q, fuzzy=False))
+    query = query.filter(match_condition(fields, q))
+    if order_by_similarity:
+        query = query.order_by(similarity(fields, q).desc(), fields[0].class_.id)
+    return query
+
+
+def filter_contacts(db: Session, query: Query, q: str) -> Query:
+    return filter_ranked(db, query, CONTACT_FIELDS, q)
@@ -0,0 +1,86 @@
+"""
+Search visibility
+
+Правила видимости, которые применяет GET /contacts/: пользователь видит
+контакты, которые создал сам или которыми с ним поделились
+(contact_shared_users). Набор видимых id вычисляется один раз на запрос
+(зависимостью FastAPI, она кэшируется в пределах запроса) и передается
+в SQL поиска как условие, поэтому top-N считается по видимым строкам.
+Сообщения чата видны только участникам беседы. Доски, задачи,
+комментарии и файлы доступны всем пользователям (как в GET /boards/
+и GET /files/), для них условий нет.
+"""
+from typing import Dict, FrozenSet, List
+
+from sqlalchemy import Integer, any_, false, literal, or_, select, union
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.orm import Session
+
+from app.models.user import User
+from app.models.contact import Contact, contact_shared_users
+from app.models.chat import ChatMessage, chat_participants
+
+
+# Больше id передаем не массивом, а подзапросом
+INLINE_IDS_LIMIT = 10000
+
+
+class SearchVisibility:
+    """Видимые пользователю объекты поиска"""
+
+    def __init__(self, user_id: int, contact_ids: FrozenSet[int], dialect_name: str, truncated: bool = False,
+                 conversation_ids: FrozenSet[int] = frozenset()):
+        self.user_id = user_id
+        self.contact_ids = contact_ids
+        self.dialect_name = dialect_name
+        self.truncated = truncated
+        self.conversation_ids = conversation_ids
+
+    @classmethod
+    def for_user(cls, db: Session, user: User) -> "SearchVisibility":
+        statement = union(
+            select(Contact.id).where(Contact.created_by_id == user.id),
+            select(contact_shared_users.c.contact_id).where(contact_shared_users.c.user_id == user.id),
+        ).limit(INLINE_IDS_LIMIT + 1)
+        ids = frozenset(db.execute(statement).scalars())
+        truncated = len(ids) > INLINE_IDS_LIMIT
+        conversation_ids = frozenset(db.execute(
+            select(chat_participants.c.conversation_id).where(chat_participants.c.user_id == user.id)
+        ).scalars())
+        return cls(user.id, frozenset() if truncated else ids, db.get_bind().dialect.name, truncated, conversation_ids)
+
+    @property
+    def cache_scope(self):
+        """Часть ключа кэша, зависящая от видимости"""
+        return self.user_id
+
+    def contact_condition(self):
+        """Условие видимости контакта для WHERE"""
+        if self.truncated:
+            return or_(
+                Contact.created_by_id == self.user_id,
+                Contact.id.in_(
+                    select(contact_shared_users.c.contact_id).where(contact_shared_users.c.user_id == self.user_id)
+                ),
+            )
+        return self._in_ids(Contact.id, self.contact_ids)
+
+    def message_condition(self):
+        """Сообщение из беседы, в которой участвует пользователь"""
+        return self._in_ids(ChatMessage.conversation_id, self.conversation_ids)
+
+    def _in_ids(self, column, ids: FrozenSet[int]):
+        if not ids:
+            return false()
+        ids = sorted(ids)
+        if self.dialect_name == "postgresql":
+            # Один параметр-массив вместо тысяч параметров IN
+            return column == any_(literal(ids, ARRAY(Integer)))
+        return column.in_(ids)
+
+    def filters(self) -> Dict[str, List]:
+        """Условия по категориям поиска"""
+        return {
+            "contacts": [self.contact_condition()],
+            "messages": [self.message_condition()],
+        }
@@ -0,0 +1,444 @@
+"""
+Daily statistics rollups for reports
+
+Отчеты читают завершенные дни из таблиц stats_daily*, а живые таблицы
+сканируют только за дни после водяного знака (обычно только сегодня).
+
+Изменения уже агрегированных дней отмечаются при записи: хук сессии
+добавляет в stats_rollup_dirty_days дни создания измененных и удаленных
+досок, карточек (включая смену исполнителей), контактов, комментариев и
+файлов в той же транзакции, что и изменение. Проход пересчитывает
+отмеченные дни и удаляет прочитанные отметки. Поиск карточек по
+updated_at (с запасом на длинные транзакции) остается страховкой для
+изменений в обход ORM.
+"""
+from collections import defaultdict
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import delete, event, func, insert, inspect, select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.board import Board, Card, CardComment, Column, card_assignees
+from app.models.contact import Contact
+from app.models.file import File
+from app.models.stats import DailyStats, DailyBoardStats, DailyUserStats, StatsRollupState, StatsRollupDirtyDay
+
+
+ROLLUP_NAME = "daily"
+_MARKED_KEY = "stats_rollup_marked_days"
+
+# Атрибуты, от которых зависят агрегаты дня создания объекта
+ROLLUP_ATTRIBUTES = {
+    Board: ("created_at",),
+    Card: ("created_at", "completed", "column_id", "assignees"),
+    Contact: ("created_at",),
+    CardComment: ("created_at", "author_id"),
+    File: ("created_at", "uploaded_by_id"),
+}
+
+GLOBAL_FIELDS = (
+    "boards_created",
+    "cards_created",
+    "cards_created_completed",
+    "contacts_created",
+    "comments_created",
+    "files_uploaded",
+)
+BOARD_FIELDS = ("cards_created", "cards_created_completed")
+USER_FIELDS = ("cards_assigned", "cards_assigned_completed", "comments_created", "files_uploaded")
+
+
+def _as_date(value) -> date:
+    """func.date() возвращает строку в SQLite и date в PostgreSQL"""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, str):
+        return date.fromisoformat(value[:10])
+    return value
+
+
+def _utc_day(value: datetime) -> date:
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc)
+    return value.date()
+
+
+def _bounds(start_day: date, end_day: date) -> Tuple[datetime, datetime]:
+    return datetime.combine(start_day, datetime.min.time()), datetime.combine(end_day, datetime.min.time())
+
+
+def _day_ranges(days: Iterable[date]) -> List[Tuple[date, date]]:
+    """Склеить набор дней в полуинтервалы [start, end)"""
+    ranges: List[Tuple[date, date]] = []
+    for day in sorted(set(days)):
+        if ranges and ranges[-1][1] == day:
+            ranges[-1] = (ranges[-1][0], day + timedelta(days=1))
+        else:
+            ranges.append((day, day + timedelta(days=1)))
+    return ranges
+
+
+# Агрегация живых таблиц
+
+def collect_global_stats(db: Session, start_day: date, end_day: date) -> Dict[date, Dict[str, int]]:
+    """Общие счетчики по дням за [start_day, end_day)"""
+    start, end = _bounds(start_day, end_day)
+    result: Dict[date, Dict[str, int]] = defaultdict(lambda: dict.fromkeys(GLOBAL_FIELDS, 0))
+
+    simple_counts = (
+        ("boards_created", Board.id, Board.created_at),
+        ("contacts_created", Contact.id, Contact.created_at),
+        ("comments_created", CardComment.id, CardComment.created_at),
+        ("files_uploaded", File.id, File.created_at),
+    )
+    for field, id_column, created_column in simple_counts:
+        day = func.date(created_column)
+        rows = db.query(day, func.count(id_column)).filter(
+            created_column >= start,
+            created_column < end
+        ).group_by(day).all()
+        for row_day, count in rows:
+            result[_as_date(row_day)][field] = count
+
+    day = func.date(Card.created_at)
+    rows = db.query(
+        day,
+        func.count(Card.id),
+        func.count(Card.id).filter(Card.completed == True)
+    ).filter(
+        Card.created_at >= start,
+        Card.created_at < end
+    ).group_by(day).all()
+    for row_day, created, completed in rows:
+        stats = result[_as_date(row_day)]
+        stats["cards_created"] = created
+        stats["cards_created_completed"] = completed
+
+    return dict(result)
+
+
+def collect_board_stats(db: Session, start_day: date, end_day: date) -> Dict[Tuple[date, int], Dict[str, int]]:
+    """Счетчики карточек по доскам и дням за [start_day, end_day)"""
+    start, end = _bounds(start_day, end_day)
+    day = func.date(Card.created_at)
+    rows = db.query(
+        day,
+        Column.board_id,
+        func.count(Card.id),
+        func.count(Card.id).filter(Card.completed == True)
+    ).join(Column, Card.column_id == Column.id).filter(
+        Card.created_at >= start,
+        Card.created_at < end
+    ).group_by(day, Column.board_id).all()
+
+    return {
+        (_as_date(row_day), board_id): {"cards_created": created, "cards_created_completed": completed}
+        for row_day, board_id, created, completed in rows
+    }
+
+
+def collect_user_stats(db: Session, start_day: date, end_day: date) -> Dict[Tuple[date, int], Dict[str, int]]:
+    """Счетчики активности пользователей по дням за [start_day, end_day)"""
+    start, end = _bounds(start_day, end_day)
+    result: Dict[Tuple[date, int], Dict[str, int]] = defaultdict(lambda: dict.fromkeys(USER_FIELDS, 0))
+
+    day = func.date(Card.created_at)
+    rows = db.query(
+        day,
+        card_assignees.c.user_id,
+        func.count(Card.id),
+        func.count(Card.id).filter(Card.completed == True)
+    ).join(card_assignees, card_assignees.c.card_id == Card.id).filter(
+        Card.created_at >= start,
+        Card.created_at < end
+    ).group_by(day, card_assignees.c.user_id).all()
+    for row_day, user_id, assigned, completed in rows:
+        stats = result[(_as_date(row_day), user_id)]
+        stats["cards_assigned"] = assigned
+        stats["cards_assigned_completed"] = completed
+
+    per_author = (
+        ("comments_created", CardComment.id, CardComment.author_id, CardComment.created_at),
+        ("files_uploaded", File.id, File.uploaded_by_id, File.created_at),
+    )
+    for field, id_column, user_column, created_column in per_author:
+        day = func.date(created_column)
+        rows = db.query(day, user_column, func.count(id_column)).filter(
+            created_column >= start,
+            created_column < end
+        ).group_by(day, user_column).all()
+        for row_day, user_id, count in rows:
+            result[(_as_date(row_day), user_id)][field] = count
+
+    return dict(result)
+
+
+# Поддержка таблиц
+
+def rebuild_days(db: Session, start_day: date, end_day: date) -> None:
+    """Пересчитать строки rollup-таблиц за [start_day, end_day) (без commit)"""
+    if start_day >= end_day:
+        return
+
+    global_stats = collect_global_stats(db, start_day, end_day)
+    board_stats = collect_board_stats(db, start_day, end_day)
+    user_stats = collect_user_stats(db, start_day, end_day)
+
+    for model in (DailyStats, DailyBoardStats, DailyUserStats):
+        db.query(model).filter(
+            model.day >= start_day,
+            model.day < end_day
+        ).delete(synchronize_session=False)
+
+    if global_stats:
+        db.execute(insert(DailyStats), [{"day": day, **values} for day, values in global_stats.items()])
+    if board_stats:
+        db.execute(insert(DailyBoardStats), [
+            {"day": day, "board_id": board_id, **values} for (day, board_id), values in board_stats.items()
+        ])
+    if user_stats:
+        db.execute(insert(DailyUserStats), [
+            {"day": day, "user_id": user_id, **values} for (day, user_id), values in user_stats.items()
+        ])
+
+
+def _rebuild_in_batches(db: Session, start_day: date, end_day: date, state: Optional[StatsRollupState] = None) -> int:
+    """Пересчитать диапазон порциями, фиксируя каждую порцию вместе с водяным знаком"""
+    batch = timedelta(days=max(settings.STATS_ROLLUP_BATCH_DAYS, 1))
+    days = 0
+    cursor = start_day
+    while cursor < end_day:
+        batch_end = min(cursor + batch, end_day)
+        rebuild_days(db, cursor, batch_end)
+        if state is not None and (state.last_day is None or state.last_day < batch_end - timedelta(days=1)):
+            state.last_day = batch_end - timedelta(days=1)
+        db.commit()
+        days += (batch_end - cursor).days
+        cursor = batch_end
+    return days
+
+
+def _get_state(db: Session) -> StatsRollupState:
+    state = db.get(StatsRollupState, ROLLUP_NAME)
+    if state is None:
+        state = StatsRollupState(name=ROLLUP_NAME)
+        db.add(state)
+    return state
+
+
+def _earliest_day(db: Session) -> Optional[date]:
+    candidates = [
+        db.query(func.min(column)).scalar()
+        for column in (Board.created_at, Card.created_at, Contact.created_at, CardComment.created_at, File.created_at)
+    ]
+    candidates = [_as_date(value) for value in candidates if value is not None]
+    return min(candidates) if candidates else None
+
+
+def refresh_rollups(db: Session, now: Optional[datetime] = None) -> int:
+    """
+    Инкрементально обновить rollup-таблицы.
+
+    Агрегирует новые завершенные дни после водяного знака, а также
+    пересчитывает последние STATS_ROLLUP_REFRESH_DAYS дней и дни, карточки
+    которых изменились с прошлого прохода (например, были завершены).
+    Возвращает количество пересчитанных дней.
+    """
+    now = now or datetime.utcnow()
+    today = now.date()
+    # Отметка времени по часам БД, чтобы сравнение с Card.updated_at не зависело от часов приложения.
+    # now() - время начала транзакции, поэтому при сравнении берется запас
+    run_started_at = db.query(func.now()).scalar()
+    state = _get_state(db)
+
+    if state.last_day is None:
+        first_day = _earliest_day(db)
+        state.last_day = (first_day or today) - timedelta(days=1)
+
+    # Новые завершенные дни
+    new_from = state.last_day + timedelta(days=1)
+    rebuilt = _rebuild_in_batches(db, new_from, today, state) if new_from < today else 0
+
+    # Поздние изменения уже агрегированных дней
+    dirty = {
+        today - timedelta(days=offset)
+        for offset in range(1, settings.STATS_ROLLUP_REFRESH_DAYS + 1)
+    }
+    marks = db.execute(select(StatsRollupDirtyDay.id, StatsRollupDirtyDay.day)).all()
+    dirty.update(_as_date(day) for _, day in marks)
+    if state.last_run_at is not None:
+        start, _ = _bounds(new_from, today)
+        overlap = timedelta(seconds=max(settings.STATS_ROLLUP_WATERMARK_OVERLAP_SECONDS, 0))
+        changed_days = db.query(func.date(Card.created_at)).filter(
+            Card.updated_at >= state.last_run_at - overlap,
+            Card.created_at < start
+        ).distinct().all()
+        dirty.update(_as_date(row_day) for (row_day,) in changed_days)
+    dirty = {day for day in dirty if day < new_from}
+
+    for start_day, end_day in _day_ranges(dirty):
+        rebuild_days(db, start_day, end_day)
+        rebuilt += (end_day - start_day).days
+
+    # Удаляются только прочитанные отметки: отметки транзакций, зафиксированных
+    # во время прохода, останутся до следующего
+    if marks:
+        db.execute(delete(StatsRollupDirtyDay).where(StatsRollupDirtyDay.id.in_([mark_id for mark_id, _ in marks])))
+
+    state.last_run_at = run_started_at
+    db.commit()
+
+    return rebuilt
+
+
+def backfill_rollups(db: Session, start_day: date, now: Optional[datetime] = None) -> int:
+    """Полностью пересчитать rollup-таблицы начиная с start_day"""
+    now = now or datetime.utcnow()
+    today = now.date()
+    run_started_at = db.query(func.now()).scalar()
+    state = _get_state(db)
+    rebuilt = _rebuild_in_batches(db, start_day, today, state)
+    state.last_run_at = run_started_at
+    db.commit()
+
+    return rebuilt
+
+
+# Отметка изменившихся дней при записи
+
+def _created_days(obj) -> Set[date]:
+    """Дни создания объекта: текущий и прежний (если created_at изменен)"""
+    history = inspect(obj).attrs.created_at.history
+    values = set(history.deleted or ())
+    values.add(obj.created_at)
+    return {_utc_day(value) for value in values if value is not None}
+
+
+def _changed_days(session: Session) -> Set[date]:
+    days: Set[date] = set()
+    with session.no_autoflush:
+        for obj in session.new:
+            if type(obj) in ROLLUP_ATTRIBUTES:
+                # Обычно created_at заполняет база текущим временем - такие дни еще не агрегированы
+                value = inspect(obj).dict.get("created_at")
+                if value is not None:
+                    days.add(_utc_day(value))
+        for obj in session.deleted:
+            if type(obj) in ROLLUP_ATTRIBUTES:
+                days.update(_created_days(obj))
+        for obj in session.dirty:
+            names = ROLLUP_ATTRIBUTES.get(type(obj))
+            state = inspect(obj)
+            if names and any(state.attrs[name].history.has_changes() for name in names):
+                days.update(_created_days(obj))
+    return days
+
+
+def _before_flush(session: Session, flush_context, instances) -> None:
+    # Сегодняшний день всегда читается из живых таблиц
+    today = datetime.utcnow().date()
+    marked = session.info.setdefault(_MARKED_KEY, set())
+    days = {day for day in _changed_days(session) if day < today} - marked
+    if days:
+        session.connection().execute(insert(StatsRollupDirtyDay), [{"day": day} for day in sorted(days)])
+        marked.update(days)
+
+
+def _after_transaction(session: Session) -> None:
+    session.info.pop(_MARKED_KEY, None)
+
+
+def install_session_hooks(session_factory) -> None:
+    """Отмечать дни, агрегаты которых устарели, в транзакциях записи"""
+    event.listen(session_factory, "before_flush", _before_flush)
+    event.listen(session_factory, "after_commit", _after_transaction)
+    event.listen(session_factory, "after_rollback", _after_transaction)
+
+
+# Чтение для отчетов
+
+def rolled_up_until(db: Session) -> Optional[date]:
+    """Последний день, доступный в rollup-таблицах"""
+    if not settings.STATS_ROLLUP_ENABLED:
+        return None
+    state = db.get(StatsRollupState, ROLLUP_NAME)
+    return state.last_day if state else None
+
+
+def _split_window(db: Session, start_day: date, today: date) -> Tuple[Optional[date], date]:
+    """Разбить окно на часть из rollup (включительно до last) и живую часть (с live_from)"""
+    last = rolled_up_until(db)
+    if last is None or last < start_day:
+        return None, start_day
+    last = min(last, today - timedelta(days=1))
+    return last, last + timedelta(days=1)
+
+
+def get_period_totals(db: Session, start_day: date, today: Optional[date] = None) -> Dict[str, int]:
+    """Общие счетчики за период с start_day по сегодня включительно"""
+    today = today or datetime.utcnow().date()
+    totals = dict.fromkeys(GLOBAL_FIELDS, 0)
+    last, live_from = _split_window(db, start_day, today)
+
+    if last is not None:
+        sums = db.query(*[
+            func.coalesce(func.sum(getattr(DailyStats, field)), 0) for field in GLOBAL_FIELDS
+        ]).filter(
+            DailyStats.day >= start_day,
+            DailyStats.day <= last
+        ).one()
+        totals.update(zip(GLOBAL_FIELDS, (int(value) for value in sums)))
+
+    for values in collect_global_stats(db, live_from, today + timedelta(days=1)).values():
+        for field in GLOBAL_FIELDS:
+            totals[field] += values[field]
+
+    return totals
+
+
+def get_daily_series(db: Session, field: str, start_day: date, today: Optional[date] = None) -> List[Tuple[date, int]]:
+    """Ряд значений общего счетчика по дням (дни с нулем пропускаются)"""
+    today = today or datetime.utcnow().date()
+    series: Dict[date, int] = {}
+    last, live_from = _split_window(db, start_day, today)
+
+    if last is not None:
+        column = getattr(DailyStats, field)
+        rows = db.query(DailyStats.day, column).filter(
+            DailyStats.day >= start_day,
+            DailyStats.day <= last,
+            column > 0
+        ).all()
+        series.update((_as_date(day), value) for day, value in rows)
+
+    for day, values in collect_global_stats(db, live_from, today + timedelta(days=1)).items():
+        if values[field]:
+            series[day] = values[field]
+
+    return sorted(series.items())
+
+
+def get_user_period_totals(db: Session, start_day: date, today: Optional[date] = None) -> Dict[int, Dict[str, int]]:
+    """Счетчики активности по пользователям за период с start_day по сегодня"""
+    today = today or datetime.utcnow().date()
+    totals: Dict[int, Dict[str, int]] = defaultdict(lambda: dict.fromkeys(USER_FIELDS, 0))
+    last, live_from = _split_window(db, start_day, today)
+
+    if last is not None:
+        rows = db.query(
+            DailyUserStats.user_id,
+            *[func.sum(getattr(DailyUserStats, field)) for field in USER_FIELDS]
+        ).filter(
+            DailyUserStats.day >= start_day,
+            DailyUserStats.day <= last
+        ).group_by(DailyUserStats.user_id).all()
+        for user_id, *values in rows:
+            totals[user_id].update(zip(USER_FIELDS, (int(value or 0) for value in values)))
+
+    for (_, user_id), values in collect_user_stats(db, live_from, today + timedelta(days=1)).items():
+        for field in USER_FIELDS:
+            totals[user_id][field] += values[field]
+
+    return dict(totals)
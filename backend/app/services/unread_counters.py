@@ -0,0 +1,247 @@
+"""
+Per-user unread counters
+
+Число непрочитанных уведомлений и сообщений чата пользователя хранится
+в user_unread_counters и меняется в той же транзакции, что и данные:
+- уведомления - хуком сессии: новое непрочитанное +1, прочтение или
+  удаление непрочитанного -1 (пометка всех прочитанными пересчитывает);
+- чат - в app.services.chat_state: новое сообщение +1 получателям,
+  отметка о прочтении пересчитывает сумму счетчиков участника по беседам.
+
+Чтение идет через кэш процесса; после фиксации транзакции записи
+затронутых пользователей сбрасываются, а TTL ограничивает устаревание
+при изменениях в других воркерах. Фоновая сверка (reconcile) исправляет
+расхождения, например после каскадных удалений в базе.
+"""
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, Iterable, Optional
+
+from sqlalchemy import bindparam, case, event, func, inspect, or_, select, update
+from sqlalchemy.orm import Session
+
+from app.models.chat import ChatMessage, chat_participants
+from app.models.notification import Notification
+from app.models.unread_counter import UserUnreadCounter
+
+
+CACHE_TTL_SECONDS = 30
+FIELDS = ("notifications", "chat")
+_TOUCHED_KEY = "unread_counters_touched"
+
+
+def _insert(connection):
+    if connection.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(UserUnreadCounter)
+
+
+def _clamp(expression):
+    return case((expression < 0, 0), else_=expression)
+
+
+def _touch(db: Session, user_ids: Iterable[int]) -> None:
+    db.info.setdefault(_TOUCHED_KEY, set()).update(user_ids)
+
+
+def add(db: Session, deltas: Dict[int, Dict[str, int]]) -> None:
+    """Изменить счетчики на deltas: {user_id: {"notifications": +1, ...}}"""
+    rows = [
+        {"user_id": user_id, **{field: values.get(field, 0) for field in FIELDS}}
+        for user_id, values in deltas.items()
+        if any(values.values())
+    ]
+    if not rows:
+        return
+    connection = db.connection()
+    # Строка создается нулевой, затем одно обновление на пакет (executemany);
+    # счетчик не уходит ниже нуля
+    connection.execute(
+        _insert(connection).on_conflict_do_nothing(index_elements=[UserUnreadCounter.user_id]),
+        [{"user_id": row["user_id"]} for row in rows],
+    )
+    connection.execute(
+        update(UserUnreadCounter.__table__)
+        .where(UserUnreadCounter.user_id == bindparam("b_user_id"))
+        .values(
+            updated_at=func.now(),
+            **{field: _clamp(getattr(UserUnreadCounter, field) + bindparam(f"b_{field}")) for field in FIELDS},
+        ),
+        [{f"b_{key}": value for key, value in row.items()} for row in rows],
+    )
+    _touch(db, deltas)
+
+
+def assign(db: Session, values: Dict[int, Dict[str, int]]) -> None:
+    """Записать значения счетчиков: {user_id: {"chat": 3}}"""
+    if not values:
+        return
+    connection = db.connection()
+    for field in FIELDS:
+        rows = [{"user_id": user_id, field: fields[field]} for user_id, fields in values.items() if field in fields]
+        if not rows:
+            continue
+        statement = _insert(connection)
+        connection.execute(statement.on_conflict_do_update(
+            index_elements=[UserUnreadCounter.user_id],
+            set_={field: getattr(statement.excluded, field), "updated_at": func.now()},
+        ), rows)
+    _touch(db, values)
+
+
+def _unread_notifications_condition():
+    return or_(Notification.is_read == False, Notification.is_read.is_(None))  # noqa: E712
+
+
+def recount_notifications(db: Session, user_id: int) -> None:
+    """Пересчитать непрочитанные уведомления пользователя"""
+    count = db.execute(
+        select(func.count(Notification.id)).where(Notification.user_id == user_id, _unread_notifications_condition())
+    ).scalar()
+    assign(db, {user_id: {"notifications": count}})
+
+
+def recount_chat(db: Session, user_ids: Iterable[int]) -> None:
+    """Пересчитать непрочитанное в чатах как сумму счетчиков участника по беседам"""
+    user_ids = set(user_ids)
+    if not user_ids:
+        return
+    totals = dict(db.execute(
+        select(chat_participants.c.user_id, func.sum(chat_participants.c.unread_count))
+        .where(chat_participants.c.user_id.in_(user_ids))
+        .group_by(chat_participants.c.user_id)
+    ).all())
+    assign(db, {user_id: {"chat": int(totals.get(user_id) or 0)} for user_id in user_ids})
+
+
+class UnreadCounterCache:
+    """Кэш счетчиков процесса (read-through)"""
+
+    def __init__(self, ttl: float = CACHE_TTL_SECONDS):
+        self.ttl = ttl
+        self._values: Dict[int, tuple] = {}
+        self._lock = threading.Lock()
+
+    def get(self, db: Session, user_id: int) -> Dict[str, int]:
+        now = time.monotonic()
+        with self._lock:
+            cached = self._values.get(user_id)
+        if cached is not None and now - cached[0] < self.ttl:
+            return cached[1]
+
+        row = db.execute(
+            select(UserUnreadCounter.notifications, UserUnreadCounter.chat)
+            .where(UserUnreadCounter.user_id == user_id)
+        ).first()
+        values = {"notifications": row[0], "chat": row[1]} if row is not None else {field: 0 for field in FIELDS}
+        with self._lock:
+            self._values[user_id] = (now, values)
+        return values
+
+    def invalidate(self, user_ids: Optional[Iterable[int]] = None) -> None:
+        with self._lock:
+            if user_ids is None:
+                self._values.clear()
+            else:
+                for user_id in user_ids:
+                    self._values.pop(user_id, None)
+
+
+counter_cache = UnreadCounterCache()
+
+
+def get(db: Session, user_id: int) -> Dict[str, int]:
+    """Счетчики пользователя: {"notifications": n, "chat": m}"""
+    return counter_cache.get(db, user_id)
+
+
+def reconcile(db: Session) -> int:
+    """
+    Пересчитать счетчики чата по курсорам прочтения и счетчики
+    пользователей по данным; возвращает число исправленных пользователей
+    """
+    cursor_unread = (
+        select(func.count(ChatMessage.id))
+        .where(
+            ChatMessage.conversation_id == chat_participants.c.conversation_id,
+            ChatMessage.id > chat_participants.c.last_read_message_id,
+            ChatMessage.sender_id != chat_participants.c.user_id,
+        )
+        .scalar_subquery()
+    )
+    db.execute(
+        update(chat_participants)
+        .where(chat_participants.c.unread_count != cursor_unread)
+        .values(unread_count=cursor_unread)
+    )
+
+    desired: Dict[int, Dict[str, int]] = defaultdict(lambda: {field: 0 for field in FIELDS})
+    for user_id, count in db.execute(
+        select(Notification.user_id, func.count(Notification.id))
+        .where(_unread_notifications_condition())
+        .group_by(Notification.user_id)
+    ):
+        desired[user_id]["notifications"] = count
+    for user_id, total in db.execute(
+        select(chat_participants.c.user_id, func.sum(chat_participants.c.unread_count))
+        .group_by(chat_participants.c.user_id)
+    ):
+        desired[user_id]["chat"] = int(total or 0)
+
+    stored = {
+        row.user_id: {"notifications": row.notifications, "chat": row.chat}
+        for row in db.execute(select(UserUnreadCounter.user_id, UserUnreadCounter.notifications, UserUnreadCounter.chat))
+    }
+    for user_id in stored:
+        desired[user_id]  # у пользователя ничего не осталось - счетчики должны стать нулями
+
+    fixes = {user_id: values for user_id, values in desired.items() if stored.get(user_id) != values}
+    assign(db, fixes)
+    db.commit()
+    counter_cache.invalidate()
+    return len(fixes)
+
+
+# Хуки сессии
+
+def _after_flush(session: Session, flush_context) -> None:
+    deltas: Dict[int, int] = defaultdict(int)
+    for obj in session.new:
+        if isinstance(obj, Notification) and not obj.is_read:
+            deltas[obj.user_id] += 1
+    for obj in session.deleted:
+        if isinstance(obj, Notification):
+            history = inspect(obj).attrs.is_read.history
+            was_read = history.deleted[0] if history.deleted else obj.is_read
+            if not was_read:
+                deltas[obj.user_id] -= 1
+    for obj in session.dirty:
+        if isinstance(obj, Notification):
+            history = inspect(obj).attrs.is_read.history
+            if not history.deleted:
+                continue
+            was_read, is_read = bool(history.deleted[0]), bool(obj.is_read)
+            if was_read != is_read:
+                deltas[obj.user_id] += -1 if is_read else 1
+    if deltas:
+        add(session, {user_id: {"notifications": delta} for user_id, delta in deltas.items()})
+
+
+def _after_commit(session: Session) -> None:
+    touched = session.info.pop(_TOUCHED_KEY, None)
+    if touched:
+        counter_cache.invalidate(touched)
+
+
+def _after_rollback(session: Session) -> None:
+    session.info.pop(_TOUCHED_KEY, None)
+
+
+def install_session_hooks(session_factory) -> None:
+    """Подключить учет непрочитанных уведомлений к фабрике сессий"""
+    event.listen(session_factory, "after_flush", _after_flush)
+    event.listen(session_factory, "after_commit", _after_commit)
+    event.listen(session_factory, "after_rollback", _after_rollback)
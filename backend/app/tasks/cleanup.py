@@ -1,7 +1,6 @@
 """
 Background tasks for cleanup and notifications
 """
-import os
 import asyncio
 from datetime import datetime
 from sqlalchemy.orm import Session
@@ -9,9 +8,14 @@ from sqlalchemy import and_
 
 from app.core.database import SessionLocal
 from app.models.file import File
-from app.models.board import Card
-from app.models.notification import Notification, NotificationType
 from app.core.config import settings
+from app.services.deadline_notifications import create_deadline_notifications
+from app.services.file_storage import delete_file_record, remove_stale_temp_files
+from app.tasks.file_storage import maintain_file_storage
+from app.tasks.notification_retention import purge_old_notifications
+from app.tasks.rollups import refresh_daily_stats
+from app.tasks.search_index import refresh_search_index
+from app.tasks.unread_counters import reconcile_unread_counters
 
 
 async def cleanup_expired_files():
@@ -30,19 +34,17 @@ async def cleanup_expired_files():
         
         deleted_count = 0
         for file in expired_files:
-            # Удалить физический файл
-            if os.path.exists(file.file_path):
-                try:
-                    os.remove(file.file_path)
-                    deleted_count += 1
-                except Exception as e:
-                    print(f"Ошибка при удалении файла {file.file_path}: {e}")
-            
-            # Удалить запись из БД
-            db.delete(file)
+            # Удалить запись из БД; физический файл - вместе с последней ссылкой на содержимое
+            try:
+                delete_file_record(db, file)
+                deleted_count += 1
+            except OSError as e:
+                print(f"Ошибка при удалении файла {file.file_path}: {e}")
         
         db.commit()
         
+        deleted_count += remove_stale_temp_files(settings.UPLOAD_DIR)
+        
         if deleted_count > 0:
             print(f"✅ Удалено {deleted_count} устаревших файлов")
         
@@ -56,88 +58,11 @@ async def cleanup_expired_files():
 async def check_card_deadlines():
     """
     Проверить дедлайны карточек и отправить уведомления
+    (не больше одного уведомления каждого типа по задаче в сутки)
     """
     db = SessionLocal()
     try:
-        now = datetime.utcnow()
-        
-        # Найти карточки с дедлайном через 1 день
-        from datetime import timedelta
-        due_soon_date = now.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
-        
-        cards_due_soon = db.query(Card).filter(
-            Card.due_date.isnot(None),
-            Card.completed == False,
-            Card.due_date <= due_soon_date,
-            Card.due_date > now
-        ).all()
-        
-        # Найти просроченные карточки
-        cards_overdue = db.query(Card).filter(
-            Card.due_date.isnot(None),
-            Card.completed == False,
-            Card.due_date < now
-        ).all()
-        
-        notifications_created = 0
-        
-        # Уведомления о скором дедлайне
-        for card in cards_due_soon:
-            # Создать уведомление для исполнителей
-            for assignee in card.assignees:
-                notification = Notification(
-                    user_id=assignee.id,
-                    type=NotificationType.CARD_DUE_SOON,
-                    title=f"Дедлайн скоро: {card.title}",
-                    message=f"У задачи '{card.title}' дедлайн наступает завтра",
-                    card_id=card.id,
-                    link=f"/boards/{card.column.board_id}#card-{card.id}"
-                )
-                db.add(notification)
-                notifications_created += 1
-            
-            # Создать уведомление для владельца доски (менеджера)
-            if card.column and card.column.board:
-                manager_id = card.column.board.owner_id
-                notification = Notification(
-                    user_id=manager_id,
-                    type=NotificationType.CARD_DUE_SOON,
-                    title=f"Дедлайн близко: {card.title}",
-                    message=f"У задачи '{card.title}' дедлайн наступает завтра",
-                    card_id=card.id,
-                    link=f"/boards/{card.column.board_id}#card-{card.id}"
-                )
-                db.add(notification)
-                notifications_created += 1
-        
-        # Уведомления о просроченных задачах
-        for card in cards_overdue:
-            # Создать уведомление для исполнителей
-            for assignee in card.assignees:
-                notification = Notification(
-                    user_id=assignee.id,
-                    type=NotificationType.CARD_OVERDUE,
-                    title=f"Просрочено: {card.title}",
-                    message=f"Задача '{card.title}' просрочена!",
-                    card_id=card.id,
-                    link=f"/boards/{card.column.board_id}#card-{card.id}"
-                )
-                db.add(notification)
-                notifications_created += 1
-            
-            # Создать уведомление для владельца доски (менеджера)
-            if card.column and card.column.board:
-                manager_id = card.column.board.owner_id
-                notification = Notification(
-                    user_id=manager_id,
-                    type=NotificationType.CARD_OVERDUE,
-                    title=f"Просрочено: {card.title}",
-                    message=f"Задача '{card.title}' просрочена!",
-                    card_id=card.id,
-                    link=f"/boards/{card.column.board_id}#card-{card.id}"
-                )
-                db.add(notification)
-                notifications_created += 1
+        notifications_created = create_deadline_notifications(db, datetime.utcnow())
         
         db.commit()
         
@@ -158,7 +83,12 @@ async def run_background_tasks():
     while True:
         try:
             await cleanup_expired_files()
+            await maintain_file_storage()
             await check_card_deadlines()
+            await purge_old_notifications()
+            await refresh_daily_stats()
+            await refresh_search_index()
+            await reconcile_unread_counters()
         except Exception as e:
             print(f"Ошибка в фоновых задачах: {e}")
         
@@ -0,0 +1,33 @@
+"""
+Background maintenance of the content-addressed file storage
+"""
+from app.core.database import SessionLocal
+from app.services.file_storage import collect_blobs, relink_legacy_files
+
+
+# id последней просмотренной записи: файлы, пропущенные из-за отсутствия
+# на диске, не задерживают перенос остальных
+_relink_cursor = 0
+
+
+async def maintain_file_storage():
+    """
+    Перенести порцию старых файлов в хранилище по хешу и удалить
+    содержимое, на которое не осталось ссылок
+    """
+    global _relink_cursor
+    db = SessionLocal()
+    try:
+        relinked, _relink_cursor = relink_legacy_files(db, _relink_cursor)
+        fixed, removed = collect_blobs(db)
+        
+        if relinked > 0:
+            print(f"✅ Перенесено в хранилище по хешу файлов: {relinked}")
+        if fixed > 0 or removed > 0:
+            print(f"✅ Исправлено счетчиков ссылок: {fixed}, удалено файлов без ссылок: {removed}")
+        
+    except Exception as e:
+        db.rollback()
+        print(f"Ошибка при обслуживании хранилища файлов: {e}")
+    finally:
+        db.close()
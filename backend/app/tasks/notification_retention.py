@@ -0,0 +1,23 @@
+"""
+Background retention of read notifications
+"""
+from app.core.database import SessionLocal
+from app.services.notification_retention import apply_retention
+
+
+async def purge_old_notifications():
+    """
+    Перенести старые прочитанные уведомления в архив и очистить архив
+    """
+    db = SessionLocal()
+    try:
+        archived, purged = apply_retention(db)
+        
+        if archived > 0 or purged > 0:
+            print(f"✅ Уведомлений перенесено в архив: {archived}, удалено из архива: {purged}")
+        
+    except Exception as e:
+        db.rollback()
+        print(f"Ошибка при очистке уведомлений: {e}")
+    finally:
+        db.close()
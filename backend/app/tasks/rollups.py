@@ -0,0 +1,27 @@
+"""
+Background maintenance of report statistics rollups
+"""
+from app.core.database import SessionLocal
+from app.core.config import settings
+from app.services.stats_rollup import refresh_rollups
+
+
+async def refresh_daily_stats():
+    """
+    Инкрементально обновить дневные rollup-таблицы статистики
+    """
+    if not settings.STATS_ROLLUP_ENABLED:
+        return
+    
+    db = SessionLocal()
+    try:
+        rebuilt_days = refresh_rollups(db)
+        
+        if rebuilt_days > 0:
+            print(f"✅ Пересчитана статистика за {rebuilt_days} дн.")
+        
+    except Exception as e:
+        db.rollback()
+        print(f"Ошибка при обновлении статистики: {e}")
+    finally:
+        db.close()
@@ -0,0 +1,49 @@
+"""
+Background maintenance of the embedded search index
+"""
+from app.core.database import SessionLocal
+from app.core.config import settings
+from app.services.search.backend import get_backend
+from app.services.search.inverted_index import search_index, index_backend, load_search_index
+
+
+def _uses_index(db) -> bool:
+    return get_backend(db) is index_backend
+
+
+def load_search_index_on_startup():
+    """
+    Загрузить снимок встроенного индекса и догрузить изменения
+    (вызывается в отдельном потоке при запуске)
+    """
+    db = SessionLocal()
+    try:
+        if not _uses_index(db):
+            return
+        changed = load_search_index(db)
+        print(f"✅ Поисковый индекс загружен, обновлено документов: {changed}")
+    except Exception as e:
+        db.rollback()
+        print(f"Ошибка при загрузке поискового индекса: {e}")
+    finally:
+        db.close()
+
+
+async def refresh_search_index():
+    """
+    Сверить встроенный индекс с базой и сохранить снимок
+    """
+    db = SessionLocal()
+    try:
+        if not _uses_index(db) or not search_index.ready:
+            return
+        changed = search_index.catch_up(db)
+        if settings.SEARCH_INDEX_SNAPSHOT_PATH:
+            search_index.save(settings.SEARCH_INDEX_SNAPSHOT_PATH)
+        if changed > 0:
+            print(f"✅ Поисковый индекс сверен с базой, обновлено документов: {changed}")
+    except Exception as e:
+        db.rollback()
+        print(f"Ошибка при обновлении поискового индекса: {e}")
+    finally:
+        db.close()
@@ -0,0 +1,23 @@
+"""
+Background reconciliation of per-user unread counters
+"""
+from app.core.database import SessionLocal
+from app.services.unread_counters import reconcile
+
+
+async def reconcile_unread_counters():
+    """
+    Сверить счетчики непрочитанного с данными и исправить расхождения
+    """
+    db = SessionLocal()
+    try:
+        fixed = reconcile(db)
+        
+        if fixed > 0:
+            print(f"✅ Исправлены счетчики непрочитанного у {fixed} польз.")
+        
+    except Exception as e:
+        db.rollback()
+        print(f"Ошибка при сверке счетчиков непрочитанного: {e}")
+    finally:
+        db.close()
@@ -0,0 +1,41 @@
+"""
+Script to backfill daily statistics rollups for reports
+"""
+import sys
+import os
+import argparse
+from datetime import date
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from app.core.database import SessionLocal
+from app.services.stats_rollup import backfill_rollups, refresh_rollups
+
+
+def main():
+    """Backfill rollups from the given day, or run one incremental pass"""
+    parser = argparse.ArgumentParser(description="Пересчет дневной статистики отчетов")
+    parser.add_argument("--from", dest="start_day", type=date.fromisoformat, default=None,
+                        help="Пересчитать все дни начиная с даты (YYYY-MM-DD)")
+    args = parser.parse_args()
+    
+    db = SessionLocal()
+    try:
+        if args.start_day:
+            print(f"Пересчет статистики с {args.start_day}...")
+            days = backfill_rollups(db, args.start_day)
+        else:
+            print("Инкрементальное обновление статистики...")
+            days = refresh_rollups(db)
+        print(f"✅ Пересчитано дней: {days}")
+    except Exception as e:
+        db.rollback()
+        print(f"❌ Ошибка: {e}")
+        sys.exit(1)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Script to benchmark deadline window queries and verify index usage (PostgreSQL)
+
+Создает синтетические карточки через generate_series внутри транзакции,
+выполняет EXPLAIN (ANALYZE, BUFFERS) для запросов app.services.deadlines
+с индексами и без них, после чего откатывает транзакцию.
+"""
+import sys
+import os
+import argparse
+import time
+import uuid
+from datetime import datetime
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from sqlalchemy import func, text
+from sqlalchemy.orm import Session
+
+from app.core.database import engine
+from app.models.user import User
+from app.models.board import Board, Column, Card
+from app.services.deadlines import overdue_cards, due_soon_cards, count_overdue
+
+
+INDEX_NAME = "ix_cards_open_due_date"
+
+
+def seed(session: Session, cards: int, open_share: float) -> int:
+    """Синтетические карточки: дедлайны +-30 дней, open_share открытых"""
+    owner = User(
+        email=f"bench-{uuid.uuid4().hex[:12]}@example.com",
+        hashed_password="-",
+        full_name="Benchmark",
+    )
+    session.add(owner)
+    session.flush()
+    board = Board(title="Benchmark", owner_id=owner.id)
+    session.add(board)
+    session.flush()
+    column = Column(title="Benchmark", board_id=board.id)
+    session.add(column)
+    session.flush()
+
+    session.execute(text("""
+        INSERT INTO cards (title, column_id, position, priority, due_date, completed, created_at)
+        SELECT
+            'bench ' || g,
+            :column_id,
+            g,
+            'MEDIUM',
+            CASE WHEN random() < 0.9 THEN now() + (random() * 60 - 30) * interval '1 day' END,
+            random() >= :open_share,
+            now() - random() * interval '365 days'
+        FROM generate_series(1, :cards) AS g
+    """), {"column_id": column.id, "cards": cards, "open_share": open_share})
+    session.execute(text("ANALYZE cards"))
+    return board.id
+
+
+def explain(session: Session, query) -> tuple:
+    """План и время выполнения запроса"""
+    connection = session.connection()
+    compiled = query.statement.compile(dialect=connection.dialect)
+    plan = connection.exec_driver_sql(
+        "EXPLAIN (ANALYZE, BUFFERS) " + str(compiled), compiled.params
+    ).scalars().all()
+
+    started = time.perf_counter()
+    connection.exec_driver_sql(str(compiled), compiled.params).fetchall()
+    elapsed = time.perf_counter() - started
+    return "\n".join(plan), elapsed
+
+
+def main():
+    """Seed synthetic cards, explain deadline queries and roll everything back"""
+    parser = argparse.ArgumentParser(description="Бенчмарк запросов по дедлайнам")
+    parser.add_argument("--cards", type=int, default=2_000_000, help="Количество синтетических карточек")
+    parser.add_argument("--open-share", type=float, default=0.2, help="Доля незавершенных задач")
+    parser.add_argument("--verbose", action="store_true", help="Печатать планы запросов")
+    args = parser.parse_args()
+
+    if engine.dialect.name != "postgresql":
+        print("❌ Бенчмарк рассчитан на PostgreSQL")
+        sys.exit(1)
+
+    connection = engine.connect()
+    transaction = connection.begin()
+    session = Session(bind=connection)
+    try:
+        print(f"Создание {args.cards} синтетических карточек...")
+        board_id = seed(session, args.cards, args.open_share)
+
+        now = datetime.utcnow()
+        queries = {
+            "overdue": overdue_cards(session, now),
+            "due soon": due_soon_cards(session, now),
+            "overdue count": overdue_cards(session, now, query=session.query(func.count(Card.id))),
+            "overdue count (board)": overdue_cards(session, now, board_id, query=session.query(func.count(Card.id))),
+        }
+
+        failed = False
+        for name, query in queries.items():
+            plan, indexed = explain(session, query)
+            uses_index = INDEX_NAME in plan
+
+            session.execute(text("SET LOCAL enable_indexscan = off"))
+            session.execute(text("SET LOCAL enable_bitmapscan = off"))
+            _, sequential = explain(session, query)
+            session.execute(text("SET LOCAL enable_indexscan = on"))
+            session.execute(text("SET LOCAL enable_bitmapscan = on"))
+
+            mark = "✅" if uses_index else "❌"
+            print(f"{mark} {name}: {indexed * 1000:.1f} мс с индексом, {sequential * 1000:.1f} мс без индексов")
+            if args.verbose or not uses_index:
+                print(plan)
+            failed = failed or not uses_index
+
+        print(f"Просрочено (count_overdue): {count_overdue(session, now)}")
+        if failed:
+            sys.exit(1)
+    finally:
+        session.close()
+        transaction.rollback()
+        connection.close()
+
+
+if __name__ == "__main__":
+    main()
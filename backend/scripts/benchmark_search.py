@@ -0,0 +1,121 @@
+"""
+Script to benchmark trigram contact search against sequential ILIKE scans (PostgreSQL)
+
+Создает синтетические контакты через generate_series внутри транзакции,
+сравнивает поиск app.services.search.trigram (GIN gin_trgm_ops) с
+последовательным ILIKE (индексы отключены) и откатывает транзакцию.
+"""
+import sys
+import os
+import argparse
+import statistics
+import time
+import uuid
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.core.database import engine
+from app.models.user import User
+from app.models.contact import Contact
+from app.services.search import trigram
+
+
+QUERIES = [
+    "Вектор",            # подстрока названия
+    "Севрная",           # опечатка
+    "ivanov.421",        # часть email
+    "Петров",            # контактное лицо
+]
+TARGET_MS = 10
+
+
+def seed(session: Session, contacts: int) -> None:
+    """Синтетические контакты из словаря слов и номера"""
+    owner = User(
+        email=f"bench-{uuid.uuid4().hex[:12]}@example.com",
+        hashed_password="-",
+        full_name="Benchmark",
+    )
+    session.add(owner)
+    session.flush()
+
+    session.execute(text("""
+        INSERT INTO contacts (company_name, contact_person, email, type, created_by_id, created_at)
+        SELECT
+            (ARRAY['Вектор', 'Северная', 'Альфа', 'Гранит', 'Орион', 'Восток', 'Сфера', 'Меридиан'])[1 + g % 8]
+                || ' ' || (ARRAY['Строй', 'Логистик', 'Трейд', 'Групп', 'Сервис', 'Медиа'])[1 + g % 6]
+                || ' ' || g,
+            (ARRAY['Иванов', 'Петров', 'Смирнова', 'Кузнецов', 'Попова'])[1 + g % 5] || ' ' || g,
+            (ARRAY['ivanov', 'petrov', 'smirnova', 'kuznetsov', 'popova'])[1 + g % 5] || '.' || g || '@example.com',
+            'CLIENT',
+            :owner_id,
+            now()
+        FROM generate_series(1, :contacts) AS g
+    """), {"owner_id": owner.id, "contacts": contacts})
+    session.execute(text("ANALYZE contacts"))
+
+
+def measure(session: Session, query, runs: int) -> float:
+    """Медианное время выполнения запроса, мс"""
+    connection = session.connection()
+    compiled = query.statement.compile(dialect=connection.dialect)
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        connection.exec_driver_sql(str(compiled), compiled.params).fetchall()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    """Seed synthetic contacts, compare trigram and sequential search, roll back"""
+    parser = argparse.ArgumentParser(description="Бенчмарк триграммного поиска контактов")
+    parser.add_argument("--contacts", type=int, default=1_000_000, help="Количество синтетических контактов")
+    parser.add_argument("--runs", type=int, default=5, help="Повторов каждого запроса")
+    parser.add_argument("--limit", type=int, default=10, help="Размер выдачи")
+    args = parser.parse_args()
+
+    if engine.dialect.name != "postgresql":
+        print("❌ Бенчмарк рассчитан на PostgreSQL")
+        sys.exit(1)
+
+    connection = engine.connect()
+    transaction = connection.begin()
+    session = Session(bind=connection)
+    try:
+        print(f"Создание {args.contacts} синтетических контактов...")
+        seed(session, args.contacts)
+
+        slow = False
+        for q in QUERIES:
+            indexed = trigram.filter_contacts(session, session.query(Contact.id), q).limit(args.limit)
+            indexed_ms = measure(session, indexed, args.runs)
+
+            session.execute(text("SET LOCAL enable_indexscan = off"))
+            session.execute(text("SET LOCAL enable_bitmapscan = off"))
+            sequential = session.query(Contact.id).filter(
+                trigram.match_condition(trigram.CONTACT_FIELDS, q, fuzzy=False)
+            ).limit(args.limit)
+            sequential_ms = measure(session, sequential, args.runs)
+            session.execute(text("SET LOCAL enable_indexscan = on"))
+            session.execute(text("SET LOCAL enable_bitmapscan = on"))
+
+            mark = "✅" if indexed_ms <= TARGET_MS else "⚠️"
+            print(f"{mark} '{q}': {indexed_ms:.1f} мс триграммы, {sequential_ms:.1f} мс последовательный ILIKE")
+            slow = slow or indexed_ms > TARGET_MS
+
+        if slow:
+            print(f"Некоторые запросы медленнее {TARGET_MS} мс")
+            sys.exit(1)
+    finally:
+        session.close()
+        transaction.rollback()
+        connection.close()
+
+
+if __name__ == "__main__":
+    main()
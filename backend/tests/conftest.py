@@ -0,0 +1,71 @@
+"""
+Общие фикстуры тестов: база SQLite в памяти с хуками сессий, как в
+app.main, и шиной событий внутри процесса.
+"""
+import os
+
+os.environ.setdefault("EVENT_BUS", "memory")
+
+import pytest
+from sqlalchemy import create_engine, event, pool
+from sqlalchemy.orm import sessionmaker
+
+import app.models  # noqa: F401
+from app.core.database import Base
+from app.models.board import Board, Column
+from app.models.user import User, UserRole
+from app.services import card_facts, data_version, file_storage, notification_events, stats_rollup, unread_counters
+from app.services.event_bus import event_bus
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=pool.StaticPool,
+    )
+    event.listen(engine, "connect", lambda connection, _: connection.execute("PRAGMA foreign_keys=ON"))
+    Base.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def session_factory(engine):
+    factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    data_version.install_session_hooks(factory)
+    stats_rollup.install_session_hooks(factory)
+    card_facts.install_session_hooks(factory)
+    event_bus.install(factory)
+    notification_events.install_session_hooks(factory)
+    unread_counters.install_session_hooks(factory)
+    file_storage.install_session_hooks(factory)
+    yield factory
+    unread_counters.counter_cache.invalidate()
+
+
+@pytest.fixture
+def db(session_factory):
+    session = session_factory()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def user(db):
+    user = User(email="manager@example.ru", full_name="Менеджер", hashed_password="x", role=UserRole.MANAGER)
+    db.add(user)
+    db.commit()
+    return user
+
+
+@pytest.fixture
+def column(db, user):
+    board = Board(title="Доска", owner_id=user.id)
+    db.add(board)
+    db.flush()
+    column = Column(title="В работе", board_id=board.id)
+    db.add(column)
+    db.commit()
+    return column
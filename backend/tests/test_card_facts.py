@@ -0,0 +1,76 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import insert, update
+
+from app.models.board import Card, CardPriority, card_assignees
+from app.services import card_facts
+from app.services.card_facts import PRIORITY_CODES, CardFactsStore
+
+
+@pytest.fixture
+def store(monkeypatch):
+    store = CardFactsStore()
+    monkeypatch.setattr(card_facts, "card_facts_store", store)
+    return store
+
+
+def _add_cards(db, column, count):
+    cards = [Card(title=f"Задача {index}", column_id=column.id) for index in range(count)]
+    db.add_all(cards)
+    db.commit()
+    return cards
+
+
+def test_snapshot_drops_deleted_card_on_next_read(db, column, store):
+    """После фиксации удаления снимок обновляется, не дожидаясь полного перечитывания"""
+    cards = _add_cards(db, column, 3)
+    assert len(store.get(db)) == 3
+
+    db.delete(cards[0])
+    db.commit()
+    snapshot = store.get(db)
+    assert sorted(snapshot.ids.tolist()) == sorted(card.id for card in cards[1:])
+
+
+def test_snapshot_picks_up_assignee_change(db, user, column, store):
+    card = _add_cards(db, column, 1)[0]
+    assert store.get(db).assignee_ids.tolist() == []
+
+    card.assignees = [user]
+    db.commit()
+    assert store.get(db).assignee_ids.tolist() == [user.id]
+
+
+def test_incremental_refresh_reads_assignees_of_changed_cards_only(db, user, column, store, monkeypatch):
+    monkeypatch.setattr(card_facts.settings, "CARD_FACTS_WATERMARK_OVERLAP_SECONDS", 0)
+    changed, untouched = _add_cards(db, column, 2)
+    db.execute(update(Card).values(created_at=datetime.utcnow() - timedelta(days=1)))
+    db.commit()
+    store.get(db)
+    # Запись в обход ORM: хук ее не видит, инкрементальное обновление не перечитывает
+    db.execute(insert(card_assignees).values(card_id=untouched.id, user_id=user.id))
+    changed.assignees = [user]
+    db.commit()
+
+    snapshot = store.get(db)
+    position = int(snapshot.ids.tolist().index(untouched.id))
+    assert snapshot.card_assignees(position).tolist() == []
+    position = int(snapshot.ids.tolist().index(changed.id))
+    assert snapshot.card_assignees(position).tolist() == [user.id]
+
+
+def test_refresh_overlaps_watermark(db, column, store, monkeypatch):
+    """Карточка, измененная транзакцией, начатой до загрузки снимка, попадает в обновление"""
+    card = _add_cards(db, column, 1)[0]
+    db.execute(update(Card).values(created_at=datetime.utcnow() - timedelta(days=1)))
+    db.commit()
+    snapshot = store.get(db)
+    db.execute(
+        update(Card).where(Card.id == card.id)
+        .values(priority=CardPriority.URGENT, updated_at=snapshot.watermark - timedelta(seconds=1))
+    )
+    db.commit()
+    monkeypatch.setattr(snapshot, "loaded_at", snapshot.loaded_at - 3600)
+
+    assert store.get(db).priority_codes.tolist() == [PRIORITY_CODES[CardPriority.URGENT]]
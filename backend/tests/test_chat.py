@@ -0,0 +1,191 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException, WebSocketDisconnect, status
+
+from app.api.endpoints import chat
+from app.core.security import create_access_token
+from app.models.chat import ChatConversation
+from app.schemas.chat import ChatConversationCreate, ChatMessageCreate
+from app.models.user import User, UserRole
+from app.services.realtime import Connection, registry
+
+
+@pytest.fixture
+def colleague(db):
+    colleague = User(email="sales@example.ru", full_name="Продавец", hashed_password="x", role=UserRole.MANAGER)
+    db.add(colleague)
+    db.commit()
+    return colleague
+
+
+@pytest.fixture
+def conversation(db, user, colleague):
+    conversation = ChatConversation(type="group", title="Сделка")
+    conversation.participants = [user, colleague]
+    db.add(conversation)
+    db.commit()
+    return conversation
+
+
+def _send(db, sender, conversation, *texts):
+    return [
+        asyncio.run(chat.send_message(conversation.id, ChatMessageCreate(content=text), db, sender))
+        for text in texts
+    ]
+
+
+def _summary(db, user, conversation):
+    return next(item for item in asyncio.run(chat.get_conversations(db, user)) if item.id == conversation.id)
+
+
+def test_conversation_list_shows_last_message_and_unread_count(db, user, colleague, conversation):
+    empty = ChatConversation(type="group", title="Пустая", participants=[user, colleague])
+    db.add(empty)
+    db.commit()
+
+    messages = _send(db, colleague, conversation, "Привет", "Счет готов")
+
+    listed = asyncio.run(chat.get_conversations(db, user))
+    # Беседа с сообщениями выше новой пустой
+    assert [item.id for item in listed] == [conversation.id, empty.id]
+    assert listed[0].last_message.id == messages[-1].id
+    assert listed[0].last_message.sender.id == colleague.id
+    assert listed[0].unread_count == 2
+    assert _summary(db, colleague, conversation).unread_count == 0
+
+
+def test_read_cursor_moves_forward_only(db, user, colleague, conversation):
+    messages = _send(db, colleague, conversation, "Раз", "Два", "Три")
+
+    asyncio.run(chat.mark_message_read(messages[1].id, db, user))
+    summary = _summary(db, user, conversation)
+    assert (summary.last_read_message_id, summary.unread_count) == (messages[1].id, 1)
+    assert asyncio.run(chat.get_unread_count(db, user)) == {"count": 1}
+
+    asyncio.run(chat.mark_message_read(messages[0].id, db, user))
+    summary = _summary(db, user, conversation)
+    assert (summary.last_read_message_id, summary.unread_count) == (messages[1].id, 1)
+
+    asyncio.run(chat.mark_all_read(conversation.id, db, user))
+    summary = _summary(db, user, conversation)
+    assert (summary.last_read_message_id, summary.unread_count) == (messages[2].id, 0)
+    assert asyncio.run(chat.get_unread_count(db, user)) == {"count": 0}
+
+
+def test_message_history_pages_from_newest_to_oldest(db, user, colleague, conversation):
+    messages = _send(db, colleague, conversation, *[f"Сообщение {index}" for index in range(5)])
+    other = ChatConversation(type="group", title="Другая", participants=[user, colleague])
+    db.add(other)
+    db.commit()
+    _send(db, user, other, "Не из этой беседы")
+
+    pages = []
+    cursor = None
+    while True:
+        page = asyncio.run(chat.get_messages(conversation.id, cursor, 2, db, user))
+        pages.append([item.id for item in page.items])
+        cursor = page.next_cursor
+        if cursor is None:
+            break
+
+    ids = [message.id for message in messages]
+    assert pages == [ids[3:5], ids[1:3], ids[0:1]]
+
+
+def test_message_history_requires_participation(db, user, colleague, conversation):
+    outsider = User(email="other@example.ru", full_name="Посторонний", hashed_password="x", role=UserRole.MANAGER)
+    db.add(outsider)
+    db.commit()
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(chat.get_messages(conversation.id, None, 10, db, outsider))
+    assert error.value.status_code == status.HTTP_403_FORBIDDEN
+
+
+def test_direct_conversation_is_reused_from_either_side(db, user, colleague):
+    created = asyncio.run(chat.create_conversation(
+        ChatConversationCreate(type="direct", participant_ids=[colleague.id]), db, user
+    ))
+    reverse = asyncio.run(chat.create_conversation(
+        ChatConversationCreate(type="direct", participant_ids=[user.id]), db, colleague
+    ))
+
+    assert reverse.id == created.id
+    assert created.direct_key == f"{min(user.id, colleague.id)}:{max(user.id, colleague.id)}"
+    assert db.query(ChatConversation).filter(ChatConversation.type == "direct").count() == 1
+
+
+class FakeWebSocket:
+    """Клиент WebSocket: сообщения из incoming, None - отключение"""
+
+    def __init__(self, incoming, fail_send=False):
+        self.incoming = asyncio.Queue()
+        for message in incoming:
+            self.incoming.put_nowait(message)
+        self.fail_send = fail_send
+        self.sent = []
+        self.close_codes = []
+
+    async def accept(self):
+        pass
+
+    async def receive_text(self):
+        message = await self.incoming.get()
+        if message is None:
+            raise WebSocketDisconnect()
+        return message
+
+    async def send_json(self, data):
+        if self.fail_send:
+            raise RuntimeError("send failed")
+        self.sent.append(data)
+
+    async def close(self, code):
+        self.close_codes.append(code)
+        self.incoming.put_nowait(None)
+
+
+def test_websocket_delivers_typing_to_other_participants(session_factory, user, colleague, conversation, monkeypatch):
+    monkeypatch.setattr(chat, "SessionLocal", session_factory)
+    websocket = FakeWebSocket([
+        f'{{"type": "typing", "conversation_id": {conversation.id}}}',
+        '{"type": "typing", "conversation_id": 999999}',
+        '{"type": "ping"}',
+    ])
+
+    async def disconnect_later():
+        await asyncio.sleep(0.2)
+        websocket.incoming.put_nowait(None)
+
+    async def scenario():
+        listener = Connection(colleague.id, "chat")
+        registry.register(listener)
+        try:
+            asyncio.ensure_future(disconnect_later())
+            await chat.chat_websocket(websocket, create_access_token({"sub": str(user.id)}))
+        finally:
+            registry.unregister(listener)
+        return [listener.queue.get_nowait() for _ in range(listener.queue.qsize())]
+
+    received = asyncio.run(scenario())
+
+    assert received == [{"type": "typing", "conversation_id": conversation.id, "user_id": user.id}]
+    assert [event["type"] for event in websocket.sent] == ["error", "pong"]
+
+
+def test_websocket_rejects_invalid_token(session_factory, monkeypatch):
+    monkeypatch.setattr(chat, "SessionLocal", session_factory)
+    websocket = FakeWebSocket([])
+    asyncio.run(chat.chat_websocket(websocket, "invalid"))
+    assert websocket.close_codes == [status.WS_1008_POLICY_VIOLATION]
+
+
+def test_websocket_closed_when_sending_fails(session_factory, user, monkeypatch, capsys):
+    monkeypatch.setattr(chat, "SessionLocal", session_factory)
+    websocket = FakeWebSocket(['{"type": "ping"}'], fail_send=True)
+    asyncio.run(asyncio.wait_for(
+        chat.chat_websocket(websocket, create_access_token({"sub": str(user.id)})), timeout=5
+    ))
+    assert websocket.close_codes == [status.WS_1011_INTERNAL_ERROR]
+    assert "send failed" in capsys.readouterr().out
+    assert registry.connection_count(user.id) == 0
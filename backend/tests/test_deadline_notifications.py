@@ -0,0 +1,36 @@
+from datetime import datetime, timedelta
+
+from app.core.config import settings
+from app.models.board import Card
+from app.models.notification import Notification, NotificationType
+from app.services import unread_counters
+from app.services.deadline_notifications import create_deadline_notifications
+
+
+NOW = datetime(2026, 10, 19, 10)
+
+
+def test_rerun_in_same_period_creates_no_duplicates(db, user, column, monkeypatch):
+    monkeypatch.setattr(settings, "NOTIFICATION_DIGEST_MIN_CARDS", 0)
+    overdue = Card(title="Просроченная", column_id=column.id, due_date=NOW - timedelta(days=1))
+    # Пользователь - и исполнитель, и владелец доски: одно уведомление на задачу
+    overdue.assignees = [user]
+    db.add_all([overdue, Card(title="Без дедлайна", column_id=column.id)])
+    db.commit()
+
+    assert create_deadline_notifications(db, NOW) == 1
+    db.commit()
+    assert create_deadline_notifications(db, NOW + timedelta(hours=1)) == 0
+    db.commit()
+
+    notifications = db.query(Notification).all()
+    assert [(item.card_id, item.type, item.period) for item in notifications] == [
+        (overdue.id, NotificationType.CARD_OVERDUE, "2026-10-19")
+    ]
+    assert unread_counters.get(db, user.id)["notifications"] == 1
+
+    # Следующие сутки - новое напоминание
+    assert create_deadline_notifications(db, NOW + timedelta(days=1)) == 1
+    db.commit()
+    assert unread_counters.get(db, user.id)["notifications"] == 2
+    assert unread_counters.reconcile(db) == 0
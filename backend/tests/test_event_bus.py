@@ -0,0 +1,54 @@
+import asyncio
+import json
+
+from sqlalchemy import text
+from sqlalchemy.orm import sessionmaker
+
+from app.services.event_bus import MAX_PAYLOAD_BYTES, InMemoryEventBus, PostgresEventBus
+from app.services.realtime import Connection, ConnectionRegistry
+
+
+def test_events_are_delivered_once_after_commit_and_dropped_on_rollback(engine):
+    registry = ConnectionRegistry()
+    bus = InMemoryEventBus(registry)
+    factory = sessionmaker(bind=engine)
+    bus.install(factory)
+
+    async def scenario():
+        connection = Connection(1, "chat")
+        registry.register(connection)
+        db = factory()
+        try:
+            bus.publish(db, "chat", [1, 2], {"type": "message", "id": 1})
+            bus.publish(db, "chat", [2, 1], {"type": "message", "id": 1})
+            assert connection.queue.empty()
+            db.commit()
+            delivered = [connection.queue.get_nowait() for _ in range(connection.queue.qsize())]
+
+            db.execute(text("SELECT 1"))
+            bus.publish(db, "chat", [1], {"type": "message", "id": 2})
+            db.rollback()
+            db.commit()
+            return delivered, connection.queue.qsize()
+        finally:
+            db.close()
+
+    delivered, after_rollback = asyncio.run(scenario())
+    assert delivered == [{"type": "message", "id": 1}]
+    assert after_rollback == 0
+
+
+def test_notify_payloads_stay_within_limit():
+    items = [
+        {"channel": "chat", "users": [1], "event": {"type": "message", "id": index, "text": "х" * 300}}
+        for index in range(60)
+    ]
+    items.append({"channel": "chat", "users": [1], "event": {"type": "message", "id": 60, "text": "х" * 10000}})
+
+    payloads = PostgresEventBus._payloads(items)
+
+    assert len(payloads) > 1
+    assert all(len(payload.encode("utf-8")) <= MAX_PAYLOAD_BYTES for payload in payloads)
+    decoded = [item for payload in payloads for item in json.loads(payload)]
+    assert [item["event"]["id"] for item in decoded] == list(range(61))
+    assert decoded[-1]["event"] == {"type": "message", "id": 60, "truncated": True}
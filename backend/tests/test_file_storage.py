@@ -0,0 +1,107 @@
+import asyncio
+import hashlib
+import io
+import os
+
+import pytest
+from fastapi import HTTPException
+from starlette.datastructures import UploadFile
+
+from app.api.endpoints import files
+from app.core.config import settings
+from app.models.file import File, FileBlob
+from app.services import file_storage
+from app.services.file_storage import delete_file_record
+
+
+@pytest.fixture
+def upload_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "UPLOAD_DIR", str(tmp_path))
+    return tmp_path
+
+
+def _upload(db, user, content, filename="doc.pdf"):
+    return asyncio.run(files.upload_file(UploadFile(io.BytesIO(content), filename=filename), None, None, db, user))
+
+
+class CountingStream(io.BytesIO):
+    def __init__(self, content):
+        super().__init__(content)
+        self.bytes_read = 0
+
+    def read(self, size=-1):
+        data = super().read(size)
+        self.bytes_read += len(data)
+        return data
+
+
+def test_upload_is_copied_in_chunks_and_hashed(db, user, upload_dir, monkeypatch):
+    monkeypatch.setattr(settings, "UPLOAD_CHUNK_SIZE", 4)
+    content = b"0123456789abcdef!"
+    uploaded = _upload(db, user, content)
+
+    assert uploaded.sha256 == hashlib.sha256(content).hexdigest()
+    assert uploaded.file_size == len(content)
+    with open(uploaded.file_path, "rb") as stored:
+        assert stored.read() == content
+
+
+def test_oversized_upload_stops_reading_and_leaves_no_files(db, user, upload_dir, monkeypatch):
+    monkeypatch.setattr(settings, "UPLOAD_CHUNK_SIZE", 4)
+    monkeypatch.setattr(settings, "MAX_UPLOAD_SIZE", 10)
+    stream = CountingStream(b"x" * 100)
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(files.upload_file(UploadFile(stream, filename="big.bin"), None, None, db, user))
+
+    assert error.value.status_code == 400
+    assert stream.bytes_read <= 12
+    assert [name for _, _, names in os.walk(upload_dir) for name in names] == []
+    assert db.query(File).count() == 0 and db.query(FileBlob).count() == 0
+
+
+def test_duplicate_upload_shares_blob_until_last_delete(db, user, upload_dir):
+    first = _upload(db, user, b"same content")
+    second = _upload(db, user, b"same content", "copy.pdf")
+    assert first.file_path == second.file_path
+    assert db.get(FileBlob, first.sha256).ref_count == 2
+
+    asyncio.run(files.delete_file(first.id, db, user))
+    db.expire_all()
+    assert db.get(FileBlob, first.sha256).ref_count == 1
+    assert os.path.exists(first.file_path)
+
+    asyncio.run(files.delete_file(second.id, db, user))
+    assert db.get(FileBlob, first.sha256) is None
+    assert not os.path.exists(first.file_path)
+
+
+def test_blob_survives_rolled_back_delete(db, user, upload_dir):
+    uploaded = _upload(db, user, b"content")
+    delete_file_record(db, db.get(File, uploaded.id))
+    db.rollback()
+    assert os.path.exists(uploaded.file_path)
+    assert db.get(FileBlob, uploaded.sha256).ref_count == 1
+
+
+def test_blob_kept_when_reuploaded_before_removal(db, user, upload_dir, monkeypatch):
+    """Файл не удаляется, если то же содержимое загружено до удаления файла"""
+    pending = []
+    remove_blobs = file_storage._remove_blobs
+    monkeypatch.setattr(file_storage, "_remove_blobs", lambda bind, hashes: pending.append((bind, hashes)))
+    first = _upload(db, user, b"content")
+    asyncio.run(files.delete_file(first.id, db, user))
+    second = _upload(db, user, b"content")
+
+    assert remove_blobs(*pending[0]) == 0
+    assert os.path.exists(second.file_path)
+    db.expire_all()
+    assert db.get(FileBlob, second.sha256).ref_count == 1
+
+
+def test_blob_removal_leaves_no_placeholder_row(db, user, upload_dir):
+    uploaded = _upload(db, user, b"content")
+    asyncio.run(files.delete_file(uploaded.id, db, user))
+    db.expire_all()
+    assert not os.path.exists(uploaded.file_path)
+    assert db.query(FileBlob).count() == 0
@@ -0,0 +1,36 @@
+from sqlalchemy.dialects import postgresql
+
+from app.services.search import fts
+
+
+def _compile(statement):
+    compiled = statement.compile(dialect=postgresql.dialect())
+    return str(compiled), compiled.params
+
+
+def test_query_tokens_drop_tsquery_operators():
+    assert fts.tokenize_query("Договор & (поставки) | !срочно:*") == ["договор", "поставки", "срочно"]
+    assert len(fts.tokenize_query(" ".join(["слово"] * 20))) == fts.MAX_QUERY_TOKENS
+
+
+def test_tsquery_matches_prefixes_in_both_configs():
+    sql, params = _compile(fts.build_tsquery(["договор", "пост"]))
+    assert sql.count("to_tsquery(") == 2
+    assert sorted(params.values()) == ["english", "russian", "договор:* & пост:*", "договор:* & пост:*"]
+
+
+def test_search_statement_ranks_top_rows_per_category():
+    sql, _ = _compile(fts.search_statement("договор", ["договор"], ["cards", "files"]))
+    assert "cards.search_vector @@" in sql
+    assert "ts_rank(cards.search_vector" in sql
+    assert "ts_headline" in sql
+    assert "LIMIT" in sql and "UNION ALL" in sql
+    # Имена файлов ищутся только триграммами
+    assert "files.search_vector" not in sql
+
+
+def test_messages_are_searched_only_with_visibility_filter(db):
+    assert fts.available_categories(["cards", "messages"], {}) == ["cards"]
+    # Без слов в запросе и без выполнимых категорий в базу не обращаемся
+    assert fts.search(db, "&|!", categories=["cards"]) == {"cards": []}
+    assert fts.search(db, "договор", categories=["messages"]) == {"messages": []}
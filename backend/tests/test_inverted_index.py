@@ -0,0 +1,69 @@
+import threading
+from datetime import timedelta
+
+from sqlalchemy import delete, update
+
+from app.models.board import Card
+from app.services.search.inverted_index import InvertedIndex
+
+
+def _add_cards(db, column, *titles):
+    cards = [Card(title=title, column_id=column.id) for title in titles]
+    db.add_all(cards)
+    db.commit()
+    return cards
+
+
+def test_search_by_word_form_and_unfinished_prefix(db, column):
+    cards = _add_cards(db, column, "Подготовить договоры поставки", "Согласовать счет")
+    index = InvertedIndex()
+    index.build(db)
+
+    assert set(index.scores("cards", "договор")) == {cards[0].id}
+    assert set(index.scores("cards", "договор пост")) == {cards[0].id}
+    assert index.scores("cards", "договор счет") == {}
+
+
+def test_catch_up_overlaps_watermark_and_drops_deleted(db, column, monkeypatch):
+    """Изменения чуть раньше водяного знака и удаления мимо ORM подхватываются при сверке"""
+    monkeypatch.setattr("app.core.config.settings.SEARCH_INDEX_WATERMARK_OVERLAP_SECONDS", 300)
+    changed, removed = _add_cards(db, column, "Старое название", "Удаляемая задача")
+    index = InvertedIndex()
+    index.build(db)
+
+    db.execute(update(Card).where(Card.id == changed.id).values(
+        title="Новое название", created_at=index.watermark - timedelta(days=1),
+        updated_at=index.watermark - timedelta(seconds=1),
+    ))
+    db.execute(delete(Card).where(Card.id == removed.id))
+    db.commit()
+    index.catch_up(db)
+
+    assert set(index.scores("cards", "нов")) == {changed.id}
+    assert index.scores("cards", "стар") == {}
+    assert index.scores("cards", "удаля") == {}
+
+
+def test_catch_up_reads_database_without_blocking_search(db, column, monkeypatch):
+    _add_cards(db, column, "Задача")
+    index = InvertedIndex()
+    index.build(db)
+    lock_free = []
+    rows = InvertedIndex._rows
+
+    def probe():
+        acquired = index._lock.acquire(blocking=False)
+        if acquired:
+            index._lock.release()
+        lock_free.append(acquired)
+
+    def check_lock(db, name, condition=None):
+        thread = threading.Thread(target=probe)
+        thread.start()
+        thread.join()
+        return rows(db, name, condition)
+
+    monkeypatch.setattr(InvertedIndex, "_rows", staticmethod(check_lock))
+    index.catch_up(db)
+
+    assert lock_free and all(lock_free)
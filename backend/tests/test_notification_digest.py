@@ -0,0 +1,59 @@
+from datetime import datetime, timedelta
+
+from app.core.config import settings
+from app.models.board import Card
+from app.models.notification import Notification
+from app.services import unread_counters
+from app.services.deadline_notifications import create_deadline_notifications
+
+
+NOW = datetime(2026, 10, 19, 10)
+
+
+def _add_overdue_cards(db, column, count, start=0):
+    for index in range(start, start + count):
+        db.add(Card(title=f"Задача {index}", column_id=column.id, due_date=NOW - timedelta(days=1)))
+    db.commit()
+
+
+def test_digest_replaces_individual_notifications_when_threshold_is_crossed(db, user, column, monkeypatch):
+    """Дайджест, созданный при пересечении порога, заменяет отдельные непрочитанные уведомления"""
+    monkeypatch.setattr(settings, "NOTIFICATION_DIGEST_MIN_CARDS", 5)
+    _add_overdue_cards(db, column, 3)
+    assert create_deadline_notifications(db, NOW) == 3
+    db.commit()
+    read = db.query(Notification).first()
+    read.is_read = True
+    db.commit()
+
+    _add_overdue_cards(db, column, 3, start=3)
+    assert create_deadline_notifications(db, NOW + timedelta(hours=1)) == 1
+    db.commit()
+
+    unread = db.query(Notification).filter(Notification.is_read == False).all()  # noqa: E712
+    assert len(unread) == 1
+    assert unread[0].card_id is None
+    assert sorted(unread[0].card_ids) == sorted(card.id for card in db.query(Card))
+    # Прочитанное отдельное уведомление остается в истории
+    assert db.query(Notification).filter(Notification.card_id.isnot(None)).all() == [read]
+    assert unread_counters.get(db, user.id)["notifications"] == 1
+    assert unread_counters.reconcile(db) == 0
+
+
+def test_digest_is_replaced_across_runs(db, user, column, monkeypatch):
+    """Новые задачи за тот же период заменяют дайджест одним новым, повторная проверка ничего не создает"""
+    monkeypatch.setattr(settings, "NOTIFICATION_DIGEST_MIN_CARDS", 5)
+    _add_overdue_cards(db, column, 5)
+    assert create_deadline_notifications(db, NOW) == 1
+    db.commit()
+    assert create_deadline_notifications(db, NOW + timedelta(hours=1)) == 0
+    db.commit()
+
+    _add_overdue_cards(db, column, 2, start=5)
+    assert create_deadline_notifications(db, NOW + timedelta(hours=2)) == 1
+    db.commit()
+
+    notifications = db.query(Notification).all()
+    assert len(notifications) == 1
+    assert len(notifications[0].card_ids) == 7
+    assert unread_counters.get(db, user.id)["notifications"] == 1
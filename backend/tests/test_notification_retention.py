@@ -0,0 +1,40 @@
+from datetime import datetime, timedelta
+
+from app.core.config import settings
+from app.models.notification import Notification, NotificationArchive, NotificationType
+from app.services import unread_counters
+from app.services.notification_retention import archive_read_notifications, purge_archive
+
+
+NOW = datetime(2026, 10, 19, 10)
+
+
+def test_old_read_notifications_are_archived_in_bounded_batches(db, user, monkeypatch):
+    monkeypatch.setattr(settings, "NOTIFICATION_RETENTION_DAYS", 30)
+    monkeypatch.setattr(settings, "NOTIFICATION_ARCHIVE_RETENTION_DAYS", 365)
+    monkeypatch.setattr(settings, "NOTIFICATION_PURGE_BATCH_SIZE", 2)
+    monkeypatch.setattr(settings, "NOTIFICATION_PURGE_MAX_BATCHES", 2)
+    old = NOW - timedelta(days=60)
+
+    def notification(title, is_read, created_at):
+        return Notification(user_id=user.id, type=NotificationType.SYSTEM, title=title, message="",
+                            is_read=is_read, created_at=created_at)
+
+    archived = [notification(f"Старое {index}", True, old) for index in range(5)]
+    kept = [notification("Старое непрочитанное", False, old), notification("Свежее", True, NOW)]
+    db.add_all(archived + kept)
+    db.commit()
+    archived_ids = sorted(item.id for item in archived)
+
+    assert archive_read_notifications(db, NOW) == 4
+    assert archive_read_notifications(db, NOW) == 1
+    assert archive_read_notifications(db, NOW) == 0
+
+    assert {item.title for item in db.query(Notification)} == {"Старое непрочитанное", "Свежее"}
+    assert sorted(item.id for item in db.query(NotificationArchive)) == archived_ids
+    assert unread_counters.get(db, user.id)["notifications"] == 1
+
+    assert purge_archive(db, NOW + timedelta(days=200)) == 0
+    assert purge_archive(db, NOW + timedelta(days=400)) == 4
+    assert purge_archive(db, NOW + timedelta(days=400)) == 1
+    assert db.query(NotificationArchive).count() == 0
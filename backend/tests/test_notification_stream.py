@@ -0,0 +1,79 @@
+import asyncio
+import json
+
+import pytest
+from fastapi import HTTPException, status
+
+from app.api.endpoints import notifications
+from app.core.config import settings
+from app.models.notification import Notification, NotificationType
+from app.services.realtime import registry
+
+
+class FakeRequest:
+    def __init__(self):
+        self.disconnected = False
+
+    async def is_disconnected(self):
+        return self.disconnected
+
+
+def _notify(db, user, *titles):
+    items = [Notification(user_id=user.id, type=NotificationType.SYSTEM, title=title, message="") for title in titles]
+    db.add_all(items)
+    db.commit()
+    return items
+
+
+def _parse(chunk):
+    fields = dict(line.split(": ", 1) for line in chunk.strip().split("\n"))
+    return fields.get("event"), fields.get("id"), json.loads(fields["data"])
+
+
+def test_stream_resumes_after_last_event_id_and_pushes_new(db, user, monkeypatch):
+    monkeypatch.setattr(settings, "NOTIFICATION_STREAM_HEARTBEAT_SECONDS", 0.05)
+    seen, missed_one, missed_two = _notify(db, user, "Старое", "Пропущено 1", "Пропущено 2")
+    request = FakeRequest()
+
+    async def scenario():
+        response = await notifications.notification_stream(request, seen.id, db, user)
+        chunks = response.body_iterator
+        received = [_parse(await chunks.__anext__()) for _ in range(3)]
+        fresh = _notify(db, user, "Новое")[0]
+        while True:
+            chunk = await chunks.__anext__()
+            if not chunk.startswith(":"):
+                received.append(_parse(chunk))
+                break
+        request.disconnected = True
+        async for _ in chunks:
+            pass
+        return received, fresh
+
+    received, fresh = asyncio.run(scenario())
+
+    assert received[0] == ("unread_count", None, {"count": 3})
+    assert [(event, event_id) for event, event_id, _ in received[1:]] == [
+        ("notification", str(missed_one.id)),
+        ("notification", str(missed_two.id)),
+        ("notification", str(fresh.id)),
+    ]
+    assert received[3][2]["notification"]["title"] == "Новое"
+    assert registry.connection_count(user.id) == 0
+
+
+def test_stream_count_is_limited_per_user(db, user, monkeypatch):
+    monkeypatch.setattr(settings, "NOTIFICATION_STREAMS_PER_USER", 1)
+
+    async def scenario():
+        response = await notifications.notification_stream(FakeRequest(), None, db, user)
+        await response.body_iterator.__anext__()
+        try:
+            with pytest.raises(HTTPException) as error:
+                await notifications.notification_stream(FakeRequest(), None, db, user)
+            return error.value.status_code
+        finally:
+            await response.body_iterator.aclose()
+
+    assert asyncio.run(scenario()) == status.HTTP_429_TOO_MANY_REQUESTS
+    assert registry.connection_count(user.id) == 0
@@ -0,0 +1,53 @@
+import asyncio
+import time
+
+from app.models.board import Board, Card, Column
+from app.services.report_cache import ReportCache
+
+
+def _count_cards(db):
+    return db.query(Card).count()
+
+
+def test_concurrent_requests_compute_once(session_factory):
+    cache = ReportCache(ttl_seconds=60, max_entries=10, session_factory=session_factory)
+    calls = []
+
+    def compute(db):
+        calls.append(1)
+        time.sleep(0.1)
+        return len(calls)
+
+    async def scenario():
+        return await asyncio.gather(*(
+            cache.get_or_compute("stats", {"days": 7, "board_id": None}, "manager", compute)
+            for _ in range(3)
+        ))
+
+    assert asyncio.run(scenario()) == [1, 1, 1]
+    assert len(calls) == 1
+    assert cache.stats()["coalesced"] == 2
+
+
+def test_commit_invalidates_only_reports_of_changed_board(db, user, column, session_factory):
+    other = Board(title="Другая доска", owner_id=user.id)
+    db.add(other)
+    db.flush()
+    other_column = Column(title="Новые", board_id=other.id)
+    db.add(other_column)
+    db.commit()
+    cache = ReportCache(ttl_seconds=60, max_entries=10, session_factory=session_factory)
+
+    def report(board_id):
+        return asyncio.run(cache.get_or_compute("cards", {"board_id": board_id}, "manager", _count_cards,
+                                                board_ids=[board_id]))
+
+    assert report(column.board_id) == 0
+    assert report(other.id) == 0
+
+    db.add(Card(title="Задача", column_id=column.id))
+    db.commit()
+
+    assert report(column.board_id) == 1
+    assert report(other.id) == 0
+    assert cache.stats()["hits"] == 1
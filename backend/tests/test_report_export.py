@@ -0,0 +1,49 @@
+import csv
+import io
+import zipfile
+
+from app.models.board import Card
+from app.services.report_export import gantt_dataset, iter_csv, iter_dataset_rows, iter_export, iter_xlsx
+
+
+def _add_cards(db, column, count):
+    db.add_all([Card(title=f"Задача {index}", column_id=column.id) for index in range(count)])
+    db.commit()
+
+
+def test_csv_export_streams_dataset_rows(db, column, session_factory):
+    _add_cards(db, column, 3)
+    dataset, rows = iter_dataset_rows(lambda dialect_name: gantt_dataset(dialect_name, column.board_id),
+                                      session_factory)
+    content = b"".join(iter_export("csv", dataset, rows)).decode("utf-8-sig")
+
+    table = list(csv.reader(io.StringIO(content)))
+    assert table[0] == dataset.header
+    assert [row[1] for row in table[1:]] == ["Задача 0", "Задача 1", "Задача 2"]
+    assert {row[4] for row in table[1:]} == {"В работе"}
+    assert {row[7] for row in table[1:]} == {"33"}
+
+
+def test_serializers_do_not_read_rows_ahead():
+    consumed = []
+
+    def rows():
+        for index in range(10):
+            consumed.append(index)
+            yield (index, f"строка {index}")
+
+    for serializer in (iter_csv, iter_xlsx):
+        consumed.clear()
+        chunks = serializer(["id", "title"], rows(), batch_rows=2)
+        next(chunks)
+        assert consumed == []
+        next(chunks)
+        assert len(consumed) <= 2
+
+
+def test_xlsx_export_is_readable_workbook():
+    content = b"".join(iter_xlsx(["id", "title"], [(1, "Договор <№1>"), (2, None)], batch_rows=1))
+    with zipfile.ZipFile(io.BytesIO(content)) as archive:
+        sheet = archive.read("xl/worksheets/sheet1.xml").decode("utf-8")
+    assert "Договор &lt;№1&gt;" in sheet
+    assert sheet.count("<row>") == 3
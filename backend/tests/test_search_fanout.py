@@ -0,0 +1,33 @@
+import asyncio
+import time
+
+from app.core.config import settings
+from app.services.search.backend import SearchBackend
+from app.services.search.fanout import search_concurrently
+
+
+class FakeBackend(SearchBackend):
+    name = "fake"
+
+    def search(self, db, q, limit, visibility, categories=None):
+        name = categories[0]
+        if name == "contacts":
+            time.sleep(0.5)
+        if name == "files":
+            raise RuntimeError("поиск недоступен")
+        return {name: [{"id": 1, "category": name}]}
+
+
+def test_slow_and_failed_categories_return_empty_as_partial(db, monkeypatch, capsys):
+    monkeypatch.setattr(settings, "SEARCH_CATEGORY_TIMEOUT_MS", 200)
+    monkeypatch.setattr(settings, "SEARCH_FANOUT_WORKERS", 4)
+
+    started = time.monotonic()
+    results, partial = asyncio.run(
+        search_concurrently(FakeBackend(), db, "счет", 10, None, ["cards", "contacts", "files"])
+    )
+
+    assert time.monotonic() - started < 0.45
+    assert results == {"cards": [{"id": 1, "category": "cards"}], "contacts": [], "files": []}
+    assert partial == ["contacts", "files"]
+    assert "поиск недоступен" in capsys.readouterr().out
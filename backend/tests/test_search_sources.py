@@ -0,0 +1,35 @@
+from app.models.chat import ChatConversation, ChatMessage
+from app.models.file import File
+from app.services.search.backend import like_backend
+from app.services.search.visibility import SearchVisibility
+
+
+def test_message_pages_cover_only_own_conversations_newest_first(db, user):
+    own = ChatConversation(type="group", title="Сделка", participants=[user])
+    foreign = ChatConversation(type="group", title="Чужая")
+    db.add_all([own, foreign])
+    db.flush()
+    messages = [ChatMessage(conversation_id=own.id, sender_id=user.id, content=f"счет {index}") for index in range(5)]
+    db.add_all(messages + [ChatMessage(conversation_id=foreign.id, sender_id=user.id, content="счет чужой")])
+    db.commit()
+    visibility = SearchVisibility.for_user(db, user)
+
+    first, cursor = like_backend.search_page(db, "messages", "счет", None, 3, visibility)
+    second, last = like_backend.search_page(db, "messages", "счет", cursor, 3, visibility)
+
+    expected = [message.id for message in reversed(messages)]
+    assert [row["id"] for row in first + second] == expected
+    assert last is None
+    assert {row["ref_id"] for row in first + second} == {own.id}
+
+
+def test_files_are_found_by_original_name(db, user):
+    db.add_all([
+        File(filename=name, original_filename=name, file_path=f"/tmp/{name}", file_size=1, uploaded_by_id=user.id)
+        for name in ("Договор_2026.pdf", "Счет.xlsx")
+    ])
+    db.commit()
+    visibility = SearchVisibility.for_user(db, user)
+
+    rows, _ = like_backend.search_page(db, "files", "Договор", None, 10, visibility)
+    assert [row["title"] for row in rows] == ["Договор_2026.pdf"]
@@ -0,0 +1,41 @@
+import pytest
+
+from app.models.contact import Contact
+from app.models.user import User, UserRole
+from app.services.search import suggest, visibility as visibility_module
+from app.services.search.backend import like_backend
+from app.services.search.suggest import PrefixCache
+from app.services.search.visibility import SearchVisibility
+
+
+@pytest.fixture
+def contacts(db, user):
+    colleague = User(email="sales@example.ru", full_name="Продавец", hashed_password="x", role=UserRole.MANAGER)
+    db.add(colleague)
+    db.flush()
+    own = Contact(company_name="Acme Own", created_by_id=user.id)
+    shared = Contact(company_name="Acme Shared", created_by_id=colleague.id, shared_with_users=[user])
+    hidden = Contact(company_name="Acme Hidden", created_by_id=colleague.id)
+    db.add_all([own, shared, hidden])
+    db.commit()
+    return own, shared, hidden
+
+
+@pytest.mark.parametrize("inline_limit", [10000, 0])
+def test_search_and_suggest_return_only_visible_contacts(db, user, contacts, monkeypatch, inline_limit):
+    monkeypatch.setattr(visibility_module, "INLINE_IDS_LIMIT", inline_limit)
+    monkeypatch.setattr(suggest, "prefix_cache", PrefixCache(100))
+    own, shared, hidden = contacts
+    visibility = SearchVisibility.for_user(db, user)
+    assert visibility.truncated == (inline_limit == 0)
+
+    found = like_backend.search(db, "acme", 10, visibility, categories=["contacts"])["contacts"]
+    suggested = suggest.suggest(db, "acme", visibility=visibility)
+
+    assert {row["id"] for row in found} == {own.id, shared.id}
+    assert {item["id"] for item in suggested} == {own.id, shared.id}
+
+
+def test_messages_hidden_without_conversations(db, user):
+    visibility = SearchVisibility.for_user(db, user)
+    assert like_backend.search(db, "привет", 10, visibility, categories=["messages"]) == {"messages": []}
@@ -0,0 +1,44 @@
+from datetime import datetime, timedelta
+
+from app.models.board import Card
+from app.models.stats import DailyStats, DailyUserStats, StatsRollupDirtyDay
+from app.services.stats_rollup import refresh_rollups
+
+
+def _cards_created(db, day):
+    stats = db.get(DailyStats, day)
+    return stats.cards_created if stats is not None else 0
+
+
+def test_refresh_rebuilds_day_after_delete(db, column):
+    """Удаление карточки за уже агрегированный день пересчитывает этот день"""
+    created_at = datetime.utcnow() - timedelta(days=10)
+    cards = [Card(title=f"Задача {index}", column_id=column.id, created_at=created_at) for index in range(3)]
+    db.add_all(cards)
+    db.commit()
+    refresh_rollups(db)
+    assert _cards_created(db, created_at.date()) == 3
+
+    db.delete(cards[0])
+    db.commit()
+    assert [mark.day for mark in db.query(StatsRollupDirtyDay)] == [created_at.date()]
+
+    refresh_rollups(db)
+    assert _cards_created(db, created_at.date()) == 2
+    assert db.query(StatsRollupDirtyDay).count() == 0
+
+
+def test_refresh_rebuilds_day_after_assignee_change(db, user, column):
+    """Смена исполнителей не меняет строку карточки, но день пересчитывается"""
+    created_at = datetime.utcnow() - timedelta(days=10)
+    card = Card(title="Задача", column_id=column.id, created_at=created_at)
+    db.add(card)
+    db.commit()
+    refresh_rollups(db)
+
+    card.assignees = [user]
+    db.commit()
+    refresh_rollups(db)
+
+    stats = db.get(DailyUserStats, (created_at.date(), user.id))
+    assert stats is not None and stats.cards_assigned == 1
@@ -0,0 +1,12 @@
+from app.services.search.stemmer import stem, terms, tokenize
+
+
+def test_tokens_are_lowercase_words_with_yo_replaced():
+    assert tokenize("Счёт №15, ООО «Ромашка»_2") == ["счет", "15", "ооо", "ромашка", "2"]
+
+
+def test_word_forms_share_stem():
+    assert {stem(word) for word in ("договор", "договора", "договоры", "договорами")} == {"договор"}
+    assert {stem(word) for word in ("поставка", "поставки", "поставками")} == {"поставк"}
+    assert {stem(word) for word in ("meeting", "meetings")} == {"meet"}
+    assert terms("Ёлки") == terms("елка")
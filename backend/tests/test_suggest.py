@@ -0,0 +1,44 @@
+import pytest
+
+from app.models.board import Card
+from app.services.search import suggest
+from app.services.search.suggest import PrefixCache
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = PrefixCache(100)
+    monkeypatch.setattr(suggest, "prefix_cache", cache)
+    return cache
+
+
+def _add_cards(db, column, *titles):
+    db.add_all([Card(title=title, column_id=column.id) for title in titles])
+    db.commit()
+
+
+def _texts(db, q):
+    return [item["text"] for item in suggest.suggest(db, q)]
+
+
+def test_every_word_matches_start_of_a_word_ignoring_case(db, column, cache):
+    _add_cards(db, column, "Договор поставки оборудования", "ДОГОВОР", "Разговор с клиентом", "Поставка договора")
+
+    assert _texts(db, "дог") == ["ДОГОВОР", "Поставка договора", "Договор поставки оборудования"]
+    assert _texts(db, "пост ДОГ") == ["Поставка договора", "Договор поставки оборудования"]
+    assert _texts(db, "д") == []
+
+
+def test_longer_prefix_is_refined_from_cache_until_data_changes(db, column, cache, monkeypatch):
+    _add_cards(db, column, "Договор поставки", "Доставка")
+    assert _texts(db, "до") == ["Доска", "Доставка", "Договор поставки"]
+
+    fetch = suggest.fetch_suggestions
+    calls = []
+    monkeypatch.setattr(suggest, "fetch_suggestions", lambda *args: calls.append(args) or fetch(*args))
+    assert _texts(db, "дог") == ["Договор поставки"]
+    assert calls == [] and cache.stats()["refined"] == 1
+
+    _add_cards(db, column, "Договоренность")
+    assert _texts(db, "дог") == ["Договоренность", "Договор поставки"]
+    assert len(calls) == 1
@@ -0,0 +1,33 @@
+from sqlalchemy.dialects import postgresql
+
+from app.models.contact import Contact
+from app.services.search import trigram
+
+
+def _add_contacts(db, user, *names):
+    contacts = [Contact(company_name=name, created_by_id=user.id) for name in names]
+    db.add_all(contacts)
+    db.commit()
+    return contacts
+
+
+def test_substring_filter_escapes_like_wildcards(db, user):
+    percent, plain, underscore = _add_contacts(db, user, "Discount 100% Ltd", "Globex", "Data_Soft")
+
+    def found(q):
+        return {contact.id for contact in trigram.filter_contacts(db, db.query(Contact), q)}
+
+    assert found("lob") == {plain.id}
+    assert found("0%") == {percent.id}
+    assert found("%") == {percent.id}
+    assert found("_") == {underscore.id}
+
+
+def test_postgres_filter_adds_fuzzy_match_and_similarity_order(db, monkeypatch):
+    sqlite_sql = str(trigram.filter_contacts(db, db.query(Contact), "globx").statement)
+    monkeypatch.setattr(trigram, "is_supported", lambda db: True)
+    pg_sql = str(trigram.filter_contacts(db, db.query(Contact), "globx").statement.compile(dialect=postgresql.dialect()))
+
+    assert "%>" not in sqlite_sql
+    assert "contacts.company_name %%> " in pg_sql
+    assert "ORDER BY greatest(coalesce(word_similarity(" in pg_sql
@@ -0,0 +1,44 @@
+import asyncio
+
+from app.api.endpoints import notifications
+from app.models.notification import Notification, NotificationType
+from app.services import unread_counters
+
+
+def _notify(db, user, count):
+    items = [
+        Notification(user_id=user.id, type=NotificationType.SYSTEM, title=f"Уведомление {index}", message="")
+        for index in range(count)
+    ]
+    db.add_all(items)
+    db.commit()
+    return items
+
+
+def _unread(db, user):
+    return unread_counters.get(db, user.id)["notifications"]
+
+
+def test_counter_follows_create_read_and_delete(db, user):
+    items = _notify(db, user, 3)
+    assert _unread(db, user) == 3
+
+    asyncio.run(notifications.mark_notification_as_read(items[0].id, db, user))
+    assert _unread(db, user) == 2
+
+    # Удаление прочитанного не меняет счетчик, непрочитанного - уменьшает
+    asyncio.run(notifications.delete_notification(items[0].id, db, user))
+    assert _unread(db, user) == 2
+    asyncio.run(notifications.delete_notification(items[1].id, db, user))
+    assert _unread(db, user) == 1
+    assert unread_counters.reconcile(db) == 0
+
+
+def test_mark_all_as_read_resets_counter(db, user):
+    _notify(db, user, 4)
+    asyncio.run(notifications.mark_all_as_read(db, user))
+    assert _unread(db, user) == 0
+
+    _notify(db, user, 1)
+    assert _unread(db, user) == 1
+    assert unread_counters.reconcile(db) == 0
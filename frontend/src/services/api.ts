@@ -328,6 +328,11 @@ export const searchApi = {
     const response = await api.get('/search/', { params: { q: query } })
     return response.data
   },
+  
+  suggest: async (query: string, limit: number = 10) => {
+    const response = await api.get('/search/suggest', { params: { q: query, limit } })
+    return response.data
+  },
 }
 
 // Chat API
@@ -342,6 +347,11 @@ export const chatApi = {
     return response.data
   },
   
+  getMessages: async (conversationId: number, before?: number, limit: number = 50) => {
+    const response = await api.get(`/chat/conversations/${conversationId}/messages`, { params: { before, limit } })
+    return response.data
+  },
+  
   createConversation: async (data: { type: string; title?: string; participant_ids: number[] }) => {
     const response = await api.post('/chat/conversations', data)
     return response.data